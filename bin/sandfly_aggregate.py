@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_aggregate.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Build sandfly:results:summary and sandfly:results:timeline events from
+#   the result records the results collector already streams, instead of
+#   two more aggregation queries against the Sandfly server
+#
+# Events (all counts are additive: sum(count) over any time range):
+# - summary:  one per host and status, and one per sandfly and status,
+#             for the results collected in one cycle
+# - timeline: one per time bucket (by result time) and status; a bucket
+#             that spans two cycles gets one event from each
+#
+# Design principles:
+# - Counts come from exactly the records written as sandfly:results, so
+#   the three sourcetypes always agree
+# - Memory is bounded by hosts + sandflies + buckets, never by results
+# - Every event carries derived=true and the collection window
+# =============================================================================
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sandfly_time import event_time, lookup_path
+
+
+SUMMARY_SOURCETYPE = "sandfly:results:summary"
+TIMELINE_SOURCETYPE = "sandfly:results:timeline"
+
+DEFAULT_TIMELINE_SPAN = 3600
+
+UNKNOWN = "unknown"
+
+_PATHS = {
+    field: (tuple(field.split(".")), ("data",) + tuple(field.split(".")))
+    for field in ("host_id", "hostname", "sandfly_name", "status")
+}
+
+
+def _field(record: Dict[str, Any], field: str) -> Optional[Any]:
+    for path in _PATHS[field]:
+        value = lookup_path(record, path)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ResultAggregator:
+    """
+    Counts for one results collection cycle.
+
+    add() every record written as sandfly:results, then write events().
+    """
+
+    def __init__(self, summary: bool = True, timeline: bool = True, span: int = DEFAULT_TIMELINE_SPAN):
+        self.summary = summary
+        self.timeline = timeline
+        self.span = max(1, int(span))
+
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._hosts: Counter = Counter()
+        self._hostnames: Dict[str, str] = {}
+        self._sandflies: Counter = Counter()
+        self._buckets: Counter = Counter()
+        self.results = 0
+
+    def add(self, record: Any):
+        if not isinstance(record, dict):
+            return
+        status = str(_field(record, "status") or UNKNOWN)
+
+        with self._lock:
+            self.results += 1
+            if self.summary:
+                host_id = str(_field(record, "host_id") or UNKNOWN)
+                self._hosts[(host_id, status)] += 1
+                hostname = _field(record, "hostname")
+                if hostname:
+                    self._hostnames[host_id] = str(hostname)
+                self._sandflies[(str(_field(record, "sandfly_name") or UNKNOWN), status)] += 1
+            if self.timeline:
+                epoch = float(event_time("sandfly:results", record, now=self.started))
+                self._buckets[(int(epoch // self.span) * self.span, status)] += 1
+
+    def events(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(sourcetype, record) pairs for everything counted so far."""
+        window = {"window_start": _iso(self.started), "window_end": _iso(time.time()), "derived": True}
+
+        for (host_id, status), count in sorted(self._hosts.items()):
+            record = {"summary_type": "host", "host_id": host_id}
+            if host_id in self._hostnames:
+                record["hostname"] = self._hostnames[host_id]
+            record.update({"status": status, "count": count})
+            record.update(window)
+            yield SUMMARY_SOURCETYPE, record
+
+        for (sandfly_name, status), count in sorted(self._sandflies.items()):
+            record = {"summary_type": "sandfly", "sandfly_name": sandfly_name, "status": status, "count": count}
+            record.update(window)
+            yield SUMMARY_SOURCETYPE, record
+
+        for (bucket, status), count in sorted(self._buckets.items()):
+            record = {"timestamp": _iso(bucket), "span": self.span, "status": status, "count": count}
+            record.update(window)
+            yield TIMELINE_SOURCETYPE, record
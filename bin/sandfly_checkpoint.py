@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_checkpoint.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Persist per-stanza collector state in the modular input checkpoint dir
+# - Survive restarts and crashes without losing or corrupting state
+#
+# Design principles:
+# - One JSON document per stanza
+# - Atomic writes only (write temp file, fsync, rename)
+# - A corrupt or missing checkpoint is treated as "first run"
+# =============================================================================
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+
+
+# -----------------------------------------------------------------------------#
+# Helpers
+# -----------------------------------------------------------------------------#
+def checkpoint_filename(stanza: str, suffix: str = "json") -> str:
+    """
+    Build a filesystem-safe, collision-free file name for a stanza.
+
+    Stanza names look like "sandfly_security://prod" and may contain
+    characters that are not valid in file names on every platform.
+    """
+    readable = re.sub(r"[^A-Za-z0-9_.-]+", "_", stanza).strip("_")[:64]
+    digest = hashlib.sha1(stanza.encode("utf-8")).hexdigest()[:12]
+    return f"{readable}.{digest}.{suffix}"
+
+
+def atomic_write(path: str, data: bytes, mode: int = 0o644):
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+# -----------------------------------------------------------------------------#
+# Checkpoint store
+# -----------------------------------------------------------------------------#
+class CheckpointStore:
+    """
+    Key/value checkpoint state for one input stanza.
+
+    Values must be JSON-serialisable. Changes are kept in memory until
+    save() is called, so a collector decides exactly when its progress
+    becomes durable.
+    """
+
+    def __init__(self, checkpoint_dir: str, stanza: str):
+        self.checkpoint_dir = checkpoint_dir
+        self.stanza = stanza
+        self.path = os.path.join(checkpoint_dir, checkpoint_filename(stanza))
+
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._state.get(key, default)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._state[key] = value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._state.pop(key, None)
+
+    def save(self):
+        # Held across the write so concurrent collectors never interleave
+        # on the shared temp file.
+        with self._lock:
+            data = json.dumps(self._state, sort_keys=True).encode("utf-8")
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            atomic_write(self.path, data)
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_client.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - The one Sandfly connection core used by collection, validation and setup
+# - Pooled keep-alive session with the same retry policy on HTTP and HTTPS
+# - Login, role validation and the /v4/version reachability probe
+# - Adaptive pacing and a circuit breaker per server (sandfly_throttle.py)
+# - Per-request timing handed to the collectors' telemetry recorder
+# - gzip on every request; conditional GETs (ETag / Last-Modified)
+#
+# Design principles:
+# - Read-only API usage
+# - Explicit failure phases
+# - Clear, user-facing errors
+# - Splunk-supported logging levels ONLY
+# =============================================================================
+
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import requests
+from urllib3.util.retry import Retry
+
+import splunklib.modularinput as smi
+
+from sandfly_errors import DeadlineExceededError, RateLimitedError, parse_retry_after
+from sandfly_json import (
+    FAST_DECODE_MAX_BYTES,
+    READ_SIZE,
+    iter_body_records,
+    iter_json_records,
+    orjson,
+)
+from sandfly_telemetry import TimedHTTPAdapter, connection_timing, ms, reset_connection_timing
+from sandfly_throttle import (
+    DEFAULT_BREAKER_COOLDOWN,
+    DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_MAX_RATE,
+    CircuitBreaker,
+    ServerGuard,
+)
+from sandfly_token import TokenManager
+
+
+REQUIRED_ROLES = {"admin", "api_result_read", "api_scan"}
+DEFAULT_TIMEOUT = 60
+DEFAULT_POOL_SIZE = 10
+DEFAULT_SERVER_CONCURRENCY = 16
+
+# 429/503 are retried by SandflyAPI itself (after feeding the rate limiter),
+# not by the adapter, so every caller on the server slows down together.
+THROTTLE_STATUSES = (429, 503)
+MAX_THROTTLE_RETRIES = 3
+
+
+# -----------------------------------------------------------------------------#
+# Logging helper
+# -----------------------------------------------------------------------------#
+def log(log_fn, level, msg):
+    log_fn(level, msg)
+
+
+def as_bool(value, default: bool = True) -> bool:
+    """Interpret a Splunk/form boolean ("true", "0", True, None...)."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes", "y", "on")
+
+
+# -----------------------------------------------------------------------------#
+# Session factory
+# -----------------------------------------------------------------------------#
+def build_session(
+    verify_ssl=True,
+    proxy_url: Optional[str] = None,
+    proxy_user: Optional[str] = None,
+    proxy_pass: Optional[str] = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> requests.Session:
+    """
+    Pooled keep-alive session with the shared retry policy.
+
+    The same adapter is mounted for http:// and https:// so every caller
+    (collection, validation, setup) gets identical retry behaviour.
+    """
+    session = requests.Session()
+    session.verify = as_bool(verify_ssl)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+
+    retry = Retry(
+        total=3,
+        connect=2,
+        read=1,
+        backoff_factor=1,
+        status_forcelist=(500, 502, 504),
+        allowed_methods=["GET", "POST", "HEAD"],
+        # Hand the final 5xx back to us instead of raising, so it counts
+        # towards the server's circuit breaker.
+        raise_on_status=False,
+        # Otherwise urllib3 would retry 429/503 carrying Retry-After itself
+        respect_retry_after_header=False,
+    )
+    # Pool sized to the caller's thread count so concurrent workers
+    # reuse keep-alive connections instead of opening new ones.
+    adapter = TimedHTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max(1, int(pool_size)))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    if proxy_url:
+        proxy = proxy_url
+        if proxy_user and proxy_pass:
+            proxy = proxy_url.replace("://", f"://{proxy_user}:{proxy_pass}@", 1)
+        session.proxies = {"http": proxy, "https": proxy}
+
+    return session
+
+
+# -----------------------------------------------------------------------------#
+# Sandfly API Client
+# -----------------------------------------------------------------------------#
+class SandflyAPI:
+    # One semaphore per Sandfly server, shared by every client in this
+    # process, so fan-out workers cannot overwhelm a single server.
+    _server_slots: Dict[str, threading.BoundedSemaphore] = {}
+    _server_slots_lock = threading.Lock()
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        log_fn,
+        verify_ssl: bool = True,
+        timeout: int = DEFAULT_TIMEOUT,
+        proxy_url: Optional[str] = None,
+        proxy_user: Optional[str] = None,
+        proxy_pass: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_concurrency: int = DEFAULT_SERVER_CONCURRENCY,
+        token_cache_dir: Optional[str] = None,
+        connect: bool = True,
+        max_rate: float = DEFAULT_MAX_RATE,
+        breaker_threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        breaker_cooldown: float = DEFAULT_BREAKER_COOLDOWN,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.log_fn = log_fn
+
+        self.access_token = None
+        self.refresh_token = None
+        self.token_expiry = 0
+        self.token_issued = None
+        self._token_lock = threading.Lock()
+        self.tokens = TokenManager(self.base_url, username, password, cache_dir=token_cache_dir)
+        self._slot = self._server_slot(self.base_url, max_concurrency)
+        self.guard = ServerGuard.for_server(self.base_url, max_rate, breaker_threshold, breaker_cooldown)
+        # Per-thread deadline (epoch seconds) set by deadline()
+        self._local = threading.local()
+
+        self.session = build_session(verify_ssl, proxy_url, proxy_user, proxy_pass, pool_size)
+
+        # Set by CollectorEngine to a TelemetryRecorder for the cycle
+        self.telemetry = None
+
+        # connect=False leaves authentication to the caller (validation
+        # always performs a real, role-checked login)
+        if connect:
+            self.authenticate()
+
+    @classmethod
+    def _server_slot(cls, base_url: str, max_concurrency: int) -> threading.BoundedSemaphore:
+        with cls._server_slots_lock:
+            if base_url not in cls._server_slots:
+                cls._server_slots[base_url] = threading.BoundedSemaphore(max(1, int(max_concurrency)))
+            return cls._server_slots[base_url]
+
+    # -------------------------------------------------------------------------#
+    # Authentication
+    # -------------------------------------------------------------------------#
+    def authenticate(self):
+        # Reuse a token another worker, stanza or earlier run already holds
+        with self.tokens.locked():
+            cached = self.tokens.load()
+            if cached:
+                self._use_tokens(cached)
+                log(self.log_fn, smi.EventWriter.INFO, "Reusing cached Sandfly API token")
+                return
+
+            self.login()
+
+    def login(self):
+        log(self.log_fn, smi.EventWriter.INFO, "Authenticating to Sandfly API")
+
+        url = f"{self.base_url}/v4/auth/login"
+        payload = {
+            "username": self.username,
+            "password": self.password,
+            "full_details": True,
+        }
+
+        try:
+            resp = self.session.post(
+                url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Unable to connect to Sandfly server: {e}")
+
+        if resp.status_code == 401:
+            raise RuntimeError("Authentication failed: invalid username or password")
+
+        if resp.status_code != 200:
+            raise RuntimeError(
+                f"Authentication failed (HTTP {resp.status_code}): {resp.text}"
+            )
+
+        data = resp.json()
+
+        access_token = data.get("access_token")
+        refresh_token = data.get("refresh_token")
+
+        if not access_token or not refresh_token:
+            raise RuntimeError("Authentication response missing access or refresh token")
+
+        self._validate_roles(data)
+
+        # Only tokens from a role-validated login are ever cached
+        record = self.tokens.record(access_token, refresh_token)
+        self._use_tokens(record)
+        self.tokens.store(record)
+
+        log(self.log_fn, smi.EventWriter.INFO, "Authentication and role validation successful")
+
+    def _use_tokens(self, record: Dict[str, Any]):
+        self.access_token = record["access_token"]
+        self.refresh_token = record.get("refresh_token") or self.refresh_token
+        self.token_expiry = record["expiry"]
+        self.token_issued = record.get("issued")
+
+    # -------------------------------------------------------------------------#
+    # Role validation
+    # -------------------------------------------------------------------------#
+    def _validate_roles(self, auth_response: Dict[str, Any]):
+        user = auth_response.get("user")
+        if not user:
+            raise RuntimeError("Authentication response missing user details")
+
+        roles = set(user.get("roles", []))
+        if not roles:
+            raise RuntimeError("User account has no roles assigned")
+
+        if not roles.intersection(REQUIRED_ROLES):
+            raise RuntimeError(
+                "Insufficient permissions: account must have at least ONE of "
+                + ", ".join(sorted(REQUIRED_ROLES))
+            )
+
+        log(
+            self.log_fn,
+            smi.EventWriter.INFO,
+            f"Validated roles: {', '.join(sorted(roles))}",
+        )
+
+    # -------------------------------------------------------------------------#
+    # Headers
+    # -------------------------------------------------------------------------#
+    def headers(self) -> Dict[str, str]:
+        # Refresh ahead of the real JWT expiry (with per-client jitter)
+        if self.tokens.should_refresh(self.token_expiry, self.token_issued):
+            with self._token_lock:
+                # Another worker may have refreshed while we waited
+                if self.tokens.should_refresh(self.token_expiry, self.token_issued):
+                    self._renew()
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    def _renew(self):
+        with self.tokens.locked():
+            # Another process may already have renewed this account's token
+            cached = self.tokens.load()
+            if cached and cached["access_token"] != self.access_token:
+                self._use_tokens(cached)
+                return
+
+            try:
+                self.refresh()
+            except Exception as e:
+                log(self.log_fn, smi.EventWriter.WARN, f"Token refresh failed ({e}); logging in again")
+                self.login()
+
+    # -------------------------------------------------------------------------#
+    # Token refresh
+    # -------------------------------------------------------------------------#
+    def refresh(self):
+        log(self.log_fn, smi.EventWriter.INFO, "Refreshing Sandfly API token")
+
+        url = f"{self.base_url}/v4/auth/refresh"
+        resp = self.session.post(
+            url,
+            headers={"Authorization": f"Bearer {self.refresh_token}"},
+            timeout=self.timeout,
+        )
+
+        if resp.status_code != 200:
+            raise RuntimeError("Token refresh failed")
+
+        data = resp.json()
+        if not data.get("access_token"):
+            raise RuntimeError("Token refresh response missing access token")
+
+        record = self.tokens.record(data["access_token"], data.get("refresh_token") or self.refresh_token)
+        self._use_tokens(record)
+        self.tokens.store(record)
+
+    def _refresh_after_401(self, rejected_token: Optional[str]):
+        with self._token_lock:
+            # Only the first worker to see the 401 renews
+            if self.access_token == rejected_token:
+                self._renew()
+
+    # -------------------------------------------------------------------------#
+    # Request wrapper
+    # -------------------------------------------------------------------------#
+    @contextlib.contextmanager
+    def deadline(self, stop_at: Optional[float]):
+        """
+        Give up on requests from this thread that the rate limiter cannot
+        admit before stop_at (epoch seconds; None = wait as long as needed).
+        They raise DeadlineExceededError without being sent.
+        """
+        previous = getattr(self._local, "stop_at", None)
+        self._local.stop_at = stop_at
+        try:
+            yield
+        finally:
+            self._local.stop_at = previous
+
+    def _request_once(self, method: str, url: str, payload, headers, stream: bool):
+        """One paced request, with breaker and rate limiter feedback."""
+        limiter, breaker = self.guard.limiter, self.guard.breaker
+
+        self._log_guard_change(breaker.before_request(self.base_url))
+        stop_at = getattr(self._local, "stop_at", None)
+        deadline = None if stop_at is None else time.monotonic() + (stop_at - time.time())
+        if not limiter.acquire(deadline):
+            raise DeadlineExceededError(self.base_url)
+
+        started = time.monotonic()
+        try:
+            resp = self.session.request(
+                method, url, json=payload, headers=headers, timeout=self.timeout, stream=stream
+            )
+        except requests.RequestException:
+            self._log_guard_change(breaker.record_failure())
+            raise
+
+        if resp.status_code in THROTTLE_STATUSES:
+            self._log_guard_change(breaker.record_throttle())
+            new_rate = limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+            if new_rate is not None:
+                log(
+                    self.log_fn,
+                    smi.EventWriter.WARN,
+                    f"Sandfly API throttled (HTTP {resp.status_code}); request rate lowered to {new_rate:.1f} req/s",
+                )
+        elif resp.status_code >= 500:
+            self._log_guard_change(breaker.record_failure())
+        else:
+            self._log_guard_change(breaker.record_success())
+            if resp.status_code < 400:
+                new_rate = limiter.on_success(time.monotonic() - started)
+                if new_rate is not None:
+                    log(
+                        self.log_fn,
+                        smi.EventWriter.INFO,
+                        f"Sandfly API responding slowly; request rate lowered to {new_rate:.1f} req/s",
+                    )
+        return resp
+
+    def _log_guard_change(self, state: Optional[str]):
+        if state is None:
+            return
+        level = smi.EventWriter.ERROR if state == CircuitBreaker.OPEN else smi.EventWriter.INFO
+        log(self.log_fn, level, f"Sandfly API circuit breaker {state} for {self.base_url}")
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]],
+        stream: bool = False,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ):
+        url = f"{self.base_url}{path}"
+        extra_headers = extra_headers or {}
+        started = time.perf_counter()
+        retries = 0
+        reset_connection_timing()
+
+        try:
+            for attempt in range(MAX_THROTTLE_RETRIES + 1):
+                headers = self.headers()
+                resp = self._request_once(method, url, payload, dict(headers, **extra_headers), stream)
+
+                if resp.status_code == 401:
+                    resp.close()
+                    retries += 1
+                    self._refresh_after_401(headers["Authorization"][len("Bearer "):])
+                    resp = self._request_once(method, url, payload, dict(self.headers(), **extra_headers), stream)
+
+                # The limiter has already paused/slowed every caller; just retry
+                if resp.status_code in THROTTLE_STATUSES and attempt < MAX_THROTTLE_RETRIES:
+                    resp.close()
+                    retries += 1
+                    continue
+                break
+        except Exception as e:
+            self._record(method, path, started, retries, None, error=str(e))
+            raise
+
+        # Connections are opened before the headers arrive, so this is final
+        resp.sandfly_timing = (started, retries, connection_timing())
+
+        if resp.status_code == 429:
+            resp.close()
+            self._record(method, path, started, retries, resp, error="rate limited")
+            raise RateLimitedError(path, parse_retry_after(resp.headers.get("Retry-After")))
+
+        if resp.status_code == 503:
+            self._log_guard_change(self.guard.breaker.record_failure())
+
+        # 304 only ever answers a conditional request: "unchanged"
+        if resp.status_code == 304 and extra_headers:
+            return resp
+
+        if resp.status_code != 200:
+            resp.close()
+            self._record(method, path, started, retries, resp, error=f"HTTP {resp.status_code}")
+            raise RuntimeError(
+                f"API {method} failed ({path}): HTTP {resp.status_code}"
+            )
+
+        return resp
+
+    def _record(
+        self,
+        method: str,
+        path: str,
+        started: float,
+        retries: int,
+        resp,
+        items: Optional[int] = None,
+        error: Optional[str] = None,
+    ):
+        """Hand one request's timing to the telemetry recorder, if any."""
+        if self.telemetry is None:
+            return
+
+        timing = getattr(resp, "sandfly_timing", None)
+        connect_seconds, new_connections = timing[2] if timing else connection_timing()
+        raw = getattr(resp, "raw", None)
+        adapter_retries = getattr(raw, "retries", None)
+
+        self.telemetry.record_request(
+            {
+                "method": method,
+                "path": path,
+                "status": resp.status_code if resp is not None else None,
+                "connect_ms": ms(connect_seconds),
+                "new_connections": new_connections,
+                "ttfb_ms": ms(resp.elapsed.total_seconds()) if resp is not None else None,
+                "total_ms": ms(time.perf_counter() - started),
+                # Bytes on the wire (before any content decoding)
+                "bytes": raw.tell() if raw is not None else 0,
+                "items": items,
+                "retries": retries + (len(adapter_retries.history) if adapter_retries else 0),
+                "error": error,
+            }
+        )
+
+    def log_pacing(self):
+        """Log the server's current request rate, throttle counts and breaker state."""
+        quiet = self.guard.breaker.state == CircuitBreaker.CLOSED and not self.guard.limiter.throttled
+        level = smi.EventWriter.INFO if quiet else smi.EventWriter.WARN
+        log(self.log_fn, level, f"Sandfly API pacing for {self.base_url}: {self.guard.summary()}")
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+        with self._slot:
+            resp = self._send(method, path, payload)
+            data = loads(resp.content)
+            started, retries, _ = resp.sandfly_timing
+            self._record(
+                method, path, started, retries, resp, items=len(data) if isinstance(data, list) else 1
+            )
+            return data
+
+    def get(self, path: str) -> Any:
+        return self.request("GET", path)
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Any:
+        return self.request("POST", path, payload)
+
+    # -------------------------------------------------------------------------#
+    # Streaming / pagination
+    # -------------------------------------------------------------------------#
+    def iter_items(
+        self,
+        path: str,
+        method: str = "GET",
+        payload: Optional[Dict[str, Any]] = None,
+        validators: Optional["Validators"] = None,
+    ) -> Iterator[Any]:
+        """
+        Yield the records of one response as the body streams in.
+
+        The body is never fully buffered or decoded in one piece, so peak
+        memory is bounded by a single record rather than the response.
+        With orjson available, bodies that decode (after gzip) to at most
+        FAST_DECODE_MAX_BYTES are instead read and decoded in one pass.
+
+        With `validators`, the request is conditional: a 304 yields nothing
+        and sets validators.not_modified; a 200 refreshes the validators.
+        """
+        extra_headers = validators.request_headers() if validators is not None else None
+        with self._slot:
+            resp = self._send(method, path, payload, stream=True, extra_headers=extra_headers)
+            started, retries, _ = resp.sandfly_timing
+            if validators is not None:
+                validators.update(resp)
+            if resp.status_code == 304:
+                self._record(method, path, started, retries, resp, items=0)
+                resp.close()
+                return
+
+            items = 0
+            error = None
+            try:
+                chunks = resp.iter_content(chunk_size=READ_SIZE)
+                records = iter_body_records(chunks) if decode_whole(resp) else iter_json_records(chunks)
+                for item in records:
+                    items += 1
+                    yield item
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                self._record(method, path, started, retries, resp, items=items, error=error)
+                resp.close()
+
+    def iter_pages(
+        self,
+        path: str,
+        next_query: Callable[[], Optional[Dict[str, Any]]],
+        page_size: int,
+    ) -> Iterator["Page"]:
+        """
+        Yield one streamed Page per POST until a short page is returned.
+
+        next_query() is called before each request and builds the body from
+        the caller's current cursor (or returns None to stop). Each Page
+        must be consumed before the next one is requested.
+        """
+        while True:
+            query = next_query()
+            if query is None:
+                return
+
+            page = Page(self.iter_items(path, "POST", query))
+            yield page
+
+            # Drain whatever the caller did not read so the count is exact
+            # and the connection returns to the pool.
+            for _ in page:
+                pass
+
+            if page.count < page_size:
+                return
+
+
+def decode_whole(resp) -> bool:
+    """
+    True if the body may be small enough to decode in one orjson pass.
+
+    Only an uncompressed Content-Length rules that out up front; for a
+    compressed or unsized body iter_body_records() checks the decoded size.
+    """
+    if orjson is None:
+        return False
+    # Content-Length is then the compressed size, which says nothing about
+    # the decoded one
+    if resp.headers.get("Content-Encoding", "identity").strip().lower() != "identity":
+        return True
+    try:
+        length = int(resp.headers.get("Content-Length", ""))
+    except ValueError:
+        return True
+    return length <= FAST_DECODE_MAX_BYTES
+
+
+class Validators:
+    """
+    HTTP cache validators for one endpoint, persisted between cycles.
+
+    Round-trips through to_dict()/from_dict() so it can live in the
+    stanza's checkpoint.
+    """
+
+    def __init__(self, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = False
+
+    @classmethod
+    def from_dict(cls, state: Optional[Dict[str, Any]]) -> "Validators":
+        state = state or {}
+        return cls(state.get("etag"), state.get("last_modified"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in (("etag", self.etag), ("last_modified", self.last_modified)) if v}
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, resp):
+        self.not_modified = resp.status_code == 304
+        if resp.status_code == 200:
+            self.etag = resp.headers.get("ETag")
+            self.last_modified = resp.headers.get("Last-Modified")
+
+
+class Page:
+    """Single-use iterator over one page of records that counts as it goes."""
+
+    def __init__(self, records: Iterator[Any]):
+        self._records = records
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        record = next(self._records)
+        self.count += 1
+        return record
+
+
+# -----------------------------------------------------------------------------#
+# Connection validation (setup page, input validation)
+# -----------------------------------------------------------------------------#
+def validate_connection(
+    sandfly_url: Optional[str],
+    username: Optional[str],
+    password: Optional[str],
+    verify_ssl=True,
+    timeout: int = DEFAULT_TIMEOUT,
+    proxy_url: Optional[str] = None,
+    proxy_user: Optional[str] = None,
+    proxy_pass: Optional[str] = None,
+    check_proxy: bool = False,
+    log_fn=None,
+) -> Dict[str, Any]:
+    """
+    Log in, validate roles and probe GET /v4/version on one session.
+
+    Always performs a fresh login (never a cached token) so role changes
+    are caught. Raises ValueError with a user-facing message; returns the
+    /v4/version response on success.
+    """
+    if not sandfly_url:
+        raise ValueError("Sandfly URL is required")
+
+    if not username or not password:
+        raise ValueError("Username and password are required")
+
+    api = SandflyAPI(
+        base_url=sandfly_url,
+        username=username,
+        password=password,
+        log_fn=log_fn or (lambda *_: None),
+        verify_ssl=verify_ssl,
+        timeout=int(timeout or DEFAULT_TIMEOUT),
+        proxy_url=proxy_url,
+        proxy_user=proxy_user,
+        proxy_pass=proxy_pass,
+        pool_size=1,
+        connect=False,
+    )
+
+    if check_proxy and proxy_url:
+        try:
+            # Lightweight connectivity test via HEAD (same pooled connection)
+            api.session.head(api.base_url, timeout=api.timeout)
+        except Exception as e:
+            raise ValueError(f"Proxy connection failed: {e}")
+
+    try:
+        api.login()
+    except RuntimeError as e:
+        raise ValueError(str(e))
+
+    try:
+        return api.get("/v4/version")
+    except RuntimeError as e:
+        raise ValueError(f"Sandfly API validation failed: {e}")
+    except Exception as e:
+        raise ValueError(f"Failed to reach Sandfly API (/v4/version): {e}")
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_collectors.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Map each collect_* flag in inputs.conf to a Sandfly endpoint + sourcetype
+# - Run enabled collectors concurrently on a bounded thread pool
+# - Share the single authenticated SandflyAPI session across workers
+# - Record per-request and per-collector telemetry (sandfly:telemetry)
+#
+# Design principles:
+# - Read-only API usage
+# - One failing collector never stops the others
+# - Events are written from one place, under a lock
+# - Splunk-supported logging levels ONLY
+# =============================================================================
+
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import splunklib.modularinput as smi
+
+from sandfly_aggregate import DEFAULT_TIMELINE_SPAN, ResultAggregator
+from sandfly_client import Validators
+from sandfly_dedup import DEFAULT_DEDUP_CAPACITY, RecentSet
+from sandfly_delta import DEFAULT_FULL_SNAPSHOT_INTERVAL, SnapshotDelta, apply_delta
+from sandfly_errors import DeadlineExceededError
+from sandfly_fields import flatten_key_fields
+from sandfly_hostdetails import (
+    DEFAULT_HOST_DETAIL_DEADLINE,
+    DEFAULT_HOST_DETAIL_THREADS,
+    HOST_DETAILS,
+    HostDetailFanOut,
+    host_id_of,
+)
+from sandfly_json import dumps
+from sandfly_kvstore import StateSnapshot, StateWriter
+from sandfly_reports import REPORTS, report_children, with_report_id
+from sandfly_results import DEFAULT_BACKFILL_HOURS, DEFAULT_PAGE_SIZE, collect_results_incremental
+from sandfly_telemetry import TELEMETRY_SOURCETYPE, TelemetryRecorder, ms, telemetry_scope
+from sandfly_time import event_time
+from sandfly_writer import BulkEventWriter
+
+
+DEFAULT_COLLECTOR_THREADS = 8
+MAX_COLLECTOR_THREADS = 32
+
+_NO_RECORD = object()
+
+
+# -----------------------------------------------------------------------------#
+# Logging helper
+# -----------------------------------------------------------------------------#
+def log(log_fn, level, msg):
+    log_fn(level, msg)
+
+
+def is_enabled(value) -> bool:
+    """Interpret a Splunk boolean parameter value."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes", "y", "on")
+
+
+# -----------------------------------------------------------------------------#
+# Collector registry
+# -----------------------------------------------------------------------------#
+class Collector:
+    """One collect_* flag and the endpoint/sourcetype it feeds."""
+
+    def __init__(
+        self,
+        flag: str,
+        path: str,
+        sourcetype: str,
+        method: str = "GET",
+        payload: Optional[Dict[str, Any]] = None,
+        mode: str = "snapshot",
+        delta: bool = False,
+        dedup: bool = False,
+    ):
+        self.flag = flag
+        self.path = path
+        self.sourcetype = sourcetype
+        self.method = method
+        self.payload = payload
+        # "snapshot": full pull every cycle
+        # "incremental": checkpointed high-water mark pull
+        self.mode = mode
+        # Snapshot collectors whose objects rarely change only index
+        # new/changed objects (see sandfly_delta.py)
+        self.delta = delta
+        # Log streams re-pulled with overlap drop records seen recently
+        # (see sandfly_dedup.py)
+        self.dedup = dedup
+
+    @property
+    def name(self) -> str:
+        return self.flag[len("collect_"):]
+
+
+COLLECTORS: List[Collector] = [
+    # Inventory (snapshot-style)
+    Collector("collect_hosts", "/v4/hosts", "sandfly:hosts", delta=True),
+    Collector("collect_sandflies", "/v4/sandflies", "sandfly:sandflies", delta=True),
+    Collector("collect_jumphosts", "/v4/jumphosts", "sandfly:jumphosts", delta=True),
+    Collector("collect_credentials", "/v4/credentials", "sandfly:credentials", delta=True),
+    Collector("collect_savedviews", "/v4/savedviews", "sandfly:savedviews", delta=True),
+    Collector("collect_notifications", "/v4/notifications", "sandfly:notifications", delta=True),
+    # Streaming / result-based
+    Collector("collect_results", "/v4/results", "sandfly:results", "POST", mode="incremental"),
+    Collector("collect_results_summary", "/v4/results", "sandfly:results:summary", "POST", {"summary": True}),
+    Collector("collect_results_timeline", "/v4/results/timeline", "sandfly:results:timeline", "POST", {}),
+    # SSH Hunter
+    Collector("collect_sshhunter_summary", "/v4/sshhunter/summary", "sandfly:sshhunter:summary"),
+    Collector("collect_sshhunter_minisummary", "/v4/sshhunter/minisummary", "sandfly:sshhunter:minisummary"),
+    Collector("collect_sshhunter_keys", "/v4/sshhunter/keys", "sandfly:sshhunter:keys"),
+    Collector("collect_sshhunter_users", "/v4/sshhunter/users", "sandfly:sshhunter:users"),
+    Collector("collect_sshhunter_hosts", "/v4/sshhunter/hosts", "sandfly:sshhunter:hosts"),
+    # Reporting
+    Collector("collect_reports_host_snapshot", "/v4/reports/host_snapshot", "sandfly:report:host_snapshot"),
+    Collector("collect_reports_scan_performance", "/v4/reports/scan_performance", "sandfly:report:scan_performance"),
+    # Audit and logging: no time window or monotonic id to narrow the
+    # pull by, so repeats are dropped by the dedup filter instead
+    Collector("collect_audit", "/v4/audit", "sandfly:audit", dedup=True),
+    Collector("collect_logs_error", "/v4/logs/error", "sandfly:logs:error", dedup=True),
+    # Configuration visibility (read-only)
+    Collector("collect_config", "/v4/config", "sandfly:config", delta=True),
+    Collector("collect_license", "/v4/license", "sandfly:license", delta=True),
+    Collector("collect_version", "/v4/version", "sandfly:version"),
+]
+
+COLLECTOR_FLAGS = [c.flag for c in COLLECTORS]
+
+# Built from the collect_results stream when both are enabled (sandfly_aggregate.py)
+DERIVED_RESULT_FLAGS = ("collect_results_summary", "collect_results_timeline")
+
+
+def enabled_collectors(params: Dict[str, Any]) -> List[Collector]:
+    """Collectors whose flag is set in the stanza (missing flags are off)."""
+    return [c for c in COLLECTORS if is_enabled(params.get(c.flag, False))]
+
+
+# -----------------------------------------------------------------------------#
+# Collector engine
+# -----------------------------------------------------------------------------#
+class CollectorEngine:
+    """
+    Run the enabled collectors for one stanza on a bounded thread pool.
+
+    All workers share the same SandflyAPI (and therefore the same pooled,
+    authenticated requests.Session). Events go through one BulkEventWriter,
+    which batches and serialises them.
+    """
+
+    def __init__(
+        self,
+        api,
+        ew,
+        stanza: str,
+        params: Dict[str, Any],
+        max_workers: int = DEFAULT_COLLECTOR_THREADS,
+        checkpoint=None,
+        writer: Optional[BulkEventWriter] = None,
+        deadline: Optional[float] = None,
+        state_writers: Optional[Dict[str, StateWriter]] = None,
+    ):
+        self.api = api
+        self.ew = ew
+        self.stanza = stanza
+        self.params = params
+        self.index = params.get("index") or None
+        self.max_workers = max(1, min(int(max_workers), MAX_COLLECTOR_THREADS))
+        self.checkpoint = checkpoint
+        # Epoch seconds; collectors not started by then are skipped
+        self.deadline = deadline
+
+        # Shared by every stanza writing to the same EventWriter
+        self.writer = writer or BulkEventWriter(ew)
+        # KV store current-state writers by collector name (sandfly_kvstore.py)
+        self.state_writers = state_writers or {}
+        # Flags of the result aggregates derived locally this run
+        self.derived_flags: List[str] = []
+
+        self.telemetry = None
+        if is_enabled(params.get("telemetry", True)):
+            self.telemetry = TelemetryRecorder(lambda record: self.emit(TELEMETRY_SOURCETYPE, record), stanza)
+        api.telemetry = self.telemetry
+
+    # -------------------------------------------------------------------------#
+    # Event output
+    # -------------------------------------------------------------------------#
+    def emit(self, sourcetype: str, record: Any):
+        record = flatten_key_fields(sourcetype, record)
+        self.writer.write(
+            dumps(record),
+            stanza=self.stanza,
+            sourcetype=sourcetype,
+            index=self.index,
+            time=event_time(sourcetype, record),
+        )
+
+    def emit_record(self, sourcetype: str, record: Any):
+        """Emit one collected record, plus the flat children of a report."""
+        if sourcetype in REPORTS and isinstance(record, dict):
+            record = with_report_id(record)
+            self.emit(sourcetype, record)
+            for child_sourcetype, child in report_children(sourcetype, record):
+                self.emit(child_sourcetype, child)
+            return
+        self.emit(sourcetype, record)
+
+    # -------------------------------------------------------------------------#
+    # Single collector
+    # -------------------------------------------------------------------------#
+    def run_collector(self, collector: Collector) -> Optional[int]:
+        if self.deadline is not None and time.time() >= self.deadline:
+            return None
+
+        try:
+            with self.api.deadline(self.deadline), telemetry_scope(self.telemetry, collector.name) as scope:
+                count = self._run_collector(collector)
+                if scope is not None:
+                    scope.events = count
+                return count
+        finally:
+            self.writer.flush()
+
+    def _run_collector(self, collector: Collector) -> int:
+        if collector.mode == "incremental":
+            return self.run_incremental(collector)
+
+        payload = (collector.payload or {}) if collector.method == "POST" else None
+
+        # The hosts collector feeds the per-host detail fan-out
+        details = self.enabled_host_details() if collector.flag == "collect_hosts" else []
+        host_ids: List[str] = []
+        state = self.state_snapshot(collector)
+
+        def on_record(item):
+            if details:
+                host_id = host_id_of(item)
+                if host_id:
+                    host_ids.append(host_id)
+            if state is not None:
+                state.observe(item)
+
+        delta = self.snapshot_delta(collector)
+        validators = self.validators_for(collector, delta, details, state)
+
+        records = iter(self.api.iter_items(collector.path, collector.method, payload, validators=validators))
+        # Pull the first record so the response status is known before the
+        # delta sees an (apparently empty) snapshot
+        first = next(records, _NO_RECORD)
+        if validators is not None and validators.not_modified:
+            log(self.ew.log, smi.EventWriter.INFO, f"Stanza '{self.stanza}': {collector.name} not modified")
+            return 0
+        if first is not _NO_RECORD:
+            records = itertools.chain([first], records)
+
+        seen = self.recent_set(collector)
+        if seen is not None:
+            records = (item for item in records if seen.add(item))
+
+        # Records are written as they are decoded; the response is never
+        # held in memory as a whole.
+        count = apply_delta(
+            delta,
+            records,
+            emit=lambda item: self.emit_record(collector.sourcetype, item),
+            on_record=on_record if details or state is not None else None,
+            flush=self.writer.flush,
+        )
+        # Everything below records the body as indexed
+        self.writer.flush()
+
+        if state is not None:
+            state.commit()
+            level = smi.EventWriter.WARN if state.error is not None else smi.EventWriter.INFO
+            log(self.ew.log, level, f"Stanza '{self.stanza}': {collector.name} {state.summary()}")
+
+        # Validators and the seen set only become durable once the body
+        # was fully written
+        if validators is not None:
+            self.checkpoint.set(f"validators:{collector.name}", validators.to_dict())
+            self.checkpoint.save()
+        if seen is not None:
+            seen.commit()
+            log(self.ew.log, smi.EventWriter.INFO, f"Stanza '{self.stanza}': {collector.name} {seen.summary()}")
+            if seen.overflowed:
+                log(
+                    self.ew.log,
+                    smi.EventWriter.WARN,
+                    f"Stanza '{self.stanza}': {collector.name} returned more records than dedup_capacity "
+                    f"({seen.capacity}); raise it or some repeats will be indexed again",
+                )
+
+        if delta is not None:
+            log(self.ew.log, smi.EventWriter.INFO, f"Stanza '{self.stanza}': {collector.name} {delta.summary()}")
+
+        if details:
+            self.run_host_details(details, host_ids)
+
+        return count
+
+    def validators_for(
+        self, collector: Collector, delta: Optional[SnapshotDelta], details, state: Optional[StateSnapshot] = None
+    ) -> Optional[Validators]:
+        """
+        Cache validators for a conditional GET, or None to fetch in full.
+
+        Never conditional when the body is needed regardless: the hosts list
+        feeding the host detail fan-out, current-state rows not yet synced
+        by this process, or a due full snapshot.
+        """
+        if collector.method != "GET" or self.checkpoint is None or details:
+            return None
+        if state is not None and not state.writer.primed:
+            return None
+        if not is_enabled(self.params.get("conditional_requests", True)):
+            return None
+        if delta is not None and delta.full:
+            return Validators()
+        return Validators.from_dict(self.checkpoint.get(f"validators:{collector.name}"))
+
+    def recent_set(self, collector: Collector) -> Optional[RecentSet]:
+        if not collector.dedup or self.checkpoint is None:
+            return None
+        capacity = self.params.get("dedup_capacity")
+        capacity = int(float(capacity)) if capacity not in (None, "") else DEFAULT_DEDUP_CAPACITY
+        if capacity <= 0:
+            return None
+        return RecentSet(self.checkpoint.checkpoint_dir, self.stanza, collector.name, capacity)
+
+    def state_snapshot(self, collector: Collector) -> Optional[StateSnapshot]:
+        writer = self.state_writers.get(collector.name)
+        if writer is None or not is_enabled(self.params.get("current_state", True)):
+            return None
+        try:
+            return writer.begin()
+        except Exception as e:
+            log(
+                self.ew.log,
+                smi.EventWriter.WARN,
+                f"Stanza '{self.stanza}': {collector.name} current state unavailable: {e}",
+            )
+            return None
+
+    def snapshot_delta(self, collector: Collector) -> Optional[SnapshotDelta]:
+        if not collector.delta or self.checkpoint is None:
+            return None
+        if not is_enabled(self.params.get("delta_snapshots", True)):
+            return None
+
+        interval = self.params.get("snapshot_full_interval")
+        return SnapshotDelta(
+            self.checkpoint.checkpoint_dir,
+            self.stanza,
+            collector.name,
+            full_interval=float(interval if interval not in (None, "") else DEFAULT_FULL_SNAPSHOT_INTERVAL),
+        )
+
+    # -------------------------------------------------------------------------#
+    # Per-host detail fan-out
+    # -------------------------------------------------------------------------#
+    def enabled_host_details(self):
+        return [d for d in HOST_DETAILS if is_enabled(self.params.get(d.flag, False))]
+
+    def run_host_details(self, details, host_ids: List[str]):
+        HostDetailFanOut(
+            self.api,
+            details,
+            emit=self.emit,
+            log_fn=self.ew.log,
+            threads=int(self.params.get("host_detail_threads") or DEFAULT_HOST_DETAIL_THREADS),
+            deadline=self.host_detail_deadline(),
+            telemetry=self.telemetry,
+            max_rate=self.api.guard.limiter.max_rate,
+        ).run(host_ids)
+
+    def host_detail_deadline(self) -> float:
+        deadline = float(self.params.get("host_detail_deadline") or DEFAULT_HOST_DETAIL_DEADLINE)
+        if self.deadline is not None:
+            deadline = max(0.0, min(deadline, self.deadline - time.time()))
+        return deadline
+
+    def run_incremental(self, collector: Collector) -> int:
+        if self.checkpoint is None:
+            raise RuntimeError("incremental collection requires a checkpoint directory")
+
+        aggregator = None
+        if self.derived_flags:
+            aggregator = ResultAggregator(
+                summary="collect_results_summary" in self.derived_flags,
+                timeline="collect_results_timeline" in self.derived_flags,
+                span=int(self.params.get("results_timeline_span") or DEFAULT_TIMELINE_SPAN),
+            )
+
+        def emit(record):
+            self.emit(collector.sourcetype, record)
+            if aggregator is not None:
+                aggregator.add(record)
+
+        try:
+            return collect_results_incremental(
+                iter_pages=lambda next_query, page_size: self.api.iter_pages(collector.path, next_query, page_size),
+                checkpoint=self.checkpoint,
+                emit=emit,
+                log_fn=self.ew.log,
+                page_size=int(self.params.get("results_page_size") or DEFAULT_PAGE_SIZE),
+                backfill_hours=int(self.params.get("results_backfill_hours") or DEFAULT_BACKFILL_HOURS),
+                flush=self.writer.flush,
+                on_flush=self.writer.on_flush,
+            )
+        finally:
+            # Pages already written are checkpointed, so their counts are
+            # written even when a later page fails
+            if aggregator is not None and aggregator.results:
+                derived = 0
+                for sourcetype, record in aggregator.events():
+                    self.emit(sourcetype, record)
+                    derived += 1
+                log(
+                    self.ew.log,
+                    smi.EventWriter.INFO,
+                    f"Stanza '{self.stanza}': {derived} summary/timeline events derived "
+                    f"from {aggregator.results} results",
+                )
+
+    def derive_result_aggregates(self, collectors: List[Collector]) -> List[Collector]:
+        """
+        Drop the summary/timeline collectors that the results collector
+        can derive this run; return the collectors left to run.
+        """
+        self.derived_flags = []
+        flags = {c.flag for c in collectors}
+        if (
+            "collect_results" not in flags
+            or self.checkpoint is None
+            or not is_enabled(self.params.get("derive_results_aggregates", True))
+        ):
+            return collectors
+        self.derived_flags = [flag for flag in DERIVED_RESULT_FLAGS if flag in flags]
+        return [c for c in collectors if c.flag not in self.derived_flags]
+
+    # -------------------------------------------------------------------------#
+    # All enabled collectors
+    # -------------------------------------------------------------------------#
+    def run(self, collectors: Optional[List[Collector]] = None) -> Dict[str, int]:
+        collectors = enabled_collectors(self.params) if collectors is None else collectors
+        collectors = self.derive_result_aggregates(collectors)
+        if not collectors:
+            log(self.ew.log, smi.EventWriter.WARN, f"Stanza '{self.stanza}': no collectors enabled")
+            return {}
+
+        workers = min(self.max_workers, len(collectors))
+        log(
+            self.ew.log,
+            smi.EventWriter.INFO,
+            f"Stanza '{self.stanza}': running {len(collectors)} collectors on {workers} threads",
+        )
+
+        counts: Dict[str, int] = {}
+        skipped = 0
+        started = time.time()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sandfly-collector") as pool:
+            futures = {pool.submit(self.run_collector, c): c for c in collectors}
+
+            for future in as_completed(futures):
+                collector = futures[future]
+                try:
+                    count = future.result()
+                except DeadlineExceededError:
+                    skipped += 1
+                    log(
+                        self.ew.log,
+                        smi.EventWriter.WARN,
+                        f"Stanza '{self.stanza}': collector '{collector.name}' stopped, run deadline reached",
+                    )
+                    continue
+                except Exception as e:
+                    log(
+                        self.ew.log,
+                        smi.EventWriter.ERROR,
+                        f"Stanza '{self.stanza}': collector '{collector.name}' failed: {e}",
+                    )
+                    continue
+
+                if count is None:
+                    skipped += 1
+                    log(
+                        self.ew.log,
+                        smi.EventWriter.WARN,
+                        f"Stanza '{self.stanza}': collector '{collector.name}' skipped, run deadline reached",
+                    )
+                    continue
+                counts[collector.name] = count
+
+                log(
+                    self.ew.log,
+                    smi.EventWriter.INFO,
+                    f"Stanza '{self.stanza}': collector '{collector.name}' "
+                    f"wrote {counts[collector.name]} events",
+                )
+
+        elapsed = time.time() - started
+        log(
+            self.ew.log,
+            smi.EventWriter.INFO,
+            f"Stanza '{self.stanza}': {len(counts)}/{len(collectors)} collectors succeeded "
+            f"in {elapsed:.1f}s",
+        )
+
+        if self.telemetry is not None:
+            self.telemetry.flush()
+            self.telemetry.emit("run", self.run_summary(collectors, counts, skipped, elapsed))
+        self.writer.flush()
+        return counts
+
+    def run_summary(
+        self, collectors: List[Collector], counts: Dict[str, int], skipped: int, elapsed: float
+    ) -> Dict[str, Any]:
+        interval = self.params.get("interval")
+        try:
+            interval = float(interval)
+        except (TypeError, ValueError):
+            interval = None
+
+        limiter, breaker = self.api.guard.limiter, self.api.guard.breaker
+        return {
+            "duration_ms": ms(elapsed),
+            "interval": interval,
+            # How much of the polling interval this cycle used (>100 = overrun)
+            "interval_used_pct": round(100.0 * elapsed / interval, 1) if interval else None,
+            "collectors": len(collectors),
+            "succeeded": len(counts),
+            "failed": len(collectors) - len(counts) - skipped,
+            "skipped": skipped,
+            "events": sum(counts.values()),
+            "collector_threads": self.max_workers,
+            "api_rate": round(limiter.rate, 2),
+            "api_throttled": limiter.throttled,
+            "breaker_state": breaker.state,
+        }
+
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_dedup.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Drop records already indexed by an earlier, overlapping pull of a log
+#   stream (sandfly:audit, sandfly:logs:error), whose endpoints take no
+#   time window and have no monotonic id to checkpoint
+#
+# Design principles:
+# - A rotating Bloom filter per stanza/collector: a fixed number of
+#   fixed-size generations, so memory and checkpoint size never depend
+#   on how fast logs arrive
+# - Records are inserted into the newest generation; when it holds
+#   `capacity` records the oldest generation is dropped. Everything seen
+#   in the last `capacity` records is always remembered
+# - A repeat found only in an older generation is inserted again into the
+#   newest, so records every overlapping pull returns stay remembered as
+#   long as one pull holds no more than `capacity` records
+# - Constant cost per record: one hash of the canonical JSON and
+#   HASH_COUNT bit probes per generation
+# - A false positive drops a record that was never indexed; the filter is
+#   sized for FALSE_POSITIVE_RATE at full capacity
+# - State is only committed after the pull was fully written; a crash
+#   re-indexes rather than loses
+# =============================================================================
+
+import hashlib
+import math
+import os
+import struct
+from typing import Any, List
+
+from sandfly_checkpoint import atomic_write, checkpoint_filename
+from sandfly_delta import canonical_bytes
+
+
+DEFAULT_DEDUP_CAPACITY = 200000
+GENERATIONS = 2
+FALSE_POSITIVE_RATE = 1e-6
+
+_MAGIC = b"SFBF1"
+_HEADER = struct.Struct("<5sIIII")
+_COUNT = struct.Struct("<I")
+
+
+def filter_bits(capacity: int, rate: float = FALSE_POSITIVE_RATE) -> int:
+    """Bloom filter size in bits for `capacity` entries, rounded up to bytes."""
+    bits = int(math.ceil(-capacity * math.log(rate) / (math.log(2) ** 2)))
+    return max(8, (bits + 7) // 8 * 8)
+
+
+def hash_count(bits: int, capacity: int) -> int:
+    return max(1, int(round(bits / capacity * math.log(2))))
+
+
+class RecentSet:
+    """
+    Recently seen records of one stanza/collector, persisted in the
+    checkpoint directory.
+
+    Usage per pull:
+        seen = RecentSet(checkpoint_dir, stanza, "audit", capacity)
+        for record in records:
+            if seen.add(record):
+                emit(record)
+        seen.commit()
+    """
+
+    def __init__(self, checkpoint_dir: str, stanza: str, name: str, capacity: int = DEFAULT_DEDUP_CAPACITY):
+        self.path = os.path.join(checkpoint_dir, checkpoint_filename(f"{stanza}#{name}", "seen.bin"))
+        self.checkpoint_dir = checkpoint_dir
+        self.capacity = max(1, int(capacity))
+        self.bits = filter_bits(self.capacity)
+        self.hashes = hash_count(self.bits, self.capacity)
+
+        # Newest generation last
+        self._filters: List[bytearray] = []
+        self._count = 0
+        self._load()
+
+        self.added = 0
+        self.repeats = 0
+
+    # -------------------------------------------------------------------------#
+    # Persistence
+    # -------------------------------------------------------------------------#
+    def _fresh(self):
+        size = self.bits // 8
+        self._filters = [bytearray(size) for _ in range(GENERATIONS)]
+        self._count = 0
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as fh:
+                blob = fh.read()
+        except OSError:
+            self._fresh()
+            return
+
+        size = self.bits // 8
+        expected = _HEADER.size + _COUNT.size + GENERATIONS * size
+        if len(blob) != expected:
+            self._fresh()
+            return
+        magic, capacity, bits, hashes, generations = _HEADER.unpack_from(blob)
+        if (magic, capacity, bits, hashes, generations) != (
+            _MAGIC, self.capacity, self.bits, self.hashes, GENERATIONS
+        ):
+            # Different capacity or format: start over rather than misread
+            self._fresh()
+            return
+
+        (self._count,) = _COUNT.unpack_from(blob, _HEADER.size)
+        offset = _HEADER.size + _COUNT.size
+        self._filters = [bytearray(blob[offset + n * size:offset + (n + 1) * size]) for n in range(GENERATIONS)]
+
+    def commit(self):
+        header = _HEADER.pack(_MAGIC, self.capacity, self.bits, self.hashes, GENERATIONS)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        atomic_write(self.path, b"".join([header, _COUNT.pack(self._count)] + [bytes(f) for f in self._filters]))
+
+    # -------------------------------------------------------------------------#
+    # Membership
+    # -------------------------------------------------------------------------#
+    def _positions(self, record: Any) -> List[int]:
+        digest = hashlib.blake2b(canonical_bytes(record), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    @staticmethod
+    def _contains(bloom: bytearray, positions: List[int]) -> bool:
+        for position in positions:
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, record: Any) -> bool:
+        """Remember the record; True if it was not seen recently."""
+        positions = self._positions(record)
+        if self._contains(self._filters[-1], positions):
+            self.repeats += 1
+            return False
+
+        # Seen only in an older generation: refresh it into the newest, so
+        # a record that every pull returns again is never forgotten
+        known = any(self._contains(bloom, positions) for bloom in self._filters[:-1])
+        self._insert(positions)
+        if known:
+            self.repeats += 1
+            return False
+        self.added += 1
+        return True
+
+    def _insert(self, positions: List[int]):
+        if self._count >= self.capacity:
+            self._filters = self._filters[1:] + [bytearray(self.bits // 8)]
+            self._count = 0
+        newest = self._filters[-1]
+        for position in positions:
+            newest[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    @property
+    def overflowed(self) -> bool:
+        """True if this pull returned more records than the filter remembers."""
+        return self.added + self.repeats > self.capacity
+
+    def summary(self) -> str:
+        return f"{self.added} new, {self.repeats} repeats dropped"
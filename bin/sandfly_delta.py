@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_delta.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Change detection for snapshot-style collectors
+# - Index only new or changed objects, plus a tombstone for deleted ones
+# - Periodic full snapshots so "latest(*) by id" searches stay correct
+#
+# Design principles:
+# - One compact digest map (object id -> content hash) per stanza/collector
+# - Hash of canonical JSON (sorted keys, compact separators)
+# - The digest map is only committed after the whole snapshot was written
+# =============================================================================
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sandfly_checkpoint import atomic_write, checkpoint_filename
+
+
+DEFAULT_FULL_SNAPSHOT_INTERVAL = 86400
+
+# Identity fields tried in order; single-object endpoints (config, license)
+# have none and are tracked under SINGLETON_ID.
+ID_FIELDS = ("host_id", "id", "name")
+SINGLETON_ID = "_singleton"
+
+
+def canonical_bytes(record: Any) -> bytes:
+    """Key-order independent JSON encoding, for hashing."""
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_digest(record: Any) -> str:
+    return hashlib.blake2b(canonical_bytes(record), digest_size=10).hexdigest()
+
+
+def object_key(record: Any) -> Tuple[str, str]:
+    """(id field, id value) identifying a record across snapshots."""
+    if isinstance(record, dict):
+        for field in ID_FIELDS:
+            value = record.get(field)
+            if value not in (None, ""):
+                return field, str(value)
+    return "id", SINGLETON_ID
+
+
+# -----------------------------------------------------------------------------#
+# Delta tracker
+# -----------------------------------------------------------------------------#
+class SnapshotDelta:
+    """
+    Compare one snapshot against the previous one for a stanza/collector.
+
+    Usage per cycle:
+        delta = SnapshotDelta(checkpoint_dir, stanza, "hosts", interval)
+        for record in snapshot:
+            if delta.observe(record):
+                emit(record)
+        for tombstone in delta.tombstones():
+            emit(tombstone)
+        delta.commit()
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: str,
+        stanza: str,
+        name: str,
+        full_interval: float = DEFAULT_FULL_SNAPSHOT_INTERVAL,
+    ):
+        self.path = os.path.join(checkpoint_dir, checkpoint_filename(f"{stanza}#{name}", "digests.json"))
+        self.checkpoint_dir = checkpoint_dir
+
+        previous = self._load()
+        self._previous: Dict[str, str] = previous.get("digests", {})
+        self._id_fields: Dict[str, str] = previous.get("id_fields", {})
+        self._last_full = float(previous.get("last_full", 0))
+
+        self._current: Dict[str, str] = {}
+        self.now = time.time()
+        self.full = full_interval <= 0 or (self.now - self._last_full) >= full_interval
+
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def observe(self, record: Any) -> bool:
+        """Record the object's digest; True if it should be indexed."""
+        field, key = object_key(record)
+        digest = content_digest(record)
+
+        self._current[key] = digest
+        self._id_fields[key] = field
+
+        previous = self._previous.get(key)
+        if previous is None:
+            self.new += 1
+        elif previous != digest:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+            return self.full
+        return True
+
+    def tombstones(self):
+        """Small marker events for objects present last time but not now."""
+        for key in self._previous.keys() - self._current.keys():
+            self.deleted += 1
+            if key == SINGLETON_ID:
+                yield {"sandfly_deleted": True}
+            else:
+                yield {self._id_fields.get(key, "id"): key, "sandfly_deleted": True}
+
+    def commit(self):
+        state = {
+            "digests": self._current,
+            "id_fields": {k: v for k, v in self._id_fields.items() if k in self._current and v != "id"},
+            "last_full": self.now if self.full else self._last_full,
+        }
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        atomic_write(self.path, json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+    def summary(self) -> str:
+        mode = "full" if self.full else "delta"
+        return (
+            f"{mode} snapshot: {self.new} new, {self.changed} changed, "
+            f"{self.unchanged} unchanged, {self.deleted} deleted"
+        )
+
+
+def apply_delta(
+    delta: Optional[SnapshotDelta],
+    records,
+    emit: Callable[[Any], None],
+    on_record: Optional[Callable[[Any], None]] = None,
+    flush: Optional[Callable[[], None]] = None,
+) -> int:
+    """
+    Emit the records that pass the delta filter; return the number emitted.
+
+    `flush` (the event writer's) runs before the digests are committed.
+    """
+    emitted = 0
+    for record in records:
+        if on_record is not None:
+            on_record(record)
+        if delta is None or delta.observe(record):
+            emit(record)
+            emitted += 1
+
+    if delta is not None:
+        for tombstone in delta.tombstones():
+            emit(tombstone)
+            emitted += 1
+        if flush is not None:
+            flush()
+        delta.commit()
+
+    return emitted
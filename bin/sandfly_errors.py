@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_errors.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Exception types shared by the API client and the collectors
+#
+# Kept in its own module so that sandfly_input.py (which Splunk runs as
+# __main__) and the collector modules raise and catch the same classes.
+# =============================================================================
+
+from typing import Optional
+
+
+class RateLimitedError(RuntimeError):
+    """HTTP 429 that survived the adapter's own retries."""
+
+    def __init__(self, path: str, retry_after: Optional[float]):
+        super().__init__(f"API rate limited ({path}): HTTP 429")
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """The server's circuit breaker is open; the request was not sent."""
+
+    def __init__(self, target: str, retry_in: float):
+        super().__init__(f"Circuit breaker open for {target}; skipping request (retry in {retry_in:.0f}s)")
+        self.retry_in = retry_in
+
+
+class DeadlineExceededError(RuntimeError):
+    """The rate limiter could not admit the request before the caller's deadline."""
+
+    def __init__(self, target: str):
+        super().__init__(f"Deadline reached while waiting to send a request to {target}")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds form only)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_fields.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Put each sourcetype's key fields (host_id, sandfly_name, status, ...)
+#   at the top level of the event, ahead of any nested object
+# - That flat prefix is what the sandfly_indexed_* transforms read, so
+#   index-time extraction never has to parse the JSON (transforms.conf)
+#
+# Design principles:
+# - Additive only: nested objects keep their original fields and values
+# - Only scalar values are lifted; a missing field is simply left out
+# - Sourcetypes without key fields are written untouched (no copy)
+# =============================================================================
+
+from typing import Any, Dict, Tuple
+
+from sandfly_time import lookup_path
+
+
+# (flat name, dotted source paths tried in order)
+RESULT_KEY_FIELDS = (
+    ("host_id", ("host_id", "data.host_id")),
+    ("sandfly_name", ("sandfly_name", "data.sandfly_name")),
+    ("status", ("status", "data.status")),
+    ("result_type", ("result_type", "data.result_type")),
+    ("severity", ("severity", "data.severity")),
+)
+
+HOST_KEY_FIELDS = (
+    ("host_id", ("host_id", "id")),
+    ("hostname", ("hostname",)),
+)
+
+HOST_DETAIL_KEY_FIELDS = (
+    ("host_id", ("host_id",)),
+)
+
+KEY_FIELDS = {
+    "sandfly:results": RESULT_KEY_FIELDS,
+    "sandfly:results:summary": RESULT_KEY_FIELDS,
+    "sandfly:results:timeline": RESULT_KEY_FIELDS,
+    "sandfly:hosts": HOST_KEY_FIELDS,
+    "sandfly:hosts:info": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:processes": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:listeners": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:kernelmodules": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:services": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:users": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:scheduledtasks": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:lastlog": HOST_DETAIL_KEY_FIELDS,
+    "sandfly:hosts:loggedinusers": HOST_DETAIL_KEY_FIELDS,
+}
+
+_SCALARS = (str, int, float, bool)
+
+_compiled: Dict[str, Tuple[Tuple[str, Tuple[Tuple[str, ...], ...]], ...]] = {
+    sourcetype: tuple((name, tuple(tuple(path.split(".")) for path in paths)) for name, paths in fields)
+    for sourcetype, fields in KEY_FIELDS.items()
+}
+
+
+def flatten_key_fields(sourcetype: str, record: Any) -> Any:
+    """
+    The record with the sourcetype's key fields first, as flat scalars.
+
+    Existing top-level fields of the same name keep their value and move
+    to the front; the rest of the record follows in its original order.
+    """
+    fields = _compiled.get(sourcetype)
+    if fields is None or not isinstance(record, dict):
+        return record
+
+    flat: Dict[str, Any] = {}
+    for name, paths in fields:
+        for path in paths:
+            value = lookup_path(record, path)
+            if isinstance(value, _SCALARS) and value != "":
+                flat[name] = value
+                break
+
+    if not flat:
+        return record
+    for key, value in record.items():
+        if key not in flat:
+            flat[key] = value
+    return flat
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_hostdetails.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Fan out per-host detail requests for the sandfly:hosts:* sourcetypes
+# - Take the host list from the hosts collector of the same cycle
+# - Respect a per-server concurrency cap and a cycle deadline; 429s are
+#   retried and paced by SandflyAPI's shared rate limiter, not here
+#
+# Design principles:
+# - Read-only API usage
+# - Fixed number of worker threads pulling from one shared task iterator
+#   (no per-task futures, so 40,000 tasks cost no more memory than 40)
+# - A failing host/endpoint is logged and skipped, never fatal
+# =============================================================================
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import splunklib.modularinput as smi
+
+from sandfly_errors import CircuitOpenError, DeadlineExceededError, RateLimitedError
+from sandfly_telemetry import telemetry_scope
+
+
+DEFAULT_HOST_DETAIL_THREADS = 16
+MAX_HOST_DETAIL_THREADS = 64
+DEFAULT_HOST_DETAIL_DEADLINE = 240
+
+
+# -----------------------------------------------------------------------------#
+# Logging helper
+# -----------------------------------------------------------------------------#
+def log(log_fn, level, msg):
+    log_fn(level, msg)
+
+
+# -----------------------------------------------------------------------------#
+# Host detail registry
+# -----------------------------------------------------------------------------#
+class HostDetail:
+    """One collect_hosts_* flag and its per-host endpoint template."""
+
+    def __init__(self, flag: str, path: str, sourcetype: str):
+        self.flag = flag
+        self.path = path
+        self.sourcetype = sourcetype
+
+    @property
+    def name(self) -> str:
+        return self.flag[len("collect_hosts_"):]
+
+    def path_for(self, host_id: str) -> str:
+        return self.path.format(host_id=host_id)
+
+
+HOST_DETAILS: List[HostDetail] = [
+    HostDetail("collect_hosts_info", "/v4/hosts/{host_id}", "sandfly:hosts:info"),
+    HostDetail("collect_hosts_processes", "/v4/hosts/{host_id}/info/processes", "sandfly:hosts:processes"),
+    HostDetail("collect_hosts_listeners", "/v4/hosts/{host_id}/info/listeners", "sandfly:hosts:listeners"),
+    HostDetail("collect_hosts_kernelmodules", "/v4/hosts/{host_id}/info/kernelmodules", "sandfly:hosts:kernelmodules"),
+    HostDetail("collect_hosts_services", "/v4/hosts/{host_id}/info/services", "sandfly:hosts:services"),
+    HostDetail("collect_hosts_users", "/v4/hosts/{host_id}/info/users", "sandfly:hosts:users"),
+    HostDetail("collect_hosts_scheduledtasks", "/v4/hosts/{host_id}/info/scheduledtasks", "sandfly:hosts:scheduledtasks"),
+    HostDetail("collect_hosts_lastlog", "/v4/hosts/{host_id}/info/lastlog", "sandfly:hosts:lastlog"),
+    HostDetail("collect_hosts_loggedinusers", "/v4/hosts/{host_id}/info/loggedinusers", "sandfly:hosts:loggedinusers"),
+]
+
+HOST_DETAIL_FLAGS = [d.flag for d in HOST_DETAILS]
+
+
+def host_id_of(record: Any) -> Optional[str]:
+    if not isinstance(record, dict):
+        return None
+    value = record.get("host_id") or record.get("id")
+    return str(value) if value else None
+
+
+# -----------------------------------------------------------------------------#
+# Fan-out
+# -----------------------------------------------------------------------------#
+class HostDetailFanOut:
+    """
+    Fetch the enabled per-host endpoints for every host on a worker pool.
+
+    The per-server concurrency cap, 429 retries and the shared pause after
+    a 429 are all SandflyAPI's; this class adds a hard per-cycle deadline.
+    A request still rate limited after SandflyAPI's retries is skipped.
+    """
+
+    def __init__(
+        self,
+        api,
+        details: List[HostDetail],
+        emit: Callable[[str, Any], None],
+        log_fn,
+        threads: int = DEFAULT_HOST_DETAIL_THREADS,
+        deadline: float = DEFAULT_HOST_DETAIL_DEADLINE,
+        telemetry=None,
+        max_rate: Optional[float] = None,
+    ):
+        self.api = api
+        self.details = details
+        self.emit = emit
+        self.log_fn = log_fn
+        self.threads = max(1, min(int(threads), MAX_HOST_DETAIL_THREADS))
+        self.deadline = float(deadline)
+        self.telemetry = telemetry
+        self.max_rate = max_rate
+
+        self._tasks_lock = threading.Lock()
+        self._aborted: Optional[str] = None
+
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.throttled = 0
+        self.events = 0
+
+    # -------------------------------------------------------------------------#
+    # Single task
+    # -------------------------------------------------------------------------#
+    def _fetch(self, host_id: str, detail: HostDetail):
+        try:
+            count = 0
+            with telemetry_scope(self.telemetry, detail.flag[len("collect_"):], aggregate=True):
+                for item in self.api.iter_items(detail.path_for(host_id)):
+                    if isinstance(item, dict):
+                        item.setdefault("host_id", host_id)
+                    self.emit(detail.sourcetype, item)
+                    count += 1
+        except RateLimitedError:
+            with self._stats_lock:
+                self.throttled += 1
+                self.failed += 1
+            log(self.log_fn, smi.EventWriter.WARN, f"Host {host_id} {detail.name}: still rate limited, skipped")
+            return
+        except CircuitOpenError as e:
+            # Server is failing: leave the remaining tasks as skipped
+            self._aborted = str(e)
+            return
+        except DeadlineExceededError:
+            # The rate limiter could not fit it in; counted as skipped
+            return
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += 1
+            log(self.log_fn, smi.EventWriter.WARN, f"Host {host_id} {detail.name} failed: {e}")
+            return
+
+        with self._stats_lock:
+            self.completed += 1
+            self.events += count
+
+    # -------------------------------------------------------------------------#
+    # Worker loop
+    # -------------------------------------------------------------------------#
+    def _worker(self, tasks: Iterator[Tuple[str, HostDetail]], stop_at: float):
+        with self.api.deadline(stop_at):
+            while time.time() < stop_at and self._aborted is None:
+                with self._tasks_lock:
+                    task = next(tasks, None)
+                if task is None:
+                    return
+                self._fetch(task[0], task[1])
+
+    def run(self, host_ids: List[str]) -> Dict[str, int]:
+        total = len(host_ids) * len(self.details)
+        if not total:
+            return {"tasks": 0, "completed": 0, "failed": 0, "skipped": 0, "throttled": 0, "events": 0}
+
+        if self.max_rate and total > self.max_rate * self.deadline:
+            log(
+                self.log_fn,
+                smi.EventWriter.WARN,
+                f"Host detail fan-out: {total} requests cannot finish in {self.deadline:.0f}s at "
+                f"api_max_rate={self.max_rate:g}; raise api_max_rate or host_detail_deadline, "
+                f"or enable fewer collect_hosts_* endpoints",
+            )
+
+        started = time.time()
+        stop_at = started + self.deadline
+        tasks = ((host_id, detail) for host_id in host_ids for detail in self.details)
+
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(tasks, stop_at),
+                name=f"sandfly-hostdetail-{i}",
+                daemon=True,
+            )
+            for i in range(min(self.threads, total))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        skipped = total - self.completed - self.failed
+        if self._aborted:
+            log(self.log_fn, smi.EventWriter.ERROR, f"Host detail fan-out stopped early: {self._aborted}")
+        stats = {
+            "tasks": total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": skipped,
+            "throttled": self.throttled,
+            "events": self.events,
+        }
+
+        level = smi.EventWriter.WARN if skipped else smi.EventWriter.INFO
+        log(
+            self.log_fn,
+            level,
+            f"Host detail fan-out: {self.completed}/{total} requests for {len(host_ids)} hosts "
+            f"in {time.time() - started:.1f}s ({self.failed} failed, {skipped} skipped, "
+            f"{self.throttled} throttled)",
+        )
+        return stats
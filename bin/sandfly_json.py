@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_json.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Decode Sandfly API responses incrementally, one record at a time
+# - Keep peak memory bounded by the largest record, not the response size
+# - One loads()/dumps() pair for ingestion, backed by orjson when it is
+#   bundled in the app's lib/ directory and by the stdlib otherwise
+#
+# Bodies that turn out (after any gzip decoding) to be small are decoded in
+# one loads() pass instead; at most FAST_DECODE_MAX_BYTES is ever buffered.
+#
+# Supported response shapes:
+# - A bare JSON array:            [ {...}, {...} ]
+# - An envelope with a data list: { "data": [ {...} ], "total": 10 }
+# - Anything else is yielded as a single record
+#
+# Output is identical on both backends for the data Sandfly returns:
+# compact separators, key insertion order kept, UTF-8 (not \\u) escapes.
+# =============================================================================
+
+import codecs
+import collections
+import json
+import os
+import sys
+from typing import Any, Deque, Iterable, Iterator, Union
+
+_APP_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+if os.path.isdir(_APP_LIB) and _APP_LIB not in sys.path:
+    sys.path.insert(0, _APP_LIB)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+READ_SIZE = 65536
+# Bodies up to this size (decoded, not on the wire) are decoded in one
+# orjson pass; larger ones are streamed record by record.
+FAST_DECODE_MAX_BYTES = 8 * 1024 * 1024
+_WHITESPACE = " \t\r\n"
+# Characters that can continue a JSON number
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+_decoder = json.JSONDecoder()
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+# -----------------------------------------------------------------------------#
+# Whole documents
+# -----------------------------------------------------------------------------#
+def stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def stdlib_dumps(obj: Any) -> str:
+    return _encoder.encode(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # Integers wider than 64 bits, or types orjson does not know
+            return stdlib_dumps(obj)
+
+else:
+    loads = stdlib_loads
+    dumps = stdlib_dumps
+
+
+def iter_document_records(document: Any) -> Iterator[Any]:
+    """
+    Yield the records of an already decoded document.
+
+    Same shapes and order as iter_json_records(), for bodies small enough
+    to decode in one pass.
+    """
+    if isinstance(document, list):
+        yield from document
+        return
+
+    if isinstance(document, dict):
+        data = document.get("data")
+        if isinstance(data, list):
+            yield from data
+        elif document:
+            yield document
+        return
+
+    yield document
+
+
+# -----------------------------------------------------------------------------#
+# Streaming
+# -----------------------------------------------------------------------------#
+
+
+class _Buffer:
+    """Text buffer fed from an iterable of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; return False at end of input."""
+        if self.eof:
+            return False
+
+        # Drop consumed text so the buffer never grows with the response
+        if self.pos > READ_SIZE:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._utf8.decode(chunk)
+                return True
+
+        self.text += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or "" at end of input."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON response: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def _number_at_edge(self, obj: Any, end: int) -> bool:
+        if self.eof or isinstance(obj, bool) or not isinstance(obj, (int, float)):
+            return False
+        for char in self.text[end:]:
+            if char not in _NUMBER_CHARS:
+                return False
+        return True
+
+    def value(self) -> Any:
+        """Decode one complete JSON value at the current position."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+
+            # A number is only complete once a character that cannot
+            # continue it follows ("25000000000" may be "25000000000.0")
+            if self._number_at_edge(obj, end) and self.fill():
+                continue
+
+            self.pos = end
+            return obj
+
+
+def _iter_array(buf: _Buffer) -> Iterator[Any]:
+    buf.expect("[")
+    if buf.peek() == "]":
+        buf.pos += 1
+        return
+
+    while True:
+        yield buf.value()
+
+        char = buf.peek()
+        buf.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"Malformed JSON array in response at offset {buf.pos}")
+
+
+def iter_json_records(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Yield the records of a JSON document as they are decoded.
+
+    Only the current record is held in memory. For an envelope object the
+    non-"data" members are small and decoded normally; if the object has
+    no "data" array it is yielded whole at the end.
+    """
+    buf = _Buffer(chunks)
+    first = buf.peek()
+
+    if first == "[":
+        yield from _iter_array(buf)
+        return
+
+    if first != "{":
+        if first:
+            yield buf.value()
+        return
+
+    envelope = {}
+    streamed = False
+
+    buf.expect("{")
+    if buf.peek() == "}":
+        buf.pos += 1
+    else:
+        while True:
+            key = buf.value()
+            buf.expect(":")
+
+            if key == "data" and buf.peek() == "[":
+                yield from _iter_array(buf)
+                streamed = True
+            else:
+                envelope[key] = buf.value()
+
+            char = buf.peek()
+            buf.pos += 1
+            if char == "}":
+                break
+            if char != ",":
+                raise ValueError(f"Malformed JSON object in response at offset {buf.pos}")
+
+    if not streamed and envelope:
+        yield envelope
+
+
+def _replay(head: Deque[bytes], rest: Iterator[bytes]) -> Iterator[bytes]:
+    # Hand the buffered chunks back one by one so each is freed once parsed
+    while head:
+        yield head.popleft()
+    yield from rest
+
+
+def iter_body_records(chunks: Iterable[bytes], max_whole: int = FAST_DECODE_MAX_BYTES) -> Iterator[Any]:
+    """
+    Yield the records of a decoded response body.
+
+    The body is buffered until it ends or passes max_whole bytes: a body
+    that ends first is decoded in one loads() pass, a larger one continues
+    through iter_json_records(). Either way the records are the same.
+    """
+    chunks = iter(chunks)
+    head: Deque[bytes] = collections.deque()
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > max_whole:
+            yield from iter_json_records(_replay(head, chunks))
+            return
+
+    if size:
+        yield from iter_document_records(loads(b"".join(head)))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_kvstore.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Keep current-state KV store collections next to the indexed events:
+#   sandfly_hosts_state (one row per host) and sandfly_sandflies_state
+#   (one row per sandfly definition), read through the lookups of the
+#   same name in transforms.conf
+# - Dashboards and enrichments read `inputlookup` instead of re-deriving
+#   the latest state from a week of inventory events
+#
+# Design principles:
+# - Rows are keyed "<input name>:<object id>", so several Sandfly servers
+#   can share one collection
+# - Only new or changed rows are written, with batch_save; the content
+#   digest of each row is kept in memory and seeded from the collection
+# - Rows of objects missing from a complete snapshot are deleted; an
+#   interrupted snapshot never deletes anything
+# - KV store problems are logged and never fail a collector
+# =============================================================================
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from splunklib import client
+
+from sandfly_delta import content_digest
+from sandfly_json import dumps
+from sandfly_time import lookup_path
+
+
+# Documents per batch_save call (splunkd's default max_documents_per_batch_save)
+BATCH_SIZE = 1000
+# Rows read per query page when seeding digests
+QUERY_PAGE_SIZE = 10000
+# Keys per delete query
+DELETE_BATCH_SIZE = 500
+
+# Directory name of the installed app: the KV store namespace
+APP = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StateCollection:
+    """One current-state collection: key field and the flat columns kept."""
+
+    def __init__(self, name: str, key_paths: Tuple[str, ...], columns: Tuple[Tuple[str, Tuple[str, ...]], ...]):
+        self.name = name
+        self.key_paths = tuple(tuple(path.split(".")) for path in key_paths)
+        self.columns = tuple((column, tuple(tuple(p.split(".")) for p in paths)) for column, paths in columns)
+
+    def object_id(self, record: Dict[str, Any]) -> Optional[str]:
+        for path in self.key_paths:
+            value = lookup_path(record, path)
+            if value not in (None, ""):
+                return str(value)
+        return None
+
+    def row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        row: Dict[str, Any] = {}
+        for column, paths in self.columns:
+            for path in paths:
+                value = lookup_path(record, path)
+                if value is not None:
+                    row[column] = value
+                    break
+        return row
+
+
+# collector name -> collection
+STATE_COLLECTIONS: Dict[str, StateCollection] = {
+    "hosts": StateCollection(
+        "sandfly_hosts_state",
+        key_paths=("host_id", "id"),
+        columns=(
+            ("host_id", ("host_id", "id")),
+            ("hostname", ("hostname",)),
+            ("ip", ("ip", "ip_address")),
+            ("os_name", ("os_name", "data.os.release.name")),
+            ("os_version", ("os_version", "data.os.release.version")),
+            ("active", ("active",)),
+            ("last_seen", ("last_seen", "date_last_seen")),
+        ),
+    ),
+    "sandflies": StateCollection(
+        "sandfly_sandflies_state",
+        key_paths=("name", "id"),
+        columns=(
+            ("sandfly_name", ("name",)),
+            ("type", ("type",)),
+            ("active", ("active",)),
+            ("severity", ("severity",)),
+            ("description", ("description",)),
+        ),
+    ),
+}
+
+
+def connect(metadata: Dict[str, Any]) -> Optional[client.Service]:
+    """A splunkd service in the app's namespace, or None without a session."""
+    server_uri = metadata.get("server_uri")
+    session_key = metadata.get("session_key")
+    if not server_uri or not session_key:
+        return None
+    splunkd = urlsplit(server_uri, allow_fragments=False)
+    return client.Service(
+        scheme=splunkd.scheme,
+        host=splunkd.hostname,
+        port=splunkd.port,
+        token=session_key,
+        owner="nobody",
+        app=APP,
+    )
+
+
+# -----------------------------------------------------------------------------#
+# Writer
+# -----------------------------------------------------------------------------#
+class StateWriter:
+    """
+    Current-state rows of one collector for one input stanza.
+
+    Created once per stanza and reused by every cycle. Per cycle:
+        snapshot = writer.begin()
+        for record in records:
+            snapshot.observe(record)
+        snapshot.commit()
+    """
+
+    def __init__(self, service: client.Service, stanza: str, collection: StateCollection):
+        self.service = service
+        self.input = stanza.rsplit("/", 1)[-1]
+        self.collection = collection
+        # row key -> digest of the stored row; None until seeded
+        self._digests: Optional[Dict[str, str]] = None
+        # True once a snapshot was committed by this process
+        self.primed = False
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.service.kvstore[self.collection.name].data
+        return self._data
+
+    def _seed(self) -> Dict[str, str]:
+        digests: Dict[str, str] = {}
+        query = json.dumps({"input": self.input})
+        skip = 0
+        while True:
+            page = self.data.query(query=query, fields="_key,digest", limit=QUERY_PAGE_SIZE, skip=skip)
+            for row in page:
+                digests[row["_key"]] = row.get("digest", "")
+            if len(page) < QUERY_PAGE_SIZE:
+                return digests
+            skip += QUERY_PAGE_SIZE
+
+    def begin(self) -> "StateSnapshot":
+        with self._lock:
+            if self._digests is None:
+                self._digests = self._seed()
+        return StateSnapshot(self)
+
+
+class StateSnapshot:
+    """One cycle's snapshot; rows are saved in batches as they change."""
+
+    def __init__(self, writer: StateWriter):
+        self.writer = writer
+        self.now = time.time()
+        self._seen: Dict[str, str] = {}
+        self._pending: List[Dict[str, Any]] = []
+
+        self.saved = 0
+        self.unchanged = 0
+        self.deleted = 0
+        # First KV store error; the rest of the snapshot is then ignored
+        self.error: Optional[Exception] = None
+
+    def observe(self, record: Any):
+        if self.error is not None or not isinstance(record, dict):
+            return
+        collection = self.writer.collection
+        object_id = collection.object_id(record)
+        if object_id is None:
+            return
+
+        key = f"{self.writer.input}:{object_id}"
+        digest = content_digest(record)
+        self._seen[key] = digest
+        if self.writer._digests.get(key) == digest:
+            self.unchanged += 1
+            return
+
+        row = collection.row(record)
+        row.update({
+            "_key": key,
+            "input": self.writer.input,
+            "digest": digest,
+            "updated": round(self.now, 3),
+            "record": dumps(record),
+        })
+        self._pending.append(row)
+        if len(self._pending) >= BATCH_SIZE:
+            self._save()
+
+    def _save(self):
+        if not self._pending:
+            return
+        try:
+            self.writer.data.batch_save(*self._pending)
+        except Exception as e:
+            self.error = e
+            return
+        for row in self._pending:
+            self.writer._digests[row["_key"]] = row["digest"]
+        self.saved += len(self._pending)
+        self._pending = []
+
+    def commit(self):
+        """Save what is left and delete rows of objects no longer present."""
+        self._save()
+        if self.error is not None:
+            return
+
+        digests = self.writer._digests
+        gone = [key for key in digests if key not in self._seen]
+        for offset in range(0, len(gone), DELETE_BATCH_SIZE):
+            keys = gone[offset:offset + DELETE_BATCH_SIZE]
+            try:
+                self.writer.data.delete(query=json.dumps({"$or": [{"_key": key} for key in keys]}))
+            except Exception as e:
+                self.error = e
+                return
+            for key in keys:
+                del digests[key]
+            self.deleted += len(keys)
+        self.writer.primed = True
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"{self.writer.collection.name}: update failed: {self.error}"
+        return (
+            f"{self.writer.collection.name}: {self.saved} saved, "
+            f"{self.unchanged} unchanged, {self.deleted} deleted"
+        )
+
+
+def state_writers(service: Optional[client.Service], stanza: str) -> Dict[str, StateWriter]:
+    """Writers for every current-state collector of a stanza (none without splunkd)."""
+    if service is None:
+        return {}
+    return {name: StateWriter(service, stanza, collection) for name, collection in STATE_COLLECTIONS.items()}
@@ -16,18 +16,44 @@ from Splunk alert actions.
 - Read-only use of Splunk alert payload
 - Safe for Splunk Cloud and AppInspect
 
+DELIVERY MODES
+
+- single (default): one PagerDuty event for the first result row
+- batch: read every row from the alert's results_file, group rows by the
+  rendered dedup_key and send one event per group over a single keep-alive
+  session, with bounded concurrency and 429-aware retries
+
+RETRY SPOOL
+
+Events that still fail with a retryable error (timeout, 429, 5xx) are kept
+in a local SQLite spool (bin/sandfly_spool.py) and re-sent by later runs,
+oldest first per dedup_key. Every run drains the spool before sending and
+logs its depth and oldest-event age. "--drain" runs only the drain step and
+prints one JSON stats event to stdout, indexed by its scripted input as
+sourcetype sandfly:pagerduty:spool.
+
 =============================================================================
 """
 
+import csv
+import functools
+import gzip
 import sys
 import os
 import json
+import random
 import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sandfly_spool import EventSpool
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     import urllib.request
     import urllib.error
@@ -35,6 +61,87 @@ except ImportError:
 
 
 PAGERDUTY_EVENTS_URL = "https://events.pagerduty.com/v2/enqueue"
+REQUEST_TIMEOUT = 30
+
+DEFAULT_MAX_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+DEFAULT_MAX_RETRIES = 4
+MAX_RETRY_DELAY = 30
+
+# PagerDuty rejects events over 512 KB; only a sample of the grouped rows
+# is attached to each event.
+MAX_RESULTS_PER_EVENT = 20
+
+
+# -----------------------------------------------------------------------------#
+# Templates
+# -----------------------------------------------------------------------------#
+TEMPLATE_VARIABLE = re.compile(r"\$([^$]+)\$")
+
+# Alert-level variables: template name -> (payload field, default)
+PAYLOAD_VARIABLES = {
+    "name": ("search_name", ""),
+    "search_name": ("search_name", ""),
+    "trigger_time": ("trigger_time", ""),
+    "app": ("app", "sandfly"),
+    "owner": ("owner", ""),
+    "results_link": ("results_link", ""),
+}
+
+
+class Template:
+    """
+    A $variable$ template parsed once into literal and variable segments.
+
+    Rendering only looks up the fields the template references, so the same
+    template can be applied cheaply to thousands of result rows. Unknown
+    variables and result fields missing from a row are left as written.
+    """
+
+    __slots__ = ("source", "segments")
+
+    def __init__(self, source):
+        self.source = source
+        self.segments = []
+
+        position = 0
+        for match in TEMPLATE_VARIABLE.finditer(source):
+            if match.start() > position:
+                self.segments.append((None, None, source[position:match.start()]))
+            var = match.group(1)
+            if var.startswith("result."):
+                self.segments.append(("result", var[len("result."):], match.group(0)))
+            elif var in PAYLOAD_VARIABLES:
+                self.segments.append(("payload", PAYLOAD_VARIABLES[var], match.group(0)))
+            else:
+                self.segments.append((None, None, match.group(0)))
+            position = match.end()
+        if position < len(source):
+            self.segments.append((None, None, source[position:]))
+
+    def render(self, payload, result=None):
+        if result is None:
+            result = payload.get("result", {})
+
+        parts = []
+        for kind, ref, text in self.segments:
+            if kind == "result":
+                if ref in result:
+                    value = result[ref]
+                    parts.append(str(value) if value is not None else "")
+                else:
+                    parts.append(text)
+            elif kind == "payload":
+                field, default = ref
+                parts.append(str(payload.get(field, default)))
+            else:
+                parts.append(text)
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(source):
+    return Template(source)
 
 
 def substitute_variables(template, payload):
@@ -43,29 +150,25 @@ def substitute_variables(template, payload):
     No assumptions are made about Sandfly field names.
     """
 
-    result = payload.get("result", {})
+    return compile_template(template).render(payload)
 
-    substitutions = {
-        "name": payload.get("search_name", ""),
-        "search_name": payload.get("search_name", ""),
-        "trigger_time": payload.get("trigger_time", ""),
-        "app": payload.get("app", "sandfly"),
-        "owner": payload.get("owner", ""),
-        "results_link": payload.get("results_link", ""),
-    }
 
-    for key, value in result.items():
-        substitutions[f"result.{key}"] = str(value) if value is not None else ""
-
-    def replace(match):
-        var = match.group(1)
-        return substitutions.get(var, match.group(0))
+def parse_int(value, default, minimum=1, maximum=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    number = max(minimum, number)
+    return min(number, maximum) if maximum else number
 
-    return re.sub(r"\$([^$]+)\$", replace, template)
 
+def build_pagerduty_event(config, payload, results=None):
+    """
+    Build the Events API v2 body for one alert.
 
-def send_pagerduty_event(config, payload):
-    """Send event to PagerDuty"""
+    `results` is the list of rows grouped under this event (batch mode);
+    variables are rendered against payload["result"], the first row.
+    """
 
     routing_key = config.get("routing_key", "")
     severity = config.get("severity", "error")
@@ -77,13 +180,20 @@ def send_pagerduty_event(config, payload):
     group = config.get("group", "endpoint-security")
     event_class = config.get("class", "sandfly-alert")
 
-    if not routing_key:
-        return False, "No PagerDuty routing key configured"
-
     summary = substitute_variables(summary, payload)
     dedup_key = substitute_variables(dedup_key, payload)
     component = substitute_variables(component, payload)
 
+    custom_details = {
+        "search_name": payload.get("search_name", ""),
+        "trigger_time": payload.get("trigger_time", ""),
+        "results_link": payload.get("results_link", ""),
+        "result": payload.get("result", {}),
+    }
+    if results is not None:
+        custom_details["result_count"] = len(results)
+        custom_details["results"] = results[:MAX_RESULTS_PER_EVENT]
+
     pd_payload = {
         "routing_key": routing_key,
         "event_action": event_action,
@@ -95,12 +205,7 @@ def send_pagerduty_event(config, payload):
             "component": component if component else None,
             "group": group,
             "class": event_class,
-            "custom_details": {
-                "search_name": payload.get("search_name", ""),
-                "trigger_time": payload.get("trigger_time", ""),
-                "results_link": payload.get("results_link", ""),
-                "result": payload.get("result", {}),
-            },
+            "custom_details": custom_details,
         },
     }
 
@@ -108,37 +213,288 @@ def send_pagerduty_event(config, payload):
     pd_payload["payload"] = {
         k: v for k, v in pd_payload["payload"].items() if v is not None
     }
+    return pd_payload
+
+
+# -----------------------------------------------------------------------------#
+# Delivery
+# -----------------------------------------------------------------------------#
+def build_session(pool_size=1):
+    """Keep-alive session for events.pagerduty.com, or None without requests."""
+    if not requests:
+        return None
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    # Retries are handled in post_event() so 429s can honour Retry-After
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+    return session
+
+
+def _post(session, pd_payload):
+    """POST once; return (status, body text, Retry-After header)."""
+    if session is not None:
+        response = session.post(PAGERDUTY_EVENTS_URL, json=pd_payload, timeout=REQUEST_TIMEOUT)
+        return response.status_code, response.text, response.headers.get("Retry-After")
+
+    data = json.dumps(pd_payload).encode("utf-8")
+    req = urllib.request.Request(
+        PAGERDUTY_EVENTS_URL, data=data, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            return response.getcode(), response.read().decode("utf-8"), None
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8", "replace"), e.headers.get("Retry-After")
 
-    headers = {"Content-Type": "application/json"}
 
+def retry_delay(attempt, retry_after=None):
     try:
-        if requests:
-            response = requests.post(
-                PAGERDUTY_EVENTS_URL,
-                json=pd_payload,
-                headers=headers,
-                timeout=30,
-            )
-
-            if response.status_code >= 400:
-                return False, f"PagerDuty returned {response.status_code}: {response.text}"
-
-            resp = response.json()
-            return True, f"PagerDuty event created: {resp.get('dedup_key', 'unknown')}"
-
-        data = json.dumps(pd_payload).encode("utf-8")
-        req = urllib.request.Request(
-            PAGERDUTY_EVENTS_URL, data=data, headers=headers
-        )
-
-        with urllib.request.urlopen(req, timeout=30) as response:
-            if response.getcode() >= 400:
-                return False, f"PagerDuty returned status {response.getcode()}"
-            resp = json.loads(response.read().decode("utf-8"))
-            return True, f"PagerDuty event created: {resp.get('dedup_key', 'unknown')}"
+        if retry_after:
+            return min(MAX_RETRY_DELAY, max(0.0, float(retry_after)))
+    except ValueError:
+        pass
+    return min(MAX_RETRY_DELAY, 2 ** attempt) + random.uniform(0, 1)
 
-    except Exception as e:
-        return False, f"PagerDuty request failed: {str(e)}"
+
+def post_event(session, pd_payload, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    Deliver one event, retrying 429, 5xx and connection errors with
+    exponential backoff. Returns (success, message, retryable).
+    """
+
+    for attempt in range(max_retries + 1):
+        retry_after = None
+        try:
+            status, text, retry_after = _post(session, pd_payload)
+        except Exception as e:
+            status, text = None, str(e)
+
+        if status is not None and status < 400:
+            try:
+                resp = json.loads(text)
+            except ValueError:
+                resp = {}
+            return True, f"PagerDuty event created: {resp.get('dedup_key', 'unknown')}", False
+
+        retryable = status is None or status == 429 or status >= 500
+        if not retryable or attempt == max_retries:
+            if status is None:
+                return False, f"PagerDuty request failed: {text}", retryable
+            return False, f"PagerDuty returned {status}: {text}", retryable
+
+        time.sleep(retry_delay(attempt, retry_after))
+
+    return False, "PagerDuty request failed", True
+
+
+# -----------------------------------------------------------------------------#
+# Retry spool
+# -----------------------------------------------------------------------------#
+def open_spool():
+    """The shared PagerDuty spool, or None if it cannot be opened."""
+    try:
+        return EventSpool("pagerduty")
+    except (OSError, sqlite3.Error) as e:
+        print(f"WARN: PagerDuty retry spool unavailable: {e}", file=sys.stderr)
+        return None
+
+
+def spool_event(spool, pd_payload, error):
+    """Keep a failed event for a later run; returns the outcome message."""
+    if spool is None:
+        return f"{error} (event dropped: no retry spool)"
+    try:
+        spool.enqueue(pd_payload.get("dedup_key"), json.dumps(pd_payload), error)
+    except sqlite3.Error as e:
+        return f"{error} (event dropped: spool write failed: {e})"
+    return f"{error} (event spooled for retry)"
+
+
+def drain_spool(spool, session, concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Re-send spooled events that are due. Each dedup_key is drained in order
+    and stops at its first retryable failure, so later events for the same
+    incident never overtake earlier ones.
+
+    Returns counts of what happened (all zero if another run is draining).
+    """
+
+    counts = {"drained": False, "delivered": 0, "retried": 0, "discarded": 0, "expired": 0}
+    if spool is None:
+        return counts
+
+    with spool.drain_lock() as acquired:
+        if not acquired:
+            return counts
+        counts["drained"] = True
+
+        counts["expired"] = expired = spool.expire()
+        if expired:
+            print(f"ERROR: PagerDuty spool dropped {expired} events older than {spool.max_age}s", file=sys.stderr)
+
+        groups = spool.due()
+        if not groups:
+            return counts
+
+        def drain_group(events):
+            outcomes = []
+            for event in events:
+                success, message, retryable = post_event(session, json.loads(event["body"]), max_retries=0)
+                outcomes.append((event, success, message, retryable))
+                if not success and retryable:
+                    break
+            return outcomes
+
+        # Workers only talk HTTP; the spool connection stays on this thread
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(groups))) as pool:
+            for outcomes in pool.map(drain_group, groups):
+                for event, success, message, retryable in outcomes:
+                    if success:
+                        spool.delivered(event["id"])
+                        counts["delivered"] += 1
+                    elif retryable:
+                        spool.failed(event["id"], event["attempts"] + 1, message)
+                        counts["retried"] += 1
+                    else:
+                        print(f"ERROR: Discarding spooled PagerDuty event: {message}", file=sys.stderr)
+                        spool.discard(event["id"])
+                        counts["discarded"] += 1
+
+        if counts["delivered"]:
+            print(f"INFO: PagerDuty spool delivered {counts['delivered']} events", file=sys.stderr)
+    return counts
+
+
+def log_spool_stats(spool):
+    if spool is None:
+        return
+    stats = spool.stats()
+    print(
+        f"INFO: PagerDuty spool depth={stats['depth']} oldest_age={stats['oldest_age']}",
+        file=sys.stderr,
+    )
+
+
+def spool_stats_event(spool, counts):
+    """One JSON line for the --drain scripted input (sourcetype sandfly:pagerduty:spool)."""
+    event = {"spool": "pagerduty", "available": spool is not None}
+    if spool is not None:
+        event.update(spool.stats())
+    event.update(counts)
+    return json.dumps(event)
+
+
+def deliver_events(spool, session, events, max_retries, concurrency=1):
+    """
+    Send events, spooling those that fail retryably. Events whose dedup_key
+    already has spooled events queue behind them instead of being sent.
+    Returns (sent messages, spooled or failed messages).
+    """
+
+    direct = []
+    problems = []
+    for event in events:
+        if spool is not None and spool.has_pending(event.get("dedup_key")):
+            problems.append(spool_event(spool, event, "Queued behind earlier spooled events"))
+        else:
+            direct.append(event)
+
+    if not direct:
+        return [], problems
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(direct))) as pool:
+        outcomes = list(pool.map(lambda event: post_event(session, event, max_retries), direct))
+
+    sent = []
+    for event, (success, message, retryable) in zip(direct, outcomes):
+        if success:
+            sent.append(message)
+        elif retryable:
+            problems.append(spool_event(spool, event, message))
+        else:
+            problems.append(message)
+    return sent, problems
+
+
+def send_pagerduty_event(config, payload, spool=None, session=None):
+    """Send event to PagerDuty"""
+
+    if not config.get("routing_key", ""):
+        return False, "No PagerDuty routing key configured"
+
+    max_retries = parse_int(config.get("max_retries"), DEFAULT_MAX_RETRIES, minimum=0)
+    event = build_pagerduty_event(config, payload)
+    sent, problems = deliver_events(spool, session or build_session(), [event], max_retries)
+    if sent:
+        return True, sent[0]
+    return False, problems[0]
+
+
+# -----------------------------------------------------------------------------#
+# Batch mode
+# -----------------------------------------------------------------------------#
+def read_results_file(path):
+    """Yield result rows from Splunk's gzipped CSV results_file."""
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as fh:
+        for row in csv.DictReader(fh):
+            # __mv_* columns carry the multivalue encoding of their twin field
+            yield {k: v for k, v in row.items() if k and not k.startswith("__mv_")}
+
+
+def group_results(config, payload, rows):
+    """
+    Group rows by their rendered dedup_key, in first-seen order.
+
+    Rows whose dedup_key renders empty each get their own event, exactly as
+    single mode would have sent them.
+    """
+
+    template = compile_template(config.get("dedup_key", ""))
+    groups = {}
+    for index, row in enumerate(rows):
+        key = template.render(payload, row)
+        groups.setdefault(key or ("", index), []).append(row)
+    return list(groups.values())
+
+
+def send_pagerduty_batch(config, payload, spool=None, session=None):
+    """Send one PagerDuty event per dedup_key group of the alert's results"""
+
+    if not config.get("routing_key", ""):
+        return False, "No PagerDuty routing key configured"
+
+    results_file = payload.get("results_file")
+    if not results_file:
+        return send_pagerduty_event(config, payload, spool, session)
+
+    try:
+        rows = list(read_results_file(results_file))
+    except (OSError, EOFError, csv.Error) as e:
+        return False, f"Failed to read results file: {e}"
+
+    if not rows:
+        return send_pagerduty_event(config, payload, spool, session)
+
+    groups = group_results(config, payload, rows)
+    concurrency = parse_int(config.get("max_concurrency"), DEFAULT_MAX_CONCURRENCY, maximum=MAX_CONCURRENCY)
+    max_retries = parse_int(config.get("max_retries"), DEFAULT_MAX_RETRIES, minimum=0)
+
+    events = [
+        build_pagerduty_event(config, dict(payload, result=group_rows[0]), group_rows)
+        for group_rows in groups
+    ]
+    sent, problems = deliver_events(
+        spool, session or build_session(pool_size=concurrency), events, max_retries, concurrency
+    )
+    for message in problems:
+        print(f"ERROR: {message}", file=sys.stderr)
+
+    summary = (
+        f"{len(rows)} results grouped into {len(groups)} PagerDuty events: "
+        f"{len(sent)} sent, {len(problems)} not sent"
+    )
+    return not problems, summary
 
 
 def main():
@@ -148,6 +504,14 @@ def main():
         print("ERROR: No payload file provided", file=sys.stderr)
         sys.exit(1)
 
+    spool = open_spool()
+
+    if sys.argv[1] == "--drain":
+        counts = drain_spool(spool, build_session(pool_size=DEFAULT_MAX_CONCURRENCY))
+        # stdout is indexed by the [script://... --drain] input
+        print(spool_stats_event(spool, counts))
+        sys.exit(0)
+
     payload_file = sys.argv[1]
 
     try:
@@ -159,7 +523,19 @@ def main():
 
     config = payload.get("configuration", {})
 
-    success, message = send_pagerduty_event(config, payload)
+    mode = str(config.get("delivery_mode", "single")).strip().lower()
+    concurrency = parse_int(config.get("max_concurrency"), DEFAULT_MAX_CONCURRENCY, maximum=MAX_CONCURRENCY)
+    session = build_session(pool_size=concurrency)
+
+    # Older spooled events go first so per-incident order is kept
+    drain_spool(spool, session, concurrency)
+
+    if mode == "batch":
+        success, message = send_pagerduty_batch(config, payload, spool, session)
+    else:
+        success, message = send_pagerduty_event(config, payload, spool, session)
+
+    log_spool_stats(spool)
 
     if success:
         print(f"INFO: {message}")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_reports.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Split the named sections of /v4/reports/* documents into flat child
+#   events (sourcetype sandfly:report:<name>:item): one per entry of the
+#   small breakdown arrays (distros, kernels, architectures, credential,
+#   sandfly_types) and one per nested object (host_counts, uptime_stats,
+#   scan_counts, scan_time_stats)
+# - Summarise the per-host arrays into a fixed set of buckets: uptimes
+#   into uptime_buckets, scan durations into scan_time_buckets
+# - Dashboards then run plain stats over small events instead of
+#   spath / mvexpand over the whole report at search time
+#
+# Design principles:
+# - Additive: the report itself is still indexed unchanged, plus a
+#   report_id that every child carries
+# - Child count is bounded by the report's breakdowns, never by the fleet:
+#   per-host arrays (uptimes, missing_hosts, hosts) get no children and are
+#   read from the latest report itself
+# - Children lead with report_id, report and section, so the section is
+#   indexed (sf_section) by the flat-prefix transforms
+# - Item fields never overwrite the child's own fields
+# =============================================================================
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sandfly_delta import content_digest
+
+
+# Parent sourcetype -> report name
+REPORTS = {
+    "sandfly:report:host_snapshot": "host_snapshot",
+    "sandfly:report:scan_performance": "scan_performance",
+}
+
+# Report name -> sections split into children
+SECTIONS = {
+    "host_snapshot": ("host_counts", "uptime_stats", "distros", "kernels", "architectures", "credential"),
+    "scan_performance": ("scan_counts", "scan_time_stats", "sandfly_types"),
+}
+
+ID_FIELDS = ("id", "report_id")
+
+# (upper bound, label); the last bucket is open-ended
+UPTIME_BUCKETS = ((1, "<1d"), (7, "1-7d"), (30, "7-30d"), (90, "30-90d"), (365, "90-365d"), (None, ">365d"))
+SCAN_TIME_BUCKETS = ((10, "<10s"), (30, "10-30s"), (60, "30-60s"), (300, "1-5m"), (900, "5-15m"), (None, ">15m"))
+
+# Report name -> (per-host array, numeric field, section, buckets)
+BUCKETED = {
+    "host_snapshot": ("uptimes", "uptime_days", "uptime_buckets", UPTIME_BUCKETS),
+    "scan_performance": ("hosts", "scan_seconds", "scan_time_buckets", SCAN_TIME_BUCKETS),
+}
+
+
+def item_sourcetype(sourcetype: str) -> str:
+    return f"{sourcetype}:item"
+
+
+def with_report_id(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The report with a report_id: its own id, else a digest of its content."""
+    if record.get("report_id") not in (None, ""):
+        return record
+    report_id = next((record[f] for f in ID_FIELDS if record.get(f) not in (None, "")), None)
+    tagged = {"report_id": str(report_id) if report_id is not None else content_digest(record)}
+    tagged.update(record)
+    return tagged
+
+
+def bucket_counts(entries: List[Any], field: str, buckets: Tuple[Tuple[Any, str], ...]) -> List[int]:
+    """Entry counts per bucket by `field`; entries without a number there are skipped."""
+    counts = [0] * len(buckets)
+    for entry in entries:
+        try:
+            value = float(entry.get(field))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        for n, (limit, _) in enumerate(buckets):
+            if limit is None or value < limit:
+                counts[n] += 1
+                break
+    return counts
+
+
+def uptime_buckets(uptimes: List[Any]) -> List[int]:
+    """Host counts per UPTIME_BUCKETS entry; entries without uptime_days are skipped."""
+    return bucket_counts(uptimes, "uptime_days", UPTIME_BUCKETS)
+
+
+def report_children(sourcetype: str, record: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(sourcetype, child) for the named sections of a report, plus its buckets."""
+    report = REPORTS[sourcetype]
+    child_sourcetype = item_sourcetype(sourcetype)
+    base = {"report_id": record["report_id"], "report": report}
+    if record.get("report_time") not in (None, ""):
+        base["report_time"] = record["report_time"]
+
+    for section in SECTIONS[report]:
+        value = record.get(section)
+        if isinstance(value, dict):
+            child = dict(base, section=section)
+            for key, field in value.items():
+                child.setdefault(key, field)
+            yield child_sourcetype, child
+        elif isinstance(value, list):
+            for position, item in enumerate(value):
+                child = dict(base, section=section, position=position)
+                if isinstance(item, dict):
+                    for key, field in item.items():
+                        child.setdefault(key, field)
+                else:
+                    child["value"] = item
+                yield child_sourcetype, child
+
+    array, field, section, buckets = BUCKETED[report]
+    if isinstance(record.get(array), list):
+        counts = bucket_counts(record[array], field, buckets)
+        for position, ((_, label), count) in enumerate(zip(buckets, counts)):
+            yield child_sourcetype, dict(base, section=section, position=position, bucket=label, count=count)
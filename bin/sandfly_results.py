@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_results.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Incremental (high-water mark) collection of POST /v4/results
+# - Resume from the per-stanza checkpoint after restarts and crashes
+# - Bound the first-run backfill window
+#
+# Design principles:
+# - Results are requested in ascending id order
+# - The checkpoint advances every time the event writer flushes a batch,
+#   to the last result handed to the writer before that flush
+# - Records at or below the high-water mark are never re-emitted
+# =============================================================================
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import splunklib.modularinput as smi
+
+
+CHECKPOINT_KEY = "results"
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+DEFAULT_BACKFILL_HOURS = 24
+MAX_BACKFILL_HOURS = 720
+
+
+# -----------------------------------------------------------------------------#
+# Logging helper
+# -----------------------------------------------------------------------------#
+def log(log_fn, level, msg):
+    log_fn(level, msg)
+
+
+# -----------------------------------------------------------------------------#
+# Record helpers
+# -----------------------------------------------------------------------------#
+def result_id(record: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(record.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def result_timestamp(record: Dict[str, Any]) -> Optional[str]:
+    data = record.get("data") if isinstance(record.get("data"), dict) else {}
+    for source in (data, record):
+        for field in ("end_time", "start_time", "timestamp"):
+            if source.get(field):
+                return source[field]
+    return None
+
+
+def results_query(last_id: Optional[int], since: Optional[str], page_size: int) -> Dict[str, Any]:
+    """
+    Build the POST /v4/results body for the next page.
+
+    With a checkpoint the query is "id > last_id"; on first run it is
+    "end_time >= since" (the backfill window). Both sort by id ascending
+    so the high-water mark only ever moves forward.
+    """
+    items: List[Dict[str, Any]] = []
+    if last_id is not None:
+        items.append({"columnField": "id", "operatorValue": ">", "value": str(last_id)})
+    elif since:
+        items.append({"columnField": "data.end_time", "operatorValue": "onOrAfter", "value": since})
+
+    return {
+        "size": page_size,
+        "summary": False,
+        "filter": {"items": items, "linkOperator": "and"},
+        "sort": [{"field": "id", "sort": "asc"}],
+    }
+
+
+# -----------------------------------------------------------------------------#
+# Incremental collector
+# -----------------------------------------------------------------------------#
+class ResultsCursor:
+    """
+    The durable high-water mark of one stanza's results.
+
+    advance() runs after a result was handed to the event writer; save()
+    stores the newest advanced id. Saving after every writer flush means a
+    crash re-emits at most the results still buffered in the writer.
+    """
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        state = checkpoint.get(CHECKPOINT_KEY) or {}
+        self.last_id: Optional[int] = state.get("last_id")
+        self.last_timestamp: Optional[str] = state.get("last_timestamp")
+        self._saved_id = self.last_id
+        self._lock = threading.Lock()
+
+    def advance(self, rid: int, timestamp: Optional[str]):
+        with self._lock:
+            self.last_id = rid
+            self.last_timestamp = timestamp or self.last_timestamp
+
+    def save(self):
+        with self._lock:
+            if self.last_id == self._saved_id:
+                return
+            self.checkpoint.set(
+                CHECKPOINT_KEY,
+                {"last_id": self.last_id, "last_timestamp": self.last_timestamp, "updated": int(time.time())},
+            )
+            self.checkpoint.save()
+            self._saved_id = self.last_id
+
+
+def collect_results_incremental(
+    iter_pages: Callable[[Callable[[], Dict[str, Any]], int], Iterable[Iterable[Dict[str, Any]]]],
+    checkpoint,
+    emit: Callable[[Dict[str, Any]], None],
+    log_fn,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    backfill_hours: int = DEFAULT_BACKFILL_HOURS,
+    flush: Optional[Callable[[], None]] = None,
+    on_flush: Optional[Callable[[Callable[[], None]], Callable[[], None]]] = None,
+) -> int:
+    """
+    Pull results newer than the stored high-water mark.
+
+    iter_pages(next_query, page_size) is SandflyAPI.iter_pages bound to
+    /v4/results: it yields one streamed page per query until a short page.
+
+    flush and on_flush are the event writer's: on_flush(listener) runs
+    listener after every batch the writer sends (and returns a function
+    that removes it). The cursor is saved from there and again after
+    flush() at the end of every page, so it never gets ahead of what
+    splunkd has received. After a crash, only results that were still
+    buffered in the writer, at most one batch, are written again.
+    Without on_flush the cursor is saved once per page.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    backfill_hours = max(0, min(int(backfill_hours), MAX_BACKFILL_HOURS))
+
+    cursor = ResultsCursor(checkpoint)
+    last_id = cursor.last_id
+
+    since = None
+    if last_id is None:
+        since = (datetime.now(timezone.utc) - timedelta(hours=backfill_hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        log(log_fn, smi.EventWriter.INFO, f"Results: no checkpoint, backfilling from {since}")
+    else:
+        log(log_fn, smi.EventWriter.INFO, f"Results: resuming after id {last_id}")
+
+    def save_after_batch():
+        try:
+            cursor.save()
+        except OSError:
+            # Runs on whichever thread flushed; the end of the page retries
+            pass
+
+    remove_listener = on_flush(save_after_batch) if on_flush is not None else None
+    written = 0
+
+    def next_query() -> Dict[str, Any]:
+        return results_query(last_id, since, page_size)
+
+    try:
+        for page in iter_pages(next_query, page_size):
+            progressed = False
+            seen = 0
+
+            for record in page:
+                seen += 1
+                rid = result_id(record)
+                if rid is None or (last_id is not None and rid <= last_id):
+                    continue
+
+                emit(record)
+                cursor.advance(rid, result_timestamp(record))
+                written += 1
+                last_id = rid
+                progressed = True
+
+            if progressed:
+                if flush is not None:
+                    flush()
+                cursor.save()
+
+            if not progressed and seen >= page_size:
+                # A full page with nothing past the mark means the server
+                # ignored the filter; stop rather than loop on the same page.
+                log(log_fn, smi.EventWriter.WARN, f"Results: no progress past id {last_id}, stopping this cycle")
+                break
+    finally:
+        if remove_listener is not None:
+            remove_listener()
+
+    return written
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_scheduler.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Run every sandfly_security:// stanza concurrently in one input process
+# - Give each stanza its own interval, run deadline and thread budget
+# - Keep sessions, connection pools and tokens alive between cycles
+#
+# Design principles:
+# - One thread per stanza: a slow or unreachable server only delays itself
+# - Cycles of one stanza never overlap; an overrun starts the next cycle
+#   immediately instead of queueing several
+# - A stanza that cannot log in is retried on its next cycle, never fatal
+# - All stanzas write through one batching BulkEventWriter
+# - KV store current state uses the input's splunkd session, when there is one
+# =============================================================================
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import splunklib.modularinput as smi
+
+from sandfly_checkpoint import CheckpointStore
+from sandfly_client import DEFAULT_SERVER_CONCURRENCY, DEFAULT_TIMEOUT, SandflyAPI
+from sandfly_collectors import DEFAULT_COLLECTOR_THREADS, CollectorEngine
+from sandfly_hostdetails import DEFAULT_HOST_DETAIL_THREADS
+from sandfly_kvstore import state_writers
+from sandfly_throttle import DEFAULT_BREAKER_COOLDOWN, DEFAULT_BREAKER_THRESHOLD, DEFAULT_MAX_RATE
+from sandfly_writer import BulkEventWriter
+
+
+DEFAULT_INTERVAL = 300
+MIN_INTERVAL = 10
+
+
+# -----------------------------------------------------------------------------#
+# Logging helper
+# -----------------------------------------------------------------------------#
+def log(log_fn, level, msg):
+    log_fn(level, msg)
+
+
+def number(params: Dict[str, Any], key: str, default: float) -> float:
+    value = params.get(key)
+    try:
+        return float(value) if value not in (None, "") else float(default)
+    except (TypeError, ValueError):
+        return float(default)
+
+
+# -----------------------------------------------------------------------------#
+# One stanza
+# -----------------------------------------------------------------------------#
+class StanzaRunner:
+    """
+    Collection state for one input stanza that outlives a single cycle.
+
+    The SandflyAPI (session, keep-alive pool, tokens) and the checkpoint
+    store are created once and reused by every cycle.
+    """
+
+    def __init__(
+        self, stanza: str, params: Dict[str, Any], checkpoint_dir: str, ew, writer: BulkEventWriter, service=None
+    ):
+        self.stanza = stanza
+        self.params = params
+        self.checkpoint_dir = checkpoint_dir
+        self.ew = ew
+        self.writer = writer
+
+        self.interval = max(MIN_INTERVAL, number(params, "interval", DEFAULT_INTERVAL))
+        # 0 = no deadline; collectors not started by the deadline are skipped
+        self.run_deadline = number(params, "run_deadline", self.interval)
+        self.threads = int(number(params, "collector_threads", DEFAULT_COLLECTOR_THREADS))
+        self.detail_threads = int(number(params, "host_detail_threads", DEFAULT_HOST_DETAIL_THREADS))
+
+        self.api: Optional[SandflyAPI] = None
+        self.checkpoint = CheckpointStore(checkpoint_dir, stanza)
+        self.state_writers = state_writers(service, stanza)
+        self.cycles = 0
+
+    def connect(self) -> SandflyAPI:
+        params = self.params
+        return SandflyAPI(
+            base_url=params["sandfly_url"],
+            username=params["username"],
+            password=params["password"],
+            log_fn=self.ew.log,
+            verify_ssl=params.get("verify_ssl", True),
+            timeout=int(params.get("timeout") or DEFAULT_TIMEOUT),
+            proxy_url=params.get("proxy_url"),
+            proxy_user=params.get("proxy_user"),
+            proxy_pass=params.get("proxy_pass"),
+            pool_size=self.threads + self.detail_threads,
+            max_concurrency=int(params.get("server_max_concurrency") or DEFAULT_SERVER_CONCURRENCY),
+            token_cache_dir=self.checkpoint_dir,
+            max_rate=float(params.get("api_max_rate") or DEFAULT_MAX_RATE),
+            breaker_threshold=int(params.get("breaker_threshold") or DEFAULT_BREAKER_THRESHOLD),
+            breaker_cooldown=float(params.get("breaker_cooldown") or DEFAULT_BREAKER_COOLDOWN),
+        )
+
+    def run_cycle(self) -> bool:
+        """One collection cycle; False if the stanza could not start."""
+        if self.api is None:
+            try:
+                self.api = self.connect()
+            except Exception as e:
+                log(self.ew.log, smi.EventWriter.ERROR, f"Input stanza '{self.stanza}' failed to initialize: {e}")
+                return False
+            log(self.ew.log, smi.EventWriter.INFO, f"Input stanza '{self.stanza}' initialized")
+
+        started = time.time()
+        deadline = started + self.run_deadline if self.run_deadline > 0 else None
+
+        CollectorEngine(
+            self.api,
+            self.ew,
+            self.stanza,
+            self.params,
+            max_workers=self.threads,
+            checkpoint=self.checkpoint,
+            writer=self.writer,
+            deadline=deadline,
+            state_writers=self.state_writers,
+        ).run()
+
+        self.api.log_pacing()
+        self.cycles += 1
+
+        elapsed = time.time() - started
+        if elapsed > self.interval:
+            log(
+                self.ew.log,
+                smi.EventWriter.WARN,
+                f"Input stanza '{self.stanza}': cycle took {elapsed:.0f}s, longer than its "
+                f"{self.interval:.0f}s interval; starting the next cycle now",
+            )
+        return True
+
+
+# -----------------------------------------------------------------------------#
+# All stanzas
+# -----------------------------------------------------------------------------#
+class StanzaScheduler:
+    def __init__(self, inputs: Dict[str, Dict[str, Any]], checkpoint_dir: str, ew, service=None):
+        self.ew = ew
+        self.stop_event = threading.Event()
+        writer = BulkEventWriter(ew)
+        self.runners = [
+            StanzaRunner(stanza, params, checkpoint_dir, ew, writer, service) for stanza, params in inputs.items()
+        ]
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _start(self, target, runner: StanzaRunner) -> threading.Thread:
+        thread = threading.Thread(
+            target=target,
+            args=(runner,),
+            name=f"sandfly-stanza-{runner.stanza.rsplit('/', 1)[-1]}",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def run_once(self) -> int:
+        """Run every stanza once, concurrently; return the number that failed to start."""
+        results: Dict[str, bool] = {}
+
+        def cycle(runner: StanzaRunner):
+            results[runner.stanza] = runner.run_cycle()
+
+        for thread in [self._start(cycle, runner) for runner in self.runners]:
+            thread.join()
+        return sum(1 for ok in results.values() if not ok)
+
+    def run_forever(self):
+        """Long-lived mode: each stanza cycles on its own interval until stop()."""
+
+        def loop(runner: StanzaRunner):
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                try:
+                    runner.run_cycle()
+                except Exception as e:
+                    log(self.ew.log, smi.EventWriter.ERROR, f"Input stanza '{runner.stanza}' cycle failed: {e}")
+                wait = runner.interval - (time.monotonic() - started)
+                if wait > 0:
+                    self.stop_event.wait(wait)
+
+        log(
+            self.ew.log,
+            smi.EventWriter.INFO,
+            f"Sandfly scheduler running {len(self.runners)} stanza(s): "
+            + ", ".join(f"{r.stanza} every {r.interval:.0f}s" for r in self.runners),
+        )
+
+        threads = [self._start(loop, runner) for runner in self.runners]
+        while not self.stop_event.is_set():
+            self.stop_event.wait(1.0)
+        for thread in threads:
+            thread.join(timeout=DEFAULT_TIMEOUT)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_spool.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Durable local retry queue for outbound alert events (PagerDuty)
+# - Splunk never re-runs a failed alert action, so anything we could not
+#   deliver is kept here until a later drain succeeds
+#
+# Design principles:
+# - Append-only SQLite file (WAL) under $SPLUNK_HOME/var/lib/splunk
+# - Order is preserved per ordering key (PagerDuty dedup_key): only the
+#   oldest pending event of a key is ever eligible for delivery
+# - Exponential backoff with jitter per key; events older than the
+#   maximum age are dropped and reported
+# - One drainer at a time across processes (non-blocking file lock)
+# =============================================================================
+
+import contextlib
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+APP_NAME = "sandfly_security_for_splunk"
+
+DEFAULT_MAX_AGE = 86400
+BACKOFF_BASE = 30
+BACKOFF_MAX = 1800
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ordering_key TEXT,
+    body TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS events_key ON events (ordering_key, id);
+"""
+
+
+def default_spool_dir() -> str:
+    splunk_home = os.environ.get("SPLUNK_HOME")
+    if splunk_home:
+        return os.path.join(splunk_home, "var", "lib", "splunk", APP_NAME)
+    return os.path.join(tempfile.gettempdir(), APP_NAME)
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return delay + random.uniform(0, delay / 4)
+
+
+# -----------------------------------------------------------------------------#
+# Spool
+# -----------------------------------------------------------------------------#
+class EventSpool:
+    """
+    Pending events for one delivery target.
+
+    Events without an ordering key are independent of each other; events
+    sharing a key are delivered strictly in the order they were spooled.
+    """
+
+    def __init__(self, name: str, spool_dir: Optional[str] = None, max_age: float = DEFAULT_MAX_AGE):
+        self.spool_dir = spool_dir or default_spool_dir()
+        self.path = os.path.join(self.spool_dir, f"{name}_spool.db")
+        self.max_age = max_age
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Spooled bodies carry integration keys
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def enqueue(self, ordering_key: Optional[str], body: str, error: Optional[str] = None):
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO events (ordering_key, body, created, attempts, next_attempt, last_error) "
+            "VALUES (?, ?, ?, 1, ?, ?)",
+            (ordering_key or None, body, now, now + backoff_delay(1), error),
+        )
+
+    def has_pending(self, ordering_key: Optional[str]) -> bool:
+        if not ordering_key:
+            return False
+        row = self._db.execute(
+            "SELECT 1 FROM events WHERE ordering_key = ? LIMIT 1", (ordering_key,)
+        ).fetchone()
+        return row is not None
+
+    def expire(self) -> int:
+        """Drop events older than max_age; return how many were dropped."""
+        cursor = self._db.execute("DELETE FROM events WHERE created < ?", (time.time() - self.max_age,))
+        return cursor.rowcount
+
+    def due(self) -> List[List[Dict[str, Any]]]:
+        """
+        Deliverable events grouped per ordering key, oldest first.
+
+        A key whose oldest event is still backing off is skipped entirely,
+        so later events never overtake it.
+        """
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT id, ordering_key, body, attempts, next_attempt FROM events ORDER BY id"
+        ).fetchall()
+
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        blocked = set()
+        for event_id, key, body, attempts, next_attempt in rows:
+            group = key if key is not None else ("", event_id)
+            if group in blocked:
+                continue
+            if group not in groups and next_attempt > now:
+                blocked.add(group)
+                continue
+            groups.setdefault(group, []).append({"id": event_id, "body": body, "attempts": attempts})
+        return list(groups.values())
+
+    def delivered(self, event_id: int):
+        self._db.execute("DELETE FROM events WHERE id = ?", (event_id,))
+
+    def failed(self, event_id: int, attempts: int, error: str):
+        self._db.execute(
+            "UPDATE events SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+            (attempts, time.time() + backoff_delay(attempts), error, event_id),
+        )
+
+    def discard(self, event_id: int):
+        self.delivered(event_id)
+
+    def stats(self) -> Dict[str, Any]:
+        depth, oldest = self._db.execute("SELECT COUNT(*), MIN(created) FROM events").fetchone()
+        return {
+            "depth": depth,
+            "oldest_age": round(time.time() - oldest, 1) if oldest else 0,
+        }
+
+    @contextlib.contextmanager
+    def drain_lock(self) -> Iterator[bool]:
+        """Yield True if this process may drain (no other drainer running)."""
+        if fcntl is None:
+            yield True
+            return
+
+        with open(f"{self.path}.drain.lock", "a") as lock_fh:
+            try:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_telemetry.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Time every Sandfly API request (connect, time to first byte, total)
+# - Count response bytes, decoded items and client-side retries
+# - Roll requests up per collector and per input run
+# - Emit it all as JSON events under sourcetype sandfly:telemetry
+#
+# Event types (field telemetry_type):
+# - request:     one per collector request (pages included)
+# - host_detail: one per per-host endpoint, aggregated over the fan-out
+# - collector:   one per collector run
+# - run:         one per stanza cycle, with interval headroom
+#
+# Design principles:
+# - Attribution via a thread-local scope, so the client needs no knowledge
+#   of collectors
+# - Connection setup (DNS + TCP + TLS) is measured inside urllib3's
+#   connect(); a reused keep-alive connection reports 0
+# =============================================================================
+
+import contextlib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+TELEMETRY_SOURCETYPE = "sandfly:telemetry"
+
+_local = threading.local()
+
+
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000.0, 2)
+
+
+# -----------------------------------------------------------------------------#
+# Connection timing (urllib3 instrumentation)
+# -----------------------------------------------------------------------------#
+def reset_connection_timing():
+    _local.connect_seconds = 0.0
+    _local.new_connections = 0
+
+
+def connection_timing():
+    """(seconds spent opening connections, connections opened) on this thread."""
+    return getattr(_local, "connect_seconds", 0.0), getattr(_local, "new_connections", 0)
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _local.connect_seconds = getattr(_local, "connect_seconds", 0.0) + time.perf_counter() - started
+            _local.new_connections = getattr(_local, "new_connections", 0) + 1
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+def _instrument(manager):
+    manager.pool_classes_by_scheme = {
+        "http": TimedHTTPConnectionPool,
+        "https": TimedHTTPSConnectionPool,
+    }
+    return manager
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record their setup time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        _instrument(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        return _instrument(super().proxy_manager_for(proxy, **proxy_kwargs))
+
+
+# -----------------------------------------------------------------------------#
+# Aggregation
+# -----------------------------------------------------------------------------#
+class _Scope:
+    def __init__(self, name: str, aggregate: bool):
+        self.name = name
+        self.aggregate = aggregate
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.items = 0
+        self.retries = 0
+        self.new_connections = 0
+        self.connect_ms = 0.0
+        self.ttfb_ms: List[float] = []
+        self.total_ms: List[float] = []
+        self.events = 0
+
+    def add(self, timing: Dict[str, Any]):
+        self.requests += 1
+        self.errors += 1 if timing.get("error") else 0
+        self.bytes += timing.get("bytes") or 0
+        self.items += timing.get("items") or 0
+        self.retries += timing.get("retries") or 0
+        self.new_connections += timing.get("new_connections") or 0
+        self.connect_ms += timing.get("connect_ms") or 0.0
+        if timing.get("ttfb_ms") is not None:
+            self.ttfb_ms.append(timing["ttfb_ms"])
+        self.total_ms.append(timing["total_ms"])
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def scope_summary(scope: _Scope) -> Dict[str, Any]:
+    return {
+        "requests": scope.requests,
+        "errors": scope.errors,
+        "bytes": scope.bytes,
+        "items": scope.items,
+        "retries": scope.retries,
+        "new_connections": scope.new_connections,
+        "connect_ms": round(scope.connect_ms, 2),
+        "ttfb_ms_p50": percentile(scope.ttfb_ms, 50),
+        "ttfb_ms_p95": percentile(scope.ttfb_ms, 95),
+        "total_ms_p50": percentile(scope.total_ms, 50),
+        "total_ms_p95": percentile(scope.total_ms, 95),
+        "total_ms_max": max(scope.total_ms) if scope.total_ms else None,
+        "total_ms_sum": round(sum(scope.total_ms), 2),
+    }
+
+
+# -----------------------------------------------------------------------------#
+# Recorder
+# -----------------------------------------------------------------------------#
+class TelemetryRecorder:
+    """
+    Collects request timings for one stanza cycle and emits telemetry events.
+
+    SandflyAPI calls record_request() for every request it completes; the
+    request is attributed to the scope active on the calling thread.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], stanza: str):
+        self._emit = emit
+        self.stanza = stanza
+        self._lock = threading.Lock()
+        self._aggregates: Dict[str, _Scope] = {}
+
+    def emit(self, telemetry_type: str, record: Dict[str, Any]):
+        event = {"timestamp": utc_timestamp(), "telemetry_type": telemetry_type, "stanza": self.stanza}
+        event.update((k, v) for k, v in record.items() if v is not None)
+        self._emit(event)
+
+    @contextlib.contextmanager
+    def scope(self, name: str, aggregate: bool = False):
+        """
+        Attribute requests on this thread to `name`.
+
+        A plain scope emits each request plus one collector event on exit;
+        an aggregate scope (the host detail fan-out) is shared by all
+        threads using the same name and emitted once by flush().
+        """
+        if aggregate:
+            with self._lock:
+                current = self._aggregates.setdefault(name, _Scope(name, True))
+        else:
+            current = _Scope(name, False)
+
+        previous = getattr(_local, "scope", None)
+        _local.scope = current
+        started = time.perf_counter()
+        try:
+            yield current
+        finally:
+            _local.scope = previous
+            if not aggregate:
+                record = {"collector": name, "duration_ms": ms(time.perf_counter() - started), "events": current.events}
+                record.update(scope_summary(current))
+                self.emit("collector", record)
+
+    def record_request(self, timing: Dict[str, Any]):
+        current = getattr(_local, "scope", None)
+        if current is not None and current.aggregate:
+            with self._lock:
+                current.add(timing)
+            return
+
+        if current is not None:
+            current.add(timing)
+        record = {"collector": current.name if current is not None else None}
+        record.update(timing)
+        self.emit("request", record)
+
+    def flush(self):
+        """Emit the aggregated host detail events."""
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+        for name, aggregate in aggregates.items():
+            record = {"collector": name}
+            record.update(scope_summary(aggregate))
+            self.emit("host_detail", record)
+
+
+def telemetry_scope(recorder: Optional[TelemetryRecorder], name: str, aggregate: bool = False):
+    if recorder is None:
+        return contextlib.nullcontext()
+    return recorder.scope(name, aggregate)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_throttle.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Pace requests to one Sandfly server across every collector thread
+# - Back off together when the server says it is overloaded
+# - Stop calling a server that keeps failing for the rest of the cycle
+#
+# Components:
+# - AdaptiveRateLimiter: token bucket whose rate follows AIMD (additive
+#   increase on fast successes, multiplicative decrease on 429/503 or
+#   slow responses), with a shared pause for Retry-After
+# - CircuitBreaker: closed -> open after N consecutive failures, half-open
+#   probe after a cooldown, closed again on the first success; a failed or
+#   throttled probe re-opens it, an unresolved one expires after a cooldown
+#
+# Both are shared per base_url by SandflyAPI; they never log themselves but
+# report state changes to the caller, which owns the log function.
+# =============================================================================
+
+import threading
+import time
+from typing import Optional
+
+from sandfly_errors import CircuitOpenError
+
+
+# Sized for the host detail fan-out: 5,000 hosts x 8 endpoints is 40,000
+# requests, which needs about 170 req/s to finish within the default
+# host_detail_deadline of 240s
+DEFAULT_MAX_RATE = 200.0
+MIN_RATE = 0.5
+INITIAL_RATE_FRACTION = 0.5
+
+# Additive increase: roughly +4 req/s for every second of clean traffic
+ADDITIVE_INCREASE = 4.0
+DECREASE_FACTOR = 0.5
+SLOW_DECREASE_FACTOR = 0.85
+# One decrease per window, however many concurrent calls saw the 429
+DECREASE_WINDOW = 1.0
+
+DEFAULT_LATENCY_TARGET = 5.0
+# Shared pause after a 429/503 without Retry-After
+DEFAULT_THROTTLE_PAUSE = 2.0
+MAX_PAUSE = 120.0
+
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 60.0
+
+
+# -----------------------------------------------------------------------------#
+# Rate limiter
+# -----------------------------------------------------------------------------#
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        max_rate: float = DEFAULT_MAX_RATE,
+        latency_target: float = DEFAULT_LATENCY_TARGET,
+    ):
+        self.max_rate = max(MIN_RATE, float(max_rate))
+        self.latency_target = latency_target
+        self.rate = max(MIN_RATE, self.max_rate * INITIAL_RATE_FRACTION)
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        self.throttled = 0
+        self.slow = 0
+        self.waited = 0.0
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Block until a request may be sent; False if that would pass the
+        (monotonic) deadline.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._paused_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+
+                wait = max(self._paused_until - now, (1.0 - self._tokens) / self.rate)
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            with self._lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def on_success(self, latency: float) -> Optional[float]:
+        """Feed back one successful request; returns the new rate if it dropped."""
+        with self._lock:
+            if latency > self.latency_target:
+                self.slow += 1
+                return self._decrease(SLOW_DECREASE_FACTOR)
+            self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+            return None
+
+    def on_throttle(self, retry_after: Optional[float]) -> Optional[float]:
+        """Feed back a 429/503; pauses every caller (for Retry-After if given)."""
+        with self._lock:
+            self.throttled += 1
+            pause = min(retry_after if retry_after else DEFAULT_THROTTLE_PAUSE, MAX_PAUSE)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            return self._decrease(DECREASE_FACTOR)
+
+    def _decrease(self, factor: float) -> Optional[float]:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_WINDOW:
+            return None
+        self._last_decrease = now
+        self.rate = max(MIN_RATE, self.rate * factor)
+        self._tokens = min(self._tokens, 0.0)
+        return self.rate
+
+
+# -----------------------------------------------------------------------------#
+# Circuit breaker
+# -----------------------------------------------------------------------------#
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, cooldown: float = DEFAULT_BREAKER_COOLDOWN):
+        self.threshold = max(1, int(threshold))
+        self.cooldown = float(cooldown)
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+
+        self.rejected = 0
+        self.trips = 0
+
+    def before_request(self, target: str) -> Optional[str]:
+        """
+        Raise CircuitOpenError while open. After the cooldown one caller is
+        let through as a probe; a probe that has not resolved within another
+        cooldown is given up and the next caller probes instead. Returns the
+        new state if it changed.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_started = now
+                return self.state
+            if self.state == self.HALF_OPEN and now - self._probe_started >= self.cooldown:
+                self._probe_started = now
+                return None
+
+            self.rejected += 1
+            since = self._opened_at if self.state == self.OPEN else self._probe_started
+            raise CircuitOpenError(target, max(0.0, self.cooldown - (now - since)))
+
+    def record_success(self) -> Optional[str]:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                return self.state
+            return None
+
+    def record_failure(self) -> Optional[str]:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                return self._trip()
+            return None
+
+    def record_throttle(self) -> Optional[str]:
+        """
+        A 429/503. While closed the rate limiter deals with it; a throttled
+        probe fails and re-opens the breaker for another cooldown.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                return self._trip()
+            return None
+
+    def _trip(self) -> str:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        return self.state
+
+
+class ServerGuard:
+    """Limiter and breaker for one Sandfly server, shared in-process."""
+
+    _guards = {}
+    _guards_lock = threading.Lock()
+
+    def __init__(self, base_url: str, max_rate: float, threshold: int, cooldown: float):
+        self.base_url = base_url
+        self.limiter = AdaptiveRateLimiter(max_rate)
+        self.breaker = CircuitBreaker(threshold, cooldown)
+
+    @classmethod
+    def for_server(
+        cls,
+        base_url: str,
+        max_rate: float = DEFAULT_MAX_RATE,
+        threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        cooldown: float = DEFAULT_BREAKER_COOLDOWN,
+    ) -> "ServerGuard":
+        with cls._guards_lock:
+            if base_url not in cls._guards:
+                cls._guards[base_url] = cls(base_url, max_rate, threshold, cooldown)
+            return cls._guards[base_url]
+
+    def summary(self) -> str:
+        limiter, breaker = self.limiter, self.breaker
+        return (
+            f"rate={limiter.rate:.1f} req/s (max {limiter.max_rate:g}), throttled={limiter.throttled}, "
+            f"slow={limiter.slow}, waited={limiter.waited:.1f}s, breaker={breaker.state}, "
+            f"breaker_trips={breaker.trips}, breaker_rejected={breaker.rejected}"
+        )
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_time.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Give every event its _time at collection time, from the sourcetype's
+#   known time field, so indexers never regex-scan for a timestamp
+# - Keep sub-seconds and time zone offsets that TIME_FORMAT used to drop
+#
+# Design principles:
+# - Parsers are built once per timestamp "shape" (the string with every
+#   digit replaced by 'd') and cached; parsing is then plain slicing
+# - Timestamps without an offset are UTC, as the Sandfly API returns them;
+#   a date alone is midnight UTC, an impossible date or time is unusable
+# - Events without a usable time field get the collection time
+# =============================================================================
+
+import calendar
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# Dotted paths tried in order, per sourcetype
+TIME_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "sandfly:results": ("data.end_time", "data.start_time", "end_time", "start_time", "timestamp"),
+    "sandfly:results:timeline": ("timestamp", "end_time", "data.end_time"),
+    "sandfly:audit": ("timestamp", "event_time", "created_date"),
+    "sandfly:logs:error": ("timestamp", "event_time", "time"),
+    "sandfly:logs:audit": ("timestamp", "event_time", "time"),
+    "sandfly:telemetry": ("timestamp",),
+}
+
+# Snapshot sourcetypes describe the current state: their _time is the
+# collection time, not when the object was created.
+SNAPSHOT_PREFIXES = (
+    "sandfly:hosts",
+    "sandfly:jumphosts",
+    "sandfly:sandflies",
+    "sandfly:credentials",
+    "sandfly:savedviews",
+    "sandfly:notifications",
+    "sandfly:config",
+    "sandfly:license",
+    "sandfly:version",
+    "sandfly:sshhunter",
+    "sandfly:report",
+)
+
+DEFAULT_TIME_FIELDS = ("timestamp", "event_time", "created_date")
+
+MAX_CACHED_SHAPES = 64
+# Epoch values above this are milliseconds
+EPOCH_MS_THRESHOLD = 1e11
+
+_SHAPE = str.maketrans("0123456789", "dddddddddd")
+_ISO_SHAPE = re.compile(
+    r"^dddd-dd-dd(?:[T ]dd:dd(?::dd)?(?P<frac>\.d+)?(?P<zone>Z|[+-]dd:?dd)?)?$"
+)
+
+_parsers: Dict[str, Callable[[str], Optional[float]]] = {}
+_parsers_lock = threading.Lock()
+_field_cache: Dict[str, Tuple[Tuple[str, ...], ...]] = {}
+
+
+# -----------------------------------------------------------------------------#
+# Parsing
+# -----------------------------------------------------------------------------#
+def _unparseable(value: str) -> Optional[float]:
+    return None
+
+
+def _build_parser(shape: str) -> Callable[[str], Optional[float]]:
+    """Return a slicing parser for one ISO 8601 shape, or _unparseable."""
+    match = _ISO_SHAPE.match(shape)
+    if match is None:
+        return _unparseable
+
+    has_time = len(shape) > 10
+    has_seconds = shape[16:17] == ":"
+    frac_start, frac_end = match.span("frac") if match.group("frac") else (-1, -1)
+    zone = match.group("zone")
+    zone_start = match.start("zone") if zone else -1
+    zone_colon = bool(zone) and zone != "Z" and ":" in zone
+
+    def parse(value: str) -> Optional[float]:
+        year, month, day = int(value[0:4]), int(value[5:7]), int(value[8:10])
+        hour = int(value[11:13]) if has_time else 0
+        minute = int(value[14:16]) if has_time else 0
+        second = int(value[17:19]) if has_seconds else 0
+        # timegm() rolls an out-of-range day or time over instead of failing
+        if hour > 23 or minute > 59 or second > 59 or not year:
+            return None
+        try:
+            if day < 1 or (day > 28 and day > calendar.monthrange(year, month)[1]):
+                return None
+            epoch = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+        except ValueError:
+            return None
+        if frac_start >= 0:
+            epoch += float("0" + value[frac_start:frac_end])
+        if zone_start >= 0 and value[zone_start] != "Z":
+            sign = -1 if value[zone_start] == "+" else 1
+            hours = int(value[zone_start + 1:zone_start + 3])
+            if hours > 23:
+                return None
+            minutes = int(value[zone_start + 4:zone_start + 6] if zone_colon else value[zone_start + 3:zone_start + 5])
+            epoch += sign * (hours * 3600 + minutes * 60)
+        return epoch
+
+    return parse
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """Epoch seconds for an ISO 8601 string or epoch number; None if unusable."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > EPOCH_MS_THRESHOLD else float(value)
+    if not isinstance(value, str) or not value:
+        return None
+
+    shape = value.translate(_SHAPE)
+    parser = _parsers.get(shape)
+    if parser is None:
+        parser = _build_parser(shape)
+        with _parsers_lock:
+            if len(_parsers) < MAX_CACHED_SHAPES:
+                _parsers[shape] = parser
+    return parser(value)
+
+
+# -----------------------------------------------------------------------------#
+# Event time
+# -----------------------------------------------------------------------------#
+def time_fields(sourcetype: str) -> Tuple[Tuple[str, ...], ...]:
+    """Split time field paths for a sourcetype (cached)."""
+    fields = _field_cache.get(sourcetype)
+    if fields is None:
+        if sourcetype in TIME_FIELDS:
+            paths = TIME_FIELDS[sourcetype]
+        elif sourcetype.startswith(SNAPSHOT_PREFIXES):
+            paths = ()
+        else:
+            paths = DEFAULT_TIME_FIELDS
+        fields = tuple(tuple(path.split(".")) for path in paths)
+        _field_cache[sourcetype] = fields
+    return fields
+
+
+def lookup_path(record: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def event_time(sourcetype: str, record: Any, now: Optional[float] = None) -> str:
+    """
+    The <time> value for one event: the first parseable time field of the
+    sourcetype, else the collection time.
+    """
+    if isinstance(record, dict):
+        for path in time_fields(sourcetype):
+            epoch = parse_time(lookup_path(record, path))
+            if epoch is not None:
+                return "%.3f" % epoch
+    return "%.3f" % (now if now is not None else time.time())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_token.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Track the real expiry of Sandfly access tokens (JWT "exp" claim)
+# - Refresh ahead of expiry, with jitter so workers do not refresh together
+# - Share tokens per (url, username) across threads, stanzas and processes
+#
+# Storage:
+# - In-process: one cache entry per (url, username, password hash), so a
+#   changed password never reuses a token obtained with the old one
+# - On disk: one file per (url, username) under the checkpoint dir,
+#   encrypted with a key derived from the account password and guarded
+#   by an exclusive file lock
+#
+# Design constraints:
+# - Tokens are never written to disk in clear text; without the optional
+#   "cryptography" package the on-disk cache is disabled
+# - A missing, stale or undecryptable cache simply means "log in again"
+# =============================================================================
+
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sandfly_checkpoint import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = Exception
+
+
+# Used when the server issues a token without a readable "exp" claim
+FALLBACK_TOKEN_LIFETIME = 300
+
+DEFAULT_REFRESH_MARGIN = 60
+DEFAULT_REFRESH_JITTER = 30
+# Short-lived tokens refresh at the latest halfway through their lifetime,
+# not right after login
+MAX_REFRESH_LEAD_FRACTION = 0.5
+
+KDF_ITERATIONS = 200000
+
+
+# -----------------------------------------------------------------------------#
+# JWT helpers
+# -----------------------------------------------------------------------------#
+def jwt_expiry(token: Optional[str]) -> Optional[float]:
+    """Return the "exp" claim of a JWT without verifying it, or None."""
+    if not token or token.count(".") != 2:
+        return None
+
+    segment = token.split(".")[1]
+    segment += "=" * (-len(segment) % 4)
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(segment.encode("ascii")))
+        return float(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# -----------------------------------------------------------------------------#
+# Token manager
+# -----------------------------------------------------------------------------#
+class TokenManager:
+    """
+    Token state for one (url, username) pair.
+
+    The SandflyAPI client asks should_refresh() before each request. When
+    it is time, it takes locked(), calls load() to pick up a token another
+    thread or process may already have renewed, and only refreshes or logs
+    in itself (then store()) if there is none.
+    """
+
+    _memory: Dict[str, Dict[str, Any]] = {}
+    _memory_lock = threading.Lock()
+    _keys: Dict[str, bytes] = {}
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        cache_dir: Optional[str] = None,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        refresh_jitter: float = DEFAULT_REFRESH_JITTER,
+    ):
+        self.base_url = base_url
+        self.username = username
+        self.cache_id = hashlib.sha256(f"{base_url}\n{username}".encode("utf-8")).hexdigest()[:24]
+        # Same derivation as the per-process KDF cache key
+        self.memory_key = hashlib.sha256(f"{self.cache_id}\n{password}".encode("utf-8")).hexdigest()
+
+        # Each client refreshes at its own point inside the jitter window
+        self.refresh_lead = refresh_margin + random.uniform(0, refresh_jitter)
+
+        self._fernet = None
+        self.path = None
+        if cache_dir and Fernet is not None:
+            self._fernet = Fernet(self._derive_key(password))
+            self.path = os.path.join(cache_dir, f"sandfly_token.{self.cache_id}.bin")
+
+    def _derive_key(self, password: str) -> bytes:
+        # PBKDF2 is deliberately slow; derive once per process per account
+        with self._memory_lock:
+            if self.memory_key not in self._keys:
+                raw = hashlib.pbkdf2_hmac(
+                    "sha256", password.encode("utf-8"), self.cache_id.encode("ascii"), KDF_ITERATIONS
+                )
+                self._keys[self.memory_key] = base64.urlsafe_b64encode(raw)
+            return self._keys[self.memory_key]
+
+    # -------------------------------------------------------------------------#
+    # Token records
+    # -------------------------------------------------------------------------#
+    @staticmethod
+    def record(access_token: str, refresh_token: Optional[str]) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expiry": jwt_expiry(access_token) or now + FALLBACK_TOKEN_LIFETIME,
+            "refresh_expiry": jwt_expiry(refresh_token),
+            "issued": now,
+        }
+
+    def lead_for(self, expiry: float, issued: Optional[float] = None) -> float:
+        """Seconds before expiry to refresh: never more than half the token's lifetime."""
+        if issued is None:
+            return self.refresh_lead
+        return min(self.refresh_lead, MAX_REFRESH_LEAD_FRACTION * max(0.0, expiry - issued))
+
+    def should_refresh(self, expiry: float, issued: Optional[float] = None) -> bool:
+        return time.time() >= expiry - self.lead_for(expiry, issued)
+
+    def _usable(self, record: Optional[Dict[str, Any]]) -> bool:
+        return bool(record and record.get("access_token")) and not self.should_refresh(
+            record["expiry"], record.get("issued")
+        )
+
+    # -------------------------------------------------------------------------#
+    # Shared cache
+    # -------------------------------------------------------------------------#
+    @contextlib.contextmanager
+    def locked(self):
+        """Exclusive lock across processes (no-op without a disk cache)."""
+        if not self.path or fcntl is None:
+            yield
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_fh:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return a cached token that is still comfortably valid, else None."""
+        with self._memory_lock:
+            record = self._memory.get(self.memory_key)
+        if self._usable(record):
+            return record
+
+        if not self.path:
+            return None
+
+        try:
+            with open(self.path, "rb") as fh:
+                record = json.loads(self._fernet.decrypt(fh.read()))
+        except (OSError, ValueError, InvalidToken):
+            return None
+
+        if not self._usable(record):
+            return None
+
+        with self._memory_lock:
+            self._memory[self.memory_key] = record
+        return record
+
+    def store(self, record: Dict[str, Any]):
+        with self._memory_lock:
+            self._memory[self.memory_key] = record
+
+        if not self.path:
+            return
+
+        atomic_write(self.path, self._fernet.encrypt(json.dumps(record).encode("utf-8")), mode=0o600)
+
+    def discard(self):
+        with self._memory_lock:
+            self._memory.pop(self.memory_key, None)
+        if self.path:
+            with contextlib.suppress(OSError):
+                os.remove(self.path)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: bin/sandfly_writer.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Buffered replacement for EventWriter.write_event used by all collectors
+# - Render the <event> XML with plain string escaping (no ElementTree per
+#   event) and write it to splunkd in size- and time-bounded batches,
+#   one write and one flush per batch
+# - Send very large events as unbroken fragments closed by <done/>
+# - SandflyEventWriter: the EventWriter the input runs with, which accepts
+#   those batches next to ordinary write_event calls
+#
+# Design principles:
+# - Byte-for-byte the same XML that splunklib's Event.write_to produces
+#   (ASCII output, non-ASCII as character references)
+# - One writer per EventWriter, shared by every stanza and thread
+# - Durable state (checkpoints, snapshots, filters) is only committed after
+#   flush(), so nothing is marked done while its events are still buffered
+# - A fragmented event is always written as one contiguous block, so no
+#   other event can land between its fragments
+# =============================================================================
+
+import sys
+import threading
+import time
+from io import TextIOBase
+from typing import Callable, List, Optional
+
+import splunklib.modularinput as smi
+
+
+DEFAULT_BATCH_EVENTS = 500
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_BATCH_DELAY = 1.0
+# Events with more data than this are sent as unbroken fragments (0 = never)
+DEFAULT_FRAGMENT_BYTES = 1024 * 1024
+
+
+def escape_text(value: str) -> str:
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    return value
+
+
+def escape_attribute(value: str) -> str:
+    value = escape_text(value)
+    for char, entity in (('"', "&quot;"), ("\r", "&#13;"), ("\n", "&#10;"), ("\t", "&#09;")):
+        if char in value:
+            value = value.replace(char, entity)
+    return value
+
+
+def _element(tag: str, text: str) -> str:
+    # ElementTree writes an element with empty text as <tag />
+    return f"<{tag}>{escape_text(text)}</{tag}>" if text else f"<{tag} />"
+
+
+class SandflyEventWriter(smi.EventWriter):
+    """
+    splunklib's EventWriter plus write_batch() for pre-rendered events.
+
+    Both write paths share one lock, so a batch never interleaves with a
+    single event and the <stream> header is written exactly once.
+    """
+
+    def __init__(self, output=sys.stdout, error=sys.stderr):
+        super().__init__(output, error)
+        self._write_lock = threading.Lock()
+
+    def write_event(self, event):
+        with self._write_lock:
+            super().write_event(event)
+
+    def write_batch(self, text: str):
+        """Write rendered <event> elements as one block and flush."""
+        # ElementTree's default us-ascii serialisation, as Event.write_to
+        payload = text.encode("ascii", "xmlcharrefreplace")
+        with self._write_lock:
+            if not self.header_written:
+                payload = b"<stream>" + payload
+                self.header_written = True
+            out = self._out
+            out.write(payload.decode("ascii") if isinstance(out, TextIOBase) else payload)
+            out.flush()
+
+
+class BulkEventWriter:
+    """
+    Batches events for one SandflyEventWriter.
+
+    Events are queued by write() and reach splunkd when the batch is full
+    (events or bytes), when a write finds the batch older than max_delay,
+    or on flush(). Callers flush at the end of every collector and cycle,
+    and before committing any state that says the events were indexed.
+    """
+
+    def __init__(
+        self,
+        ew,
+        max_events: int = DEFAULT_BATCH_EVENTS,
+        max_bytes: int = DEFAULT_BATCH_BYTES,
+        max_delay: float = DEFAULT_BATCH_DELAY,
+        fragment_bytes: int = DEFAULT_FRAGMENT_BYTES,
+    ):
+        self.ew = ew
+        self.max_events = max(1, int(max_events))
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_delay = float(max_delay)
+        self.fragment_bytes = max(0, int(fragment_bytes))
+
+        self._lock = threading.Lock()
+        self._batch: List[str] = []
+        self._batch_bytes = 0
+        self._batch_events = 0
+        self._batch_started = 0.0
+        self._flush_listeners: List[Callable[[], None]] = []
+
+        self.events = 0
+        self.batches = 0
+        self.fragmented = 0
+
+    # -------------------------------------------------------------------------#
+    # Rendering
+    # -------------------------------------------------------------------------#
+    @staticmethod
+    def _render(
+        data: str,
+        stanza: Optional[str],
+        sourcetype: Optional[str],
+        index: Optional[str],
+        time_: Optional[str],
+        host: Optional[str],
+        source: Optional[str],
+        done: bool = True,
+    ) -> str:
+        # Same element order as splunklib.modularinput.Event.write_to
+        parts = ["<event"]
+        if stanza is not None:
+            parts.append(f' stanza="{escape_attribute(stanza)}"')
+        parts.append(' unbroken="1">')
+        if time_ is not None:
+            parts.append(_element("time", str(time_)))
+        for tag, value in (("source", source), ("sourcetype", sourcetype), ("index", index), ("host", host)):
+            if value is not None:
+                parts.append(_element(tag, value))
+        parts.append(_element("data", data))
+        if done:
+            parts.append("<done /></event>")
+        else:
+            parts.append("</event>")
+        return "".join(parts)
+
+    def _fragments(self, data: str, **metadata) -> str:
+        size = self.fragment_bytes
+        pieces = [data[offset:offset + size] for offset in range(0, len(data), size)]
+        return "".join(
+            self._render(piece, done=(n == len(pieces) - 1), **metadata) for n, piece in enumerate(pieces)
+        )
+
+    # -------------------------------------------------------------------------#
+    # Output
+    # -------------------------------------------------------------------------#
+    def write(
+        self,
+        data: str,
+        stanza: Optional[str] = None,
+        sourcetype: Optional[str] = None,
+        index: Optional[str] = None,
+        time: Optional[str] = None,
+        host: Optional[str] = None,
+        source: Optional[str] = None,
+    ):
+        metadata = dict(stanza=stanza, sourcetype=sourcetype, index=index, time_=time, host=host, source=source)
+        if self.fragment_bytes and len(data) > self.fragment_bytes:
+            xml = self._fragments(data, **metadata)
+            fragmented = True
+        else:
+            xml = self._render(data, **metadata)
+            fragmented = False
+
+        with self._lock:
+            if not self._batch:
+                self._batch_started = _now()
+            self._batch.append(xml)
+            self._batch_bytes += len(xml)
+            self._batch_events += 1
+            self.events += 1
+            self.fragmented += 1 if fragmented else 0
+
+            if (
+                self._batch_events >= self.max_events
+                or self._batch_bytes >= self.max_bytes
+                or _now() - self._batch_started >= self.max_delay
+            ):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def on_flush(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run listener() after every batch that reaches splunkd, on the
+        flushing thread; returns a function that removes it again.
+        """
+        with self._lock:
+            self._flush_listeners.append(listener)
+
+        def remove():
+            with self._lock:
+                self._flush_listeners.remove(listener)
+
+        return remove
+
+    def _flush_locked(self):
+        if not self._batch:
+            return
+        text = "".join(self._batch)
+        self._batch = []
+        self._batch_bytes = 0
+        self._batch_events = 0
+
+        self.ew.write_batch(text)
+        self.batches += 1
+        for listener in self._flush_listeners:
+            listener()
+
+
+def _now() -> float:
+    return time.monotonic()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/conftest.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Make the modules in bin/ importable the way splunkd runs them
+#   (flat imports, bin/ on sys.path)
+#
+# Usage:
+#   python -m pytest -q
+# =============================================================================
+
+import os
+import sys
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin")
+if BIN_DIR not in sys.path:
+    sys.path.insert(0, BIN_DIR)
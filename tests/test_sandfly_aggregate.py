@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_aggregate.py
+# Sandfly Security for Splunk App
+#
+# Derived results summary and timeline: counts per host, sandfly and status,
+# and which results_timeline_span bucket a result falls into.
+# =============================================================================
+
+import pytest
+
+import sandfly_aggregate
+from sandfly_aggregate import SUMMARY_SOURCETYPE, ResultAggregator
+
+
+# 2024-05-01T12:00:00Z
+NOON = 1714564800
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(sandfly_aggregate.time, "time", lambda: NOON + 7200.5)
+
+
+def result(host_id, sandfly_name, status, end_time, **extra):
+    data = {"host_id": host_id, "sandfly_name": sandfly_name, "status": status, "end_time": end_time}
+    return dict({"data": data}, **extra)
+
+
+def collect(records, **options):
+    aggregator = ResultAggregator(**options)
+    for record in records:
+        aggregator.add(record)
+    summary, timeline = [], []
+    for sourcetype, record in aggregator.events():
+        (summary if sourcetype == SUMMARY_SOURCETYPE else timeline).append(record)
+    assert all(record["derived"] for record in summary + timeline)
+    return aggregator, summary, timeline
+
+
+def counts(records, *keys):
+    return {tuple(record[key] for key in keys): record["count"] for record in records}
+
+
+def test_summary_counts_per_host_and_sandfly():
+    aggregator, summary, _ = collect([
+        result("h1", "proc_a", "alert", "2024-05-01T12:10:00Z", hostname="web-1"),
+        result("h1", "proc_a", "alert", "2024-05-01T12:11:00Z"),
+        result("h1", "file_b", "pass", "2024-05-01T12:12:00Z"),
+        result("h2", "proc_a", "error", "2024-05-01T12:13:00Z"),
+        {"data": {"end_time": "2024-05-01T12:14:00Z"}},
+        "not a record",
+    ])
+    hosts = [record for record in summary if record["summary_type"] == "host"]
+    sandflies = [record for record in summary if record["summary_type"] == "sandfly"]
+
+    assert aggregator.results == 5
+    assert counts(hosts, "host_id", "status") == {
+        ("h1", "alert"): 2, ("h1", "pass"): 1, ("h2", "error"): 1, ("unknown", "unknown"): 1,
+    }
+    assert counts(sandflies, "sandfly_name", "status") == {
+        ("proc_a", "alert"): 2, ("file_b", "pass"): 1, ("proc_a", "error"): 1, ("unknown", "unknown"): 1,
+    }
+    assert [record.get("hostname") for record in hosts if record["host_id"] == "h1"] == ["web-1", "web-1"]
+    assert sum(record["count"] for record in hosts) == sum(record["count"] for record in sandflies) == 5
+
+
+@pytest.mark.parametrize(
+    "end_time, bucket",
+    [
+        ("2024-05-01T12:00:00Z", "2024-05-01T12:00:00Z"),
+        ("2024-05-01T12:14:59.999Z", "2024-05-01T12:00:00Z"),
+        ("2024-05-01T12:15:00Z", "2024-05-01T12:15:00Z"),
+        ("2024-05-01T13:29:59+01:00", "2024-05-01T12:15:00Z"),
+        ("2024-05-01T11:59:59.5Z", "2024-05-01T11:45:00Z"),
+        (NOON + 1800, "2024-05-01T12:30:00Z"),
+    ],
+)
+def test_timeline_bucket_boundaries(end_time, bucket):
+    _, _, timeline = collect([result("h1", "proc_a", "alert", end_time)], span=900)
+    assert [(record["timestamp"], record["span"], record["count"]) for record in timeline] == [(bucket, 900, 1)]
+
+
+def test_timeline_counts_per_bucket_and_status():
+    _, _, timeline = collect(
+        [
+            result("h1", "proc_a", "alert", "2024-05-01T12:00:00Z"),
+            result("h2", "proc_a", "alert", "2024-05-01T12:59:59Z"),
+            result("h1", "proc_a", "pass", "2024-05-01T12:30:00Z"),
+            result("h1", "proc_a", "alert", "2024-05-01T13:00:00Z"),
+        ]
+    )
+    assert counts(timeline, "timestamp", "status") == {
+        ("2024-05-01T12:00:00Z", "alert"): 2,
+        ("2024-05-01T12:00:00Z", "pass"): 1,
+        ("2024-05-01T13:00:00Z", "alert"): 1,
+    }
+    assert [record["timestamp"] for record in timeline] == sorted(record["timestamp"] for record in timeline)
+
+
+def test_result_without_a_time_falls_in_the_collection_bucket():
+    _, _, timeline = collect([result("h1", "proc_a", "alert", None)], span=3600)
+    assert counts(timeline, "timestamp") == {("2024-05-01T14:00:00Z",): 1}
+
+
+def test_disabled_aggregate_is_not_emitted():
+    records = [result("h1", "proc_a", "alert", "2024-05-01T12:00:00Z")]
+    assert collect(records, summary=False)[1] == []
+    assert collect(records, timeline=False)[2] == []
+    # A span below one second would divide by zero
+    assert collect(records, span=0)[0].span == 1
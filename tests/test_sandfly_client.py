@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_client.py
+# Sandfly Security for Splunk App
+#
+# Choice between the one-pass orjson decode and the streaming parser, the
+# caller's deadline on rate-limited requests and conditional GETs.
+# =============================================================================
+
+import json
+import time
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+import sandfly_client
+from sandfly_client import SandflyAPI, Validators, decode_whole
+from sandfly_errors import DeadlineExceededError
+from sandfly_json import FAST_DECODE_MAX_BYTES
+
+
+class Response:
+    def __init__(self, **headers):
+        self.headers = {key.replace("_", "-"): value for key, value in headers.items()}
+
+
+@pytest.fixture(autouse=True)
+def with_orjson(monkeypatch):
+    monkeypatch.setattr(sandfly_client, "orjson", object())
+
+
+def test_small_plain_body_is_decoded_whole():
+    assert decode_whole(Response(Content_Length="1024"))
+    assert decode_whole(Response(Content_Length="1024", Content_Encoding="identity"))
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "deflate", "GZIP "])
+def test_compressed_body_is_size_checked_after_decoding(encoding):
+    # The wire size says nothing about the decoded size either way
+    assert decode_whole(Response(Content_Length="1024", Content_Encoding=encoding))
+    assert decode_whole(Response(Content_Length=str(FAST_DECODE_MAX_BYTES + 1), Content_Encoding=encoding))
+
+
+def test_large_plain_body_is_streamed():
+    assert not decode_whole(Response(Content_Length=str(FAST_DECODE_MAX_BYTES + 1)))
+
+
+def test_unknown_size_body_is_size_checked_after_decoding():
+    assert decode_whole(Response())
+
+
+def test_streamed_without_orjson(monkeypatch):
+    monkeypatch.setattr(sandfly_client, "orjson", None)
+    assert not decode_whole(Response(Content_Length="1024"))
+
+
+def test_request_that_cannot_be_admitted_by_the_deadline_is_not_sent():
+    api = SandflyAPI("https://deadline.sandfly.test", "user", "secret", log_fn=None, connect=False)
+    api.session.request = lambda *args, **kwargs: pytest.fail("request was sent")
+    api.guard.limiter.on_throttle(30)
+
+    with api.deadline(time.time() + 1):
+        with pytest.raises(DeadlineExceededError):
+            api._request_once("GET", f"{api.base_url}/v4/hosts", None, {}, False)
+    assert api.guard.limiter.waited == 0
+
+
+class Server:
+    """One JSON list endpoint that honours If-None-Match."""
+
+    def __init__(self, etag, records):
+        self.etag = etag
+        self.records = records
+        self.requests = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.requests.append(dict(headers))
+        if headers.get("If-None-Match") == self.etag:
+            return ServerResponse(304, {"ETag": self.etag}, b"")
+        return ServerResponse(200, {"ETag": self.etag}, json.dumps(self.records).encode("utf-8"))
+
+
+class ServerResponse:
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers, Content_Length=str(len(body)))
+        self.content = body
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def close(self):
+        pass
+
+
+def connected_api(server):
+    api = SandflyAPI("https://conditional.sandfly.test", "user", "secret", log_fn=None, connect=False)
+    api.access_token = "token"
+    api.token_issued = time.time()
+    api.token_expiry = api.token_issued + 3600
+    api.session.request = server.request
+    return api
+
+
+def test_unchanged_endpoint_is_answered_from_the_validators():
+    server = Server('"v1"', [{"id": 1}, {"id": 2}])
+    api = connected_api(server)
+
+    first = Validators()
+    assert list(api.iter_items("/v4/sandflies", validators=first)) == server.records
+    assert "If-None-Match" not in server.requests[-1]
+    assert not first.not_modified
+
+    # The next cycle restores the validators from the checkpoint
+    second = Validators.from_dict(first.to_dict())
+    assert list(api.iter_items("/v4/sandflies", validators=second)) == []
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    assert second.not_modified and second.etag == '"v1"'
+
+    server.etag, server.records = '"v2"', [{"id": 3}]
+    third = Validators.from_dict(second.to_dict())
+    assert list(api.iter_items("/v4/sandflies", validators=third)) == [{"id": 3}]
+    assert not third.not_modified and third.etag == '"v2"'
+
+
+def test_304_to_an_unconditional_request_is_an_error():
+    api = connected_api(Server('"v1"', []))
+    api.session.request = lambda *args, **kwargs: ServerResponse(304, {}, b"")
+    with pytest.raises(RuntimeError, match="HTTP 304"):
+        list(api.iter_items("/v4/sandflies"))
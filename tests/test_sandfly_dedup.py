@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_dedup.py
+# Sandfly Security for Splunk App
+#
+# RecentSet rotation, refresh on hit and persistence.
+# =============================================================================
+
+import os
+
+from sandfly_dedup import RecentSet
+
+
+def records(start, stop):
+    return [{"ts": n, "msg": f"event {n}"} for n in range(start, stop)]
+
+
+def pull(seen, batch):
+    return [record for record in batch if seen.add(record)]
+
+
+def test_repeats_within_one_pull_and_across_pulls_are_dropped(tmp_path):
+    seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=100)
+    batch = records(0, 10)
+    assert pull(seen, batch + batch[:3]) == batch
+    assert pull(seen, records(5, 15)) == records(10, 15)
+    assert seen.added == 15 and seen.repeats == 8
+
+
+def test_oldest_generation_is_forgotten_after_rotation(tmp_path):
+    seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    pull(seen, records(0, 10))
+    pull(seen, records(10, 20))
+    # The third generation pushes out records 0-9
+    pull(seen, records(20, 21))
+    assert pull(seen, records(0, 1)) == records(0, 1)
+    assert pull(seen, records(15, 20)) == []
+
+
+def test_history_repulled_every_cycle_is_never_re_emitted(tmp_path):
+    # Each pull returns the last 50 records (a window as large as the
+    # capacity), so every record is re-pulled for ten cycles and the
+    # history outgrows one generation long before it leaves the window.
+    emitted = []
+    for cycle in range(40):
+        seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=50)
+        emitted += pull(seen, records(max(0, cycle * 5 - 45), cycle * 5 + 5))
+        assert not seen.overflowed
+        seen.commit()
+    assert emitted == records(0, 200)
+
+
+def test_pull_larger_than_capacity_is_reported(tmp_path):
+    seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    pull(seen, records(0, 11))
+    assert seen.overflowed
+
+
+def test_state_survives_a_restart_only_once_committed(tmp_path):
+    seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    pull(seen, records(0, 8))
+    assert RecentSet(str(tmp_path), "stanza", "audit", capacity=10).add(records(0, 1)[0])
+
+    seen.commit()
+    restarted = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    assert pull(restarted, records(0, 10)) == records(8, 10)
+
+
+def test_capacity_change_starts_a_fresh_filter(tmp_path):
+    seen = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    pull(seen, records(0, 5))
+    seen.commit()
+    resized = RecentSet(str(tmp_path), "stanza", "audit", capacity=20)
+    assert pull(resized, records(0, 5)) == records(0, 5)
+
+
+def test_stanzas_and_collectors_keep_separate_files(tmp_path):
+    audit = RecentSet(str(tmp_path), "stanza", "audit", capacity=10)
+    errors = RecentSet(str(tmp_path), "stanza", "errors", capacity=10)
+    other = RecentSet(str(tmp_path), "other", "audit", capacity=10)
+    assert len({audit.path, errors.path, other.path}) == 3
+    audit.commit()
+    assert os.path.exists(audit.path) and not os.path.exists(errors.path)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_delta.py
+# Sandfly Security for Splunk App
+#
+# SnapshotDelta change detection, tombstones, full snapshots and commits.
+# =============================================================================
+
+import pytest
+
+import sandfly_delta
+from sandfly_delta import SnapshotDelta, apply_delta, content_digest
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sandfly_delta.time, "time", lambda: now[0])
+    return now
+
+
+def cycle(tmp_path, snapshot, interval=3600):
+    delta = SnapshotDelta(str(tmp_path), "stanza", "hosts", interval)
+    emitted = []
+    apply_delta(delta, snapshot, emit=emitted.append)
+    return delta, emitted
+
+
+def test_first_snapshot_is_full(tmp_path, clock):
+    snapshot = [{"host_id": "a", "v": 1}, {"host_id": "b", "v": 1}]
+    delta, emitted = cycle(tmp_path, snapshot)
+    assert delta.full
+    assert emitted == snapshot
+    assert (delta.new, delta.changed, delta.unchanged, delta.deleted) == (2, 0, 0, 0)
+
+
+def test_only_new_and_changed_objects_are_emitted(tmp_path, clock):
+    cycle(tmp_path, [{"host_id": "a", "v": 1}, {"host_id": "b", "v": 1}])
+    clock[0] += 60
+    delta, emitted = cycle(tmp_path, [{"v": 1, "host_id": "a"}, {"host_id": "b", "v": 2}, {"host_id": "c"}])
+    assert not delta.full
+    assert emitted == [{"host_id": "b", "v": 2}, {"host_id": "c"}]
+    assert (delta.new, delta.changed, delta.unchanged) == (1, 1, 1)
+
+
+def test_missing_objects_get_a_tombstone_with_their_id_field(tmp_path, clock):
+    cycle(tmp_path, [{"host_id": "a"}, {"id": 7, "x": 1}, {"name": "rule"}])
+    clock[0] += 60
+    delta, emitted = cycle(tmp_path, [{"host_id": "a"}])
+    assert sorted(emitted, key=str) == sorted(
+        [{"id": "7", "sandfly_deleted": True}, {"name": "rule", "sandfly_deleted": True}], key=str
+    )
+    assert delta.deleted == 2
+
+    # A tombstone is written once
+    clock[0] += 60
+    _, emitted = cycle(tmp_path, [{"host_id": "a"}])
+    assert emitted == []
+
+
+def test_singleton_endpoint_tombstone(tmp_path, clock):
+    cycle(tmp_path, [{"licensed": True}])
+    clock[0] += 60
+    assert cycle(tmp_path, [])[1] == [{"sandfly_deleted": True}]
+
+
+def test_full_snapshot_after_the_interval_re_emits_unchanged_objects(tmp_path, clock):
+    snapshot = [{"host_id": "a", "v": 1}]
+    cycle(tmp_path, snapshot, interval=3600)
+    clock[0] += 3599
+    assert cycle(tmp_path, snapshot, interval=3600)[1] == []
+    clock[0] += 1
+    delta, emitted = cycle(tmp_path, snapshot, interval=3600)
+    assert delta.full and emitted == snapshot
+    # The full snapshot restarts the interval
+    clock[0] += 60
+    assert cycle(tmp_path, snapshot, interval=3600)[1] == []
+
+
+def test_uncommitted_snapshot_is_not_remembered(tmp_path, clock):
+    delta = SnapshotDelta(str(tmp_path), "stanza", "hosts", 3600)
+    for record in [{"host_id": "a"}]:
+        delta.observe(record)
+    # No commit: the next cycle still sees a first, full snapshot
+    clock[0] += 60
+    delta, emitted = cycle(tmp_path, [{"host_id": "a"}])
+    assert delta.full and emitted == [{"host_id": "a"}]
+
+
+def test_digest_ignores_key_order():
+    assert content_digest({"a": 1, "b": [1, 2]}) == content_digest({"b": [1, 2], "a": 1})
+    assert content_digest({"a": 1}) != content_digest({"a": "1"})
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_hostdetails.py
+# Sandfly Security for Splunk App
+#
+# Per-host detail fan-out: task accounting, deadline and sizing warning.
+# =============================================================================
+
+import contextlib
+import threading
+
+from sandfly_errors import RateLimitedError
+from sandfly_hostdetails import HOST_DETAILS, HostDetailFanOut
+
+
+class DetailAPI:
+    def __init__(self, fail=(), throttle=()):
+        self.fail = set(fail)
+        self.throttle = set(throttle)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def deadline(self, stop_at):
+        return contextlib.nullcontext()
+
+    def iter_items(self, path):
+        with self._lock:
+            self.calls.append(path)
+        if path in self.fail:
+            raise RuntimeError("HTTP 500")
+        if path in self.throttle:
+            raise RateLimitedError(path, 1.0)
+        return [{"path": path}]
+
+
+def fan_out(api, logs, **options):
+    emitted = []
+    fan = HostDetailFanOut(
+        api,
+        HOST_DETAILS[:2],
+        emit=lambda sourcetype, item: emitted.append((sourcetype, item)),
+        log_fn=lambda level, msg: logs.append((level, msg)),
+        **options,
+    )
+    return fan, emitted
+
+
+def test_every_host_and_endpoint_is_fetched_once():
+    api, logs = DetailAPI(fail={"/v4/hosts/h2"}), []
+    fan, emitted = fan_out(api, logs, threads=4)
+    stats = fan.run(["h1", "h2", "h3"])
+
+    assert sorted(api.calls) == sorted(d.path_for(h) for h in ("h1", "h2", "h3") for d in HOST_DETAILS[:2])
+    assert stats == {"tasks": 6, "completed": 5, "failed": 1, "skipped": 0, "throttled": 0, "events": 5}
+    assert all(item["host_id"] in ("h1", "h2", "h3") for _, item in emitted)
+
+
+def test_rate_limited_task_is_not_retried_by_the_fan_out():
+    api, logs = DetailAPI(throttle={"/v4/hosts/h1"}), []
+    fan, _ = fan_out(api, logs, threads=2)
+    stats = fan.run(["h1", "h2"])
+
+    assert api.calls.count("/v4/hosts/h1") == 1
+    assert stats["throttled"] == 1 and stats["failed"] == 1 and stats["completed"] == 3
+
+
+def test_work_past_the_deadline_is_skipped():
+    api, logs = DetailAPI(), []
+    fan, _ = fan_out(api, logs, deadline=0)
+    stats = fan.run(["h1", "h2"])
+    assert api.calls == []
+    assert stats["skipped"] == 4
+
+
+def test_warns_when_the_fan_out_cannot_fit_the_rate():
+    logs = []
+    fan, _ = fan_out(DetailAPI(), logs, deadline=1, max_rate=3)
+    fan.run(["h1", "h2"])
+    assert any(level == "WARN" and "cannot finish" in msg for level, msg in logs)
+
+    logs = []
+    fan, _ = fan_out(DetailAPI(), logs, deadline=10, max_rate=3)
+    fan.run(["h1", "h2"])
+    assert not any("cannot finish" in msg for _, msg in logs)
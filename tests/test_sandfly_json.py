@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_json.py
+# Sandfly Security for Splunk App
+#
+# Streaming decoder (iter_json_records): the records must not depend on
+# where the response body is split into chunks. iter_body_records must
+# give the same records whether it decodes whole or falls back to it.
+# =============================================================================
+
+import json
+import random
+
+import pytest
+
+import sandfly_json
+from sandfly_json import iter_body_records, iter_json_records
+
+
+def chunked(body: bytes, size: int):
+    return [body[offset:offset + size] for offset in range(0, len(body), size)]
+
+
+def expected_records(document):
+    return list(sandfly_json.iter_document_records(document))
+
+
+DOCUMENTS = [
+    [{"n": 12345678901234567890, "v": 1.5}, 10, 2.5e10, 123],
+    [25000000000.0, -0.5, 1e-7, -12, 0, 3.25E+3],
+    {"data": [{"id": 1, "s": 'x]"}{,'}, {"id": 2, "nested": [[1, [2, [3]]], {"a": {}}]}], "total": 2},
+    {"total": 7, "data": [{"emoji": "\U0001F41D café ☃"}], "next": None},
+    {"data": [], "total": 0},
+    {"id": 5, "name": "single object, no data array", "values": [1, 2.0, True, False, None]},
+    [],
+    [True, False, None, "", "\\\"\n\t"],
+]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS, ids=range(len(DOCUMENTS)))
+def test_every_chunk_size_matches_json_loads(document):
+    body = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    expected = expected_records(json.loads(body))
+    for size in range(1, len(body) + 1):
+        assert list(iter_json_records(chunked(body, size))) == expected, f"chunk size {size}"
+
+
+def test_pretty_printed_body_with_whitespace_at_chunk_edges():
+    document = {"data": [{"a": 1, "b": [1, 2, 3]}, {"a": 2.75}], "total": 2}
+    body = json.dumps(document, indent=4).encode("utf-8")
+    for size in range(1, len(body) + 1):
+        assert list(iter_json_records(chunked(body, size))) == document["data"]
+
+
+def test_random_documents_with_random_chunk_splits():
+    rnd = random.Random(7)
+    alphabet = 'ab]["}{,:\\ 0123456789.eE-+é\U0001F41D'
+
+    def value(depth: int):
+        kind = rnd.randrange(7 if depth < 3 else 4)
+        if kind == 0:
+            return rnd.randint(-10 ** 25, 10 ** 25)
+        if kind == 1:
+            return rnd.uniform(-1e12, 1e12)
+        if kind == 2:
+            return "".join(rnd.choice(alphabet) for _ in range(rnd.randrange(12)))
+        if kind == 3:
+            return rnd.choice([True, False, None])
+        if kind in (4, 5):
+            return [value(depth + 1) for _ in range(rnd.randrange(4))]
+        return {f"k{i}": value(depth + 1) for i in range(rnd.randrange(4))}
+
+    for _ in range(200):
+        document = [value(0) for _ in range(rnd.randrange(1, 6))]
+        body = json.dumps(document, ensure_ascii=False).encode("utf-8")
+        splits = sorted(rnd.sample(range(1, len(body)), min(len(body) - 1, rnd.randrange(1, 20))))
+        chunks = [body[a:b] for a, b in zip([0] + splits, splits + [len(body)])]
+        assert list(iter_json_records(chunks)) == document
+
+
+def test_truncated_body_is_rejected():
+    body = json.dumps([{"a": 1}, {"b": 2}]).encode("utf-8")[:-3]
+    with pytest.raises(ValueError):
+        list(iter_json_records(chunked(body, 4)))
+
+
+@pytest.mark.parametrize("document", DOCUMENTS, ids=range(len(DOCUMENTS)))
+@pytest.mark.parametrize("max_whole", [0, 7, 1 << 20])
+def test_body_records_match_either_way(document, max_whole):
+    body = json.dumps(document).encode("utf-8")
+    assert list(iter_body_records(chunked(body, 5), max_whole)) == expected_records(document)
+
+
+def test_body_is_decoded_whole_only_below_the_decoded_limit(monkeypatch):
+    whole = []
+    monkeypatch.setattr(sandfly_json, "loads", lambda data: whole.append(len(data)) or json.loads(data))
+    body = json.dumps([{"id": n} for n in range(100)]).encode("utf-8")
+
+    assert len(list(iter_body_records(chunked(body, 64), max_whole=len(body)))) == 100
+    assert whole == [len(body)]
+
+    whole.clear()
+    assert len(list(iter_body_records(chunked(body, 64), max_whole=len(body) - 1))) == 100
+    assert whole == []
+
+
+def test_empty_body_has_no_records():
+    assert list(iter_body_records([])) == []
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_kvstore.py
+# Sandfly Security for Splunk App
+#
+# Current-state KV store rows: batch_save chunking, unchanged rows skipped,
+# deletes of vanished objects and a failed save that deletes nothing.
+# =============================================================================
+
+import json
+
+import pytest
+
+import sandfly_kvstore
+from sandfly_kvstore import STATE_COLLECTIONS, StateWriter
+
+
+class Data:
+    """The collection.data API used by StateWriter, over a dict of rows."""
+
+    def __init__(self, rows=()):
+        self.rows = {row["_key"]: row for row in rows}
+        self.saves = []
+        self.deletes = []
+        self.fail = False
+
+    def query(self, query, fields, limit, skip):
+        wanted = json.loads(query)["input"]
+        rows = [row for row in self.rows.values() if row["input"] == wanted]
+        return rows[skip:skip + limit]
+
+    def batch_save(self, *rows):
+        if self.fail:
+            raise RuntimeError("KV store unavailable")
+        self.saves.append(len(rows))
+        self.rows.update((row["_key"], row) for row in rows)
+
+    def delete(self, query):
+        keys = [clause["_key"] for clause in json.loads(query)["$or"]]
+        self.deletes.append(len(keys))
+        for key in keys:
+            del self.rows[key]
+
+
+class Service:
+    def __init__(self, data):
+        self.kvstore = {"sandfly_hosts_state": type("Collection", (), {"data": data})}
+
+
+def hosts(*ids, version=1):
+    return [{"host_id": host_id, "hostname": f"{host_id}.lab", "version": version} for host_id in ids]
+
+
+def cycle(writer, records):
+    snapshot = writer.begin()
+    for record in records:
+        snapshot.observe(record)
+    snapshot.commit()
+    return snapshot
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(sandfly_kvstore, "BATCH_SIZE", 3)
+    monkeypatch.setattr(sandfly_kvstore, "DELETE_BATCH_SIZE", 2)
+    monkeypatch.setattr(sandfly_kvstore, "QUERY_PAGE_SIZE", 2)
+
+
+def writer_for(data):
+    return StateWriter(Service(data), "sandfly_security://lab", STATE_COLLECTIONS["hosts"])
+
+
+def test_rows_are_saved_in_batch_size_chunks(small_batches):
+    data = Data()
+    snapshot = cycle(writer_for(data), hosts("h1", "h2", "h3", "h4", "h5", "h6", "h7"))
+
+    assert data.saves == [3, 3, 1]
+    assert snapshot.saved == 7 and snapshot.error is None
+    row = data.rows["lab:h1"]
+    assert row["input"] == "lab" and row["hostname"] == "h1.lab"
+    assert json.loads(row["record"])["host_id"] == "h1"
+
+
+def test_only_changed_rows_are_saved_and_vanished_rows_deleted(small_batches):
+    data = Data()
+    writer = writer_for(data)
+    cycle(writer, hosts("h1", "h2", "h3", "h4", "h5"))
+    data.saves.clear()
+
+    snapshot = cycle(writer, hosts("h1") + hosts("h2", version=2))
+    assert data.saves == [1]
+    assert data.deletes == [2, 1]
+    assert sorted(data.rows) == ["lab:h1", "lab:h2"]
+    assert (snapshot.saved, snapshot.unchanged, snapshot.deleted) == (1, 1, 3)
+    assert writer.primed
+
+
+def test_digests_are_seeded_from_the_collection(small_batches):
+    data = Data()
+    cycle(writer_for(data), hosts("h1", "h2", "h3", "h4", "h5"))
+    data.rows["other:h1"] = dict(data.rows["lab:h1"], _key="other:h1", input="other")
+    data.saves.clear()
+
+    # A new process: nothing is rewritten, and another input's row is left alone
+    snapshot = cycle(writer_for(data), hosts("h1", "h2", "h3", "h4", "h5"))
+    assert data.saves == [] and data.deletes == []
+    assert snapshot.unchanged == 5
+    assert "other:h1" in data.rows
+
+
+def test_failed_save_deletes_nothing(small_batches):
+    data = Data()
+    writer = writer_for(data)
+    cycle(writer, hosts("h1", "h2"))
+    data.fail = True
+
+    snapshot = cycle(writer, hosts("h3"))
+    assert isinstance(snapshot.error, RuntimeError)
+    assert data.deletes == []
+    assert sorted(data.rows) == ["lab:h1", "lab:h2"]
+    assert "update failed" in snapshot.summary()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_reports.py
+# Sandfly Security for Splunk App
+#
+# Child events of the /v4/reports/* documents.
+# =============================================================================
+
+from sandfly_reports import report_children, uptime_buckets, with_report_id
+
+HOST_SNAPSHOT = "sandfly:report:host_snapshot"
+SCAN_PERFORMANCE = "sandfly:report:scan_performance"
+
+
+def host_snapshot(hosts):
+    return with_report_id({
+        "report_time": "2026-10-01T00:00:00Z",
+        "host_counts": {"active": hosts, "inactive": 0, "missing": 2},
+        "uptime_stats": {"min": 0, "median": 12, "max": 400},
+        "distros": [{"name": "Ubuntu", "count": hosts}],
+        "kernels": [{"name": "6.8", "count": hosts}],
+        "architectures": [{"name": "x86_64", "count": hosts}],
+        "credential": [{"name": "ssh-key", "count": hosts}],
+        "uptimes": [{"node_name": f"h{n}", "uptime_days": n % 500} for n in range(hosts)],
+        "missing_hosts": [{"node_name": "gone-1"}, {"node_name": "gone-2"}],
+        "tags": [{"name": "prod", "count": hosts}],
+    })
+
+
+def scan_performance(hosts):
+    return with_report_id({
+        "id": "r1",
+        "report_time": "2026-10-01T00:00:00Z",
+        "scan_counts": {"scans": hosts * 3, "errors": 1},
+        "scan_time_stats": {"min": 2, "median": 40, "max": 1200},
+        "sandfly_types": [{"name": "process", "count": hosts}, {"name": "file", "count": hosts}],
+        "hosts": [{"node_name": f"h{n}", "scan_seconds": n % 1000} for n in range(hosts)],
+    })
+
+
+def sections(children, sourcetype=HOST_SNAPSHOT):
+    found = {}
+    for child_sourcetype, child in children:
+        assert child_sourcetype == sourcetype + ":item"
+        found.setdefault(child["section"], []).append(child)
+    return found
+
+
+def test_child_count_does_not_grow_with_the_fleet():
+    small = list(report_children(HOST_SNAPSHOT, host_snapshot(10)))
+    large = list(report_children(HOST_SNAPSHOT, host_snapshot(5000)))
+    assert len(small) == len(large) == 12
+
+
+def test_only_named_sections_and_uptime_buckets():
+    found = sections(report_children(HOST_SNAPSHOT, host_snapshot(10)))
+    assert set(found) == {
+        "host_counts", "uptime_stats", "distros", "kernels", "architectures", "credential", "uptime_buckets",
+    }
+    counts = found["host_counts"][0]
+    assert counts["active"] == 10 and counts["report"] == "host_snapshot"
+    assert counts["report_time"] == "2026-10-01T00:00:00Z"
+    assert list(counts)[:3] == ["report_id", "report", "report_time"]
+
+
+def test_uptime_buckets_cover_every_host():
+    record = host_snapshot(500)
+    buckets = sections(report_children(HOST_SNAPSHOT, record))["uptime_buckets"]
+    assert [b["bucket"] for b in buckets] == ["<1d", "1-7d", "7-30d", "30-90d", "90-365d", ">365d"]
+    assert [b["count"] for b in buckets] == [1, 6, 23, 60, 275, 135]
+    assert [b["position"] for b in buckets] == list(range(6))
+
+
+def test_uptime_buckets_skip_entries_without_a_number():
+    uptimes = [{"uptime_days": "0.5"}, {"uptime_days": 7}, {"uptime_days": None}, {}, "x", {"uptime_days": "n/a"}]
+    assert uptime_buckets(uptimes) == [1, 0, 1, 0, 0, 0]
+
+
+def test_scan_performance_children_are_bounded():
+    small = list(report_children(SCAN_PERFORMANCE, scan_performance(10)))
+    large = list(report_children(SCAN_PERFORMANCE, scan_performance(5000)))
+    assert len(small) == len(large) == 10
+
+    found = sections(large, SCAN_PERFORMANCE)
+    assert set(found) == {"scan_counts", "scan_time_stats", "sandfly_types", "scan_time_buckets"}
+    assert found["scan_counts"][0]["scans"] == 15000 and found["scan_counts"][0]["report_id"] == "r1"
+    assert [t["name"] for t in found["sandfly_types"]] == ["process", "file"]
+
+
+def test_scan_time_buckets_cover_every_host():
+    buckets = sections(report_children(SCAN_PERFORMANCE, scan_performance(1000)), SCAN_PERFORMANCE)
+    buckets = buckets["scan_time_buckets"]
+    assert [b["bucket"] for b in buckets] == ["<10s", "10-30s", "30-60s", "1-5m", "5-15m", ">15m"]
+    assert [b["count"] for b in buckets] == [10, 20, 30, 240, 600, 100]
+    assert sum(b["count"] for b in buckets) == 1000
+
+
+def test_report_id_prefers_the_report_own_id():
+    assert with_report_id({"id": 7})["report_id"] == "7"
+    first = with_report_id({"distros": []})["report_id"]
+    assert first == with_report_id({"distros": []})["report_id"]
+    assert first != with_report_id({"distros": [1]})["report_id"]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_results.py
+# Sandfly Security for Splunk App
+#
+# Incremental results collection: cursor, backfill window, and resuming
+# after a crash in the middle of a page.
+# =============================================================================
+
+import io
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sandfly_checkpoint import CheckpointStore
+from sandfly_results import CHECKPOINT_KEY, MAX_PAGE_SIZE, collect_results_incremental, results_query
+from sandfly_writer import BulkEventWriter, SandflyEventWriter
+
+
+class ResultsServer:
+    """POST /v4/results over a fixed list of ids, honouring the id filter."""
+
+    def __init__(self, ids, ignore_filter=False):
+        self.ids = list(ids)
+        self.ignore_filter = ignore_filter
+        self.queries = []
+
+    def records(self, query):
+        items = query["filter"]["items"]
+        after = next((int(i["value"]) for i in items if i["columnField"] == "id"), None)
+        ids = self.ids if after is None or self.ignore_filter else [i for i in self.ids if i > after]
+        return [{"id": i, "data": {"end_time": f"2026-10-01T00:00:{i % 60:02d}Z"}} for i in ids[:query["size"]]]
+
+    def iter_pages(self, next_query, page_size):
+        while True:
+            query = next_query()
+            self.queries.append(query)
+            page = self.records(query)
+            yield iter(page)
+            if len(page) < page_size:
+                return
+
+
+class Crash(Exception):
+    pass
+
+
+def run(tmp_path, server, page_size=10, crash_after=None, max_events=4):
+    """One collection cycle; returns (ids splunkd received, checkpoint)."""
+    out = io.StringIO()
+    writer = BulkEventWriter(SandflyEventWriter(output=out, error=io.StringIO()), max_events=max_events, max_delay=3600)
+    checkpoint = CheckpointStore(str(tmp_path), "stanza")
+    handed = []
+
+    def emit(record):
+        if crash_after is not None and len(handed) == crash_after:
+            raise Crash()
+        handed.append(record["id"])
+        writer.write(json.dumps(record))
+
+    try:
+        collect_results_incremental(
+            iter_pages=server.iter_pages,
+            checkpoint=checkpoint,
+            emit=emit,
+            log_fn=lambda level, msg: None,
+            page_size=page_size,
+            flush=writer.flush,
+            on_flush=writer.on_flush,
+        )
+    except Crash:
+        # The process dies: whatever is still buffered never reaches splunkd
+        pass
+    received = [json.loads(data)["id"] for data in re.findall(r"<data>(.*?)</data>", out.getvalue().replace("&quot;", '"'))]
+    return received, CheckpointStore(str(tmp_path), "stanza").get(CHECKPOINT_KEY)
+
+
+def test_first_run_backfills_and_stores_the_cursor(tmp_path):
+    server = ResultsServer(range(1, 26))
+    received, state = run(tmp_path, server)
+    assert received == list(range(1, 26))
+    assert state["last_id"] == 25 and state["last_timestamp"] == "2026-10-01T00:00:25Z"
+
+    first = server.queries[0]["filter"]["items"]
+    assert first[0]["columnField"] == "data.end_time"
+    assert [q["filter"]["items"][0]["value"] for q in server.queries[1:]] == ["10", "20"]
+
+
+def test_resume_pulls_only_newer_results(tmp_path):
+    run(tmp_path, ResultsServer(range(1, 11)))
+    server = ResultsServer(range(1, 16))
+    received, state = run(tmp_path, server)
+    assert received == list(range(11, 16))
+    assert server.queries[0]["filter"]["items"] == [{"columnField": "id", "operatorValue": ">", "value": "10"}]
+    assert state["last_id"] == 15
+
+
+@pytest.mark.parametrize("crash_after", [1, 4, 5, 13, 19])
+def test_crash_mid_page_resumes_without_gaps_and_at_most_one_batch_again(tmp_path, crash_after):
+    ids = list(range(1, 31))
+    received, state = run(tmp_path, ResultsServer(ids), page_size=10, crash_after=crash_after, max_events=4)
+
+    # The cursor is the last result of the last batch splunkd received
+    # (or lags it by the one result whose write sent the batch)
+    assert state is None or state["last_id"] in (received[-1], received[-1] - 1)
+    assert len(received) > crash_after - 4
+
+    resumed, state = run(tmp_path, ResultsServer(ids), page_size=10)
+    assert state["last_id"] == 30
+    everything = received + resumed
+    assert sorted(set(everything)) == ids
+    assert len(everything) - len(ids) <= 4
+
+
+def test_full_page_without_progress_stops_the_cycle(tmp_path):
+    run(tmp_path, ResultsServer(range(1, 6)), page_size=5)
+    server = ResultsServer(range(1, 6), ignore_filter=True)
+    received, state = run(tmp_path, server, page_size=5)
+    assert received == [] and len(server.queries) == 1
+    assert state["last_id"] == 5
+
+
+def test_page_size_is_capped(tmp_path):
+    server = ResultsServer([])
+    run(tmp_path, server, page_size=10 ** 6)
+    assert server.queries[0]["size"] == MAX_PAGE_SIZE
+
+
+def test_backfill_query_filters_on_end_time():
+    query = results_query(None, "2026-10-01T00:00:00Z", 100)
+    assert query["filter"]["items"] == [
+        {"columnField": "data.end_time", "operatorValue": "onOrAfter", "value": "2026-10-01T00:00:00Z"}
+    ]
+    assert query["sort"] == [{"field": "id", "sort": "asc"}]
+
+
+def test_backfill_starts_the_configured_hours_back(tmp_path):
+    server = ResultsServer([])
+    run(tmp_path, server)
+    since = datetime.strptime(server.queries[0]["filter"]["items"][0]["value"], "%Y-%m-%dT%H:%M:%SZ")
+    expected = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=24)
+    assert abs((since - expected).total_seconds()) < 5
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_scheduler.py
+# Sandfly Security for Splunk App
+#
+# Per-stanza interval and run deadline, cycle pacing and stop().
+# =============================================================================
+
+import threading
+import time
+
+import pytest
+
+import sandfly_scheduler
+from sandfly_scheduler import MIN_INTERVAL, StanzaScheduler
+
+
+class EventWriter:
+    def __init__(self):
+        self.logs = []
+
+    def log(self, level, msg):
+        self.logs.append((level, msg))
+
+
+def scheduler(tmp_path, **params):
+    return StanzaScheduler({"sandfly_security://lab": params}, str(tmp_path), EventWriter())
+
+
+def run_cycles(sched, cycles, duration=0.0, fail=False):
+    """Run run_forever() with a stub cycle until `cycles` have started."""
+    runner = sched.runners[0]
+    starts = []
+    active = [0]
+    overlapped = []
+
+    def run_cycle():
+        active[0] += 1
+        overlapped.append(active[0] > 1)
+        starts.append(time.monotonic())
+        if len(starts) >= cycles:
+            sched.stop()
+        time.sleep(duration)
+        active[0] -= 1
+        if fail:
+            raise RuntimeError("login failed")
+        return True
+
+    runner.run_cycle = run_cycle
+    thread = threading.Thread(target=sched.run_forever, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert not any(overlapped)
+    return starts
+
+
+def test_interval_is_clamped_and_run_deadline_defaults_to_it(tmp_path):
+    runner = scheduler(tmp_path, interval="1", host_detail_threads="4").runners[0]
+    assert runner.interval == MIN_INTERVAL
+    assert runner.run_deadline == MIN_INTERVAL
+    assert runner.detail_threads == 4
+
+    runner = scheduler(tmp_path, interval="600", run_deadline="0").runners[0]
+    assert runner.interval == 600
+    assert runner.run_deadline == 0
+
+
+@pytest.fixture
+def short_intervals(monkeypatch):
+    monkeypatch.setattr(sandfly_scheduler, "MIN_INTERVAL", 0.0)
+
+
+def test_cycles_start_one_interval_apart(tmp_path, short_intervals):
+    starts = run_cycles(scheduler(tmp_path, interval="0.2"), cycles=3)
+    assert len(starts) == 3
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert all(0.18 <= gap < 1.0 for gap in gaps)
+
+
+def test_overrun_starts_the_next_cycle_immediately(tmp_path, short_intervals):
+    starts = run_cycles(scheduler(tmp_path, interval="0.3"), cycles=3, duration=0.5)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # The cycle's own 0.5s, not 0.5s plus another interval
+    assert all(0.49 <= gap < 0.7 for gap in gaps)
+
+
+def test_stop_ends_a_long_wait(tmp_path):
+    sched = scheduler(tmp_path, interval="3600")
+    cycles = []
+    sched.runners[0].run_cycle = lambda: cycles.append(time.monotonic())
+    thread = threading.Thread(target=sched.run_forever, daemon=True)
+    thread.start()
+
+    time.sleep(0.2)
+    stopped = time.monotonic()
+    sched.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert time.monotonic() - stopped < 2
+    assert len(cycles) == 1
+
+
+def test_failed_cycle_is_logged_and_retried(tmp_path, short_intervals):
+    sched = scheduler(tmp_path, interval="0.05")
+    assert len(run_cycles(sched, cycles=2, fail=True)) == 2
+    errors = [msg for level, msg in sched.ew.logs if level == "ERROR"]
+    assert errors and "cycle failed: login failed" in errors[0]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_spool.py
+# Sandfly Security for Splunk App
+#
+# EventSpool ordering per key, backoff and expiry, and the --drain stats
+# event of the PagerDuty alert action.
+# =============================================================================
+
+import json
+
+import pytest
+
+import sandfly_pagerduty_alert as alert
+import sandfly_spool
+from sandfly_spool import EventSpool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sandfly_spool.time, "time", lambda: now[0])
+    monkeypatch.setattr(sandfly_spool.random, "uniform", lambda a, b: 0.0)
+    return now
+
+
+@pytest.fixture
+def spool(tmp_path, clock):
+    spool = EventSpool("test", spool_dir=str(tmp_path), max_age=3600)
+    yield spool
+    spool.close()
+
+
+def bodies(groups):
+    return [[event["body"] for event in group] for group in groups]
+
+
+def test_nothing_is_due_while_backing_off(spool, clock):
+    spool.enqueue("a", "a1")
+    assert spool.due() == []
+    clock[0] += sandfly_spool.BACKOFF_BASE
+    assert bodies(spool.due()) == [["a1"]]
+
+
+def test_events_of_a_key_stay_in_order(spool, clock):
+    spool.enqueue("a", "a1")
+    clock[0] += 10
+    spool.enqueue("a", "a2")
+    spool.enqueue(None, "x")
+    spool.enqueue("b", "b1")
+    clock[0] += sandfly_spool.BACKOFF_BASE
+    assert bodies(spool.due()) == [["a1", "a2"], ["x"], ["b1"]]
+
+
+def test_backing_off_head_blocks_later_events_of_its_key(spool, clock):
+    spool.enqueue("a", "a1")
+    spool.enqueue("a", "a2")
+    clock[0] += sandfly_spool.BACKOFF_BASE
+    head = spool.due()[0][0]
+    spool.failed(head["id"], head["attempts"] + 1, "503")
+    assert spool.due() == []
+
+    clock[0] += sandfly_spool.backoff_delay(2)
+    assert bodies(spool.due()) == [["a1", "a2"]]
+
+
+def test_backoff_doubles_up_to_the_cap(clock):
+    delays = [sandfly_spool.backoff_delay(n) for n in range(1, 12)]
+    assert delays[:3] == [30, 60, 120]
+    assert max(delays) == sandfly_spool.BACKOFF_MAX
+
+
+def test_events_older_than_max_age_are_expired(spool, clock):
+    spool.enqueue("a", "old")
+    clock[0] += 1800
+    spool.enqueue("a", "new")
+    clock[0] += 1801
+    assert spool.expire() == 1
+    assert spool.stats() == {"depth": 1, "oldest_age": 1801.0}
+    assert spool.has_pending("a")
+
+
+def test_drain_delivers_in_order_and_stops_a_key_at_its_first_failure(spool, clock, monkeypatch):
+    for body in ("a1", "a2", "b1"):
+        spool.enqueue(body[0], json.dumps({"dedup_key": body[0], "body": body}))
+    clock[0] += sandfly_spool.BACKOFF_BASE
+
+    posted = []
+
+    def post_event(session, payload, max_retries):
+        posted.append(payload["body"])
+        if payload["body"] == "a1":
+            return False, "PagerDuty returned 503", True
+        return True, "ok", False
+
+    monkeypatch.setattr(alert, "post_event", post_event)
+    counts = alert.drain_spool(spool, None)
+
+    assert sorted(posted) == ["a1", "b1"]
+    assert counts == {"drained": True, "delivered": 1, "retried": 1, "discarded": 0, "expired": 0}
+
+    event = json.loads(alert.spool_stats_event(spool, counts))
+    assert event["spool"] == "pagerduty"
+    assert event["depth"] == 2
+    assert event["delivered"] == 1 and event["retried"] == 1
+
+
+def test_stats_event_without_a_spool():
+    event = json.loads(alert.spool_stats_event(None, alert.drain_spool(None, None)))
+    assert event["available"] is False
+    assert event["drained"] is False
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_throttle.py
+# Sandfly Security for Splunk App
+#
+# CircuitBreaker state machine, including throttled and unresolved probes.
+# =============================================================================
+
+import pytest
+
+import sandfly_throttle
+from sandfly_errors import CircuitOpenError
+from sandfly_throttle import CircuitBreaker
+
+TARGET = "https://sandfly.test"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sandfly_throttle.time, "monotonic", lambda: now[0])
+    return now
+
+
+def tripped(clock, threshold=2, cooldown=60):
+    breaker = CircuitBreaker(threshold, cooldown)
+    for _ in range(threshold):
+        breaker.before_request(TARGET)
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(3, 60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.record_failure() == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(TARGET)
+    assert breaker.rejected == 1
+
+
+def test_throttles_while_closed_do_not_trip(clock):
+    breaker = CircuitBreaker(1, 60)
+    for _ in range(5):
+        assert breaker.record_throttle() is None
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_only_one_probe_after_the_cooldown(clock):
+    breaker = tripped(clock)
+    clock[0] += 60
+    assert breaker.before_request(TARGET) == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(TARGET)
+
+
+def test_throttled_probe_reopens_then_a_later_probe_closes(clock):
+    breaker = tripped(clock)
+    clock[0] += 60
+    assert breaker.before_request(TARGET) == CircuitBreaker.HALF_OPEN
+
+    assert breaker.record_throttle() == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    clock[0] += 59
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(TARGET)
+
+    clock[0] += 1
+    assert breaker.before_request(TARGET) == CircuitBreaker.HALF_OPEN
+    assert breaker.record_success() == CircuitBreaker.CLOSED
+    assert breaker.before_request(TARGET) is None
+
+
+def test_failed_probe_reopens(clock):
+    breaker = tripped(clock)
+    clock[0] += 60
+    breaker.before_request(TARGET)
+    assert breaker.record_failure() == CircuitBreaker.OPEN
+
+
+def test_unresolved_probe_expires(clock):
+    breaker = tripped(clock)
+    clock[0] += 60
+    assert breaker.before_request(TARGET) == CircuitBreaker.HALF_OPEN
+
+    # The probe never reports back
+    clock[0] += 30
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.before_request(TARGET)
+    assert rejected.value.retry_in == pytest.approx(30)
+
+    clock[0] += 30
+    assert breaker.before_request(TARGET) is None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(TARGET)
+    assert breaker.record_success() == CircuitBreaker.CLOSED
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_time.py
+# Sandfly Security for Splunk App
+#
+# parse_time against datetime.fromisoformat: offsets, fractions, date-only
+# values and input both must reject.
+# =============================================================================
+
+from datetime import datetime, timezone
+
+import pytest
+
+from sandfly_time import event_time, parse_time
+
+
+def iso_epoch(value: str) -> float:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+VALID = [
+    "2024-05-01T12:30:45Z",
+    "2024-05-01T12:30:45",
+    "2024-05-01 12:30:45",
+    "2024-05-01T12:30Z",
+    "2024-05-01T12:30:45+05:30",
+    "2024-05-01T12:30:45-07:00",
+    "2024-05-01T12:30:45+0530",
+    "2024-05-01T12:30:45-0000",
+    "2024-12-31T23:59:59+14:00",
+    "2024-02-29T00:00:00Z",
+    "1970-01-01T00:00:00Z",
+    "2024-05-01",
+] + [f"2024-05-01T12:30:45.{'123456789'[:digits]}{zone}" for digits in range(1, 10) for zone in ("Z", "-03:00", "")]
+
+
+@pytest.mark.parametrize("value", VALID)
+def test_matches_fromisoformat(value):
+    # fromisoformat keeps microseconds only; parse_time keeps every digit
+    assert parse_time(value) == pytest.approx(iso_epoch(value), abs=1e-6)
+
+
+INVALID = [
+    "2024-02-30T00:00:00Z",
+    "2023-02-29T00:00:00Z",
+    "2024-04-31T00:00:00Z",
+    "2024-13-01T00:00:00Z",
+    "2024-00-10T00:00:00Z",
+    "2024-05-00T00:00:00Z",
+    "2024-05-01T24:00:00Z",
+    "2024-05-01T12:60:00Z",
+    "2024-05-01T12:30:60Z",
+    "2024-05-01T12:30:45+24:00",
+    "2024-5-1T12:30:45Z",
+    "2024-05-01T12:30:45 UTC",
+    "2024-05-01Z",
+    "yesterday",
+]
+
+
+@pytest.mark.parametrize("value", INVALID)
+def test_rejects_what_fromisoformat_rejects(value):
+    with pytest.raises(ValueError):
+        datetime.fromisoformat(value)
+    assert parse_time(value) is None
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (1714566645, 1714566645.0),
+        (1714566645.25, 1714566645.25),
+        (1714566645250, 1714566645.25),
+        (True, None),
+        (None, None),
+        ("", None),
+        ({"time": 1}, None),
+    ],
+)
+def test_epoch_numbers_and_other_types(value, expected):
+    assert parse_time(value) == expected
+
+
+def test_event_time_falls_back_to_collection_time():
+    record = {"data": {"end_time": "not a time"}, "start_time": "2024-05-01T12:30:45.5+01:00"}
+    assert event_time("sandfly:results", record, now=1.0) == "%.3f" % iso_epoch("2024-05-01T12:30:45.5+01:00")
+    assert event_time("sandfly:results", {"end_time": "bad"}, now=1.0) == "1.000"
+    assert event_time("sandfly:hosts", {"timestamp": "2024-05-01T12:30:45Z"}, now=2.0) == "2.000"
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_token.py
+# Sandfly Security for Splunk App
+#
+# TokenManager refresh timing and the shared in-memory token cache.
+# =============================================================================
+
+import base64
+import json
+
+import pytest
+
+import sandfly_token
+from sandfly_token import TokenManager, jwt_expiry
+
+
+def make_jwt(claims):
+    def b64(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+    return f"{b64({'alg': 'none'})}.{b64(claims)}.sig"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sandfly_token.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def isolated_memory(monkeypatch):
+    monkeypatch.setattr(TokenManager, "_memory", {})
+
+
+def manager(name="user", password="secret"):
+    return TokenManager("https://sandfly.test", name, password, refresh_margin=60, refresh_jitter=30)
+
+
+def test_jwt_expiry_reads_exp_claim():
+    assert jwt_expiry(make_jwt({"exp": 1234})) == 1234.0
+    assert jwt_expiry("not-a-jwt") is None
+    assert jwt_expiry(make_jwt({"sub": "x"})) is None
+
+
+def test_long_lived_token_refreshes_inside_the_margin(clock):
+    tokens = manager()
+    record = tokens.record(make_jwt({"exp": clock[0] + 3600}), None)
+    assert not tokens.should_refresh(record["expiry"], record["issued"])
+    clock[0] = record["expiry"] - 91
+    assert not tokens.should_refresh(record["expiry"], record["issued"])
+    clock[0] = record["expiry"] - 59
+    assert tokens.should_refresh(record["expiry"], record["issued"])
+
+
+@pytest.mark.parametrize("lifetime", [30, 60, 90])
+def test_short_lived_token_is_not_refreshed_right_after_login(clock, lifetime):
+    tokens = manager()
+    record = tokens.record(make_jwt({"exp": clock[0] + lifetime}), None)
+    assert not tokens.should_refresh(record["expiry"], record["issued"])
+    clock[0] += lifetime * 0.49
+    assert not tokens.should_refresh(record["expiry"], record["issued"])
+    clock[0] = record["issued"] + lifetime * 0.5
+    assert tokens.should_refresh(record["expiry"], record["issued"])
+
+
+def test_stored_token_is_shared_and_expires_from_the_cache(clock):
+    first, second = manager(), manager()
+    record = first.record(make_jwt({"exp": clock[0] + 600}), "refresh")
+    first.store(record)
+    assert second.load() == record
+
+    clock[0] = record["expiry"] - 1
+    assert second.load() is None
+
+
+def test_discard_drops_the_shared_token(clock):
+    tokens = manager()
+    tokens.store(tokens.record(make_jwt({"exp": clock[0] + 600}), None))
+    tokens.discard()
+    assert tokens.load() is None
+
+
+def test_changed_password_does_not_reuse_the_cached_token(clock):
+    old = manager(password="secret")
+    old.store(old.record(make_jwt({"exp": clock[0] + 600}), None))
+    assert manager(password="rotated").load() is None
+    assert manager(password="secret").load() is not None
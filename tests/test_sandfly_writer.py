@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tests/test_sandfly_writer.py
+# Sandfly Security for Splunk App
+#
+# BulkEventWriter output against splunklib's own, fragments, and the
+# flush-before-commit order of the collectors' durable state.
+# =============================================================================
+
+import io
+import os
+import re
+
+import pytest
+import splunklib.modularinput as smi
+
+from sandfly_checkpoint import CheckpointStore
+from sandfly_delta import SnapshotDelta, apply_delta
+from sandfly_results import CHECKPOINT_KEY, collect_results_incremental
+from sandfly_writer import BulkEventWriter, SandflyEventWriter
+
+EVENTS = [
+    dict(data='{"a": 1}', stanza="sandfly://lab", sourcetype="sandfly:hosts", index="main", time="1700000000.123"),
+    dict(data='<tag attr="x"> & "q"', stanza='odd "name"\n\t\r', sourcetype="sandfly:results"),
+    dict(data="héllo ☃ \U0001f600", host="sf-01", source="sandfly"),
+    dict(data=""),
+]
+
+
+def splunklib_xml(events, stream):
+    ew = smi.EventWriter(output=stream, error=io.StringIO())
+    for event in events:
+        ew.write_event(smi.Event(
+            data=event["data"],
+            stanza=event.get("stanza"),
+            sourcetype=event.get("sourcetype"),
+            index=event.get("index"),
+            time=event.get("time"),
+            host=event.get("host"),
+            source=event.get("source"),
+            unbroken=True,
+        ))
+    ew.close()
+    return stream.getvalue()
+
+
+def bulk_xml(events, stream, **options):
+    ew = SandflyEventWriter(output=stream, error=io.StringIO())
+    writer = BulkEventWriter(ew, **options)
+    for event in events:
+        writer.write(**event)
+    writer.flush()
+    ew.close()
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize("max_events", [1, 2, 100])
+def test_output_matches_splunklib(max_events):
+    assert bulk_xml(EVENTS, io.StringIO(), max_events=max_events) == splunklib_xml(EVENTS, io.StringIO())
+
+
+def test_binary_stream_gets_ascii_bytes():
+    out = io.BytesIO()
+    writer = BulkEventWriter(SandflyEventWriter(output=out, error=io.StringIO()))
+    for event in EVENTS:
+        writer.write(**event)
+    writer.flush()
+    expected = splunklib_xml(EVENTS, io.StringIO())[:-len("</stream>")]
+    assert out.getvalue() == expected.encode("ascii")
+
+
+def test_stream_header_is_written_once_across_both_write_paths():
+    out = io.StringIO()
+    ew = SandflyEventWriter(output=out, error=io.StringIO())
+    ew.write_event(smi.Event(data="first", unbroken=True))
+    writer = BulkEventWriter(ew)
+    writer.write("second")
+    writer.flush()
+    ew.close()
+    text = out.getvalue()
+    assert text.count("<stream>") == 1 and text.startswith("<stream>") and text.endswith("</stream>")
+    assert text.index("first") < text.index("second")
+
+
+def test_large_event_is_sent_as_contiguous_fragments():
+    out = io.StringIO()
+    writer = BulkEventWriter(SandflyEventWriter(output=out, error=io.StringIO()), fragment_bytes=10)
+    data = "0123456789" * 3 + "abc"
+    writer.write(data, sourcetype="sandfly:hosts")
+    writer.write("next")
+    writer.flush()
+
+    text = out.getvalue()
+    pieces = re.findall(r"<data>(.*?)</data>", text)
+    assert pieces == ["0123456789", "0123456789", "0123456789", "abc", "next"]
+    assert text.count("<done />") == 2
+    assert writer.fragmented == 1 and writer.events == 2
+
+
+def test_batch_is_flushed_when_full():
+    out = io.StringIO()
+    writer = BulkEventWriter(SandflyEventWriter(output=out, error=io.StringIO()), max_events=3, max_delay=3600)
+    for n in range(7):
+        writer.write(str(n))
+    assert writer.batches == 2
+    assert out.getvalue().count("<done />") == 6
+
+
+# -----------------------------------------------------------------------------#
+# Flush before commit
+# -----------------------------------------------------------------------------#
+class OrderedWriter:
+    """Stands in for BulkEventWriter: buffers, and logs flushes and commits."""
+
+    def __init__(self, log):
+        self.log = log
+        self.pending = []
+        self.flushed = []
+
+    def emit(self, record):
+        self.pending.append(record)
+
+    def flush(self):
+        self.flushed.extend(self.pending)
+        self.pending = []
+        self.log.append(("flush", len(self.flushed)))
+
+
+def test_delta_digests_are_committed_after_the_flush(tmp_path, monkeypatch):
+    log = []
+    writer = OrderedWriter(log)
+    delta = SnapshotDelta(str(tmp_path), "stanza", "hosts", full_interval=3600)
+    commit = delta.commit
+    monkeypatch.setattr(delta, "commit", lambda: (log.append(("commit", len(writer.flushed))), commit()))
+
+    apply_delta(delta, [{"id": 1}, {"id": 2}], emit=writer.emit, flush=writer.flush)
+
+    assert log == [("flush", 2), ("commit", 2)]
+    assert not writer.pending
+
+
+def test_results_checkpoint_never_gets_ahead_of_the_writer(tmp_path):
+    log = []
+    writer = OrderedWriter(log)
+    checkpoint = CheckpointStore(str(tmp_path), "stanza")
+    save = checkpoint.save
+
+    def logged_save():
+        log.append(("save", checkpoint.get(CHECKPOINT_KEY)["last_id"], len(writer.flushed)))
+        save()
+
+    checkpoint.save = logged_save
+    pages = [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+
+    written = collect_results_incremental(
+        iter_pages=lambda next_query, page_size: iter(pages),
+        checkpoint=checkpoint,
+        emit=writer.emit,
+        log_fn=lambda level, msg: None,
+        page_size=2,
+        flush=writer.flush,
+    )
+
+    assert written == 3
+    assert log == [("flush", 2), ("save", 2, 2), ("flush", 3), ("save", 3, 3)]
+    assert os.path.exists(checkpoint.path)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tools/backfill_rollups.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Backfill the sandfly_summary rollups (savedsearches.conf, "Rollups")
+#   for a past date range, one dispatch per hour or day window
+# - Windows that already hold rollup rows are skipped, so the tool can be
+#   re-run after a partial backfill or next to the live schedules
+#
+# Notes:
+# - Each window dispatches the shipped saved search with trigger_actions,
+#   so the rows are written by its own summary-indexing action and carry
+#   the same rollup=<name> tag as scheduled runs
+# - Windows are aligned to UTC; run it as a user whose time zone matches
+#   the one the schedules run in
+# - Splunk's own fill_summary_index.py works too, but does not know the
+#   rollup tags and cannot skip per rollup
+#
+# Operator tool: run from any host that can reach splunkd's management port.
+#
+# Usage:
+#   python tools/backfill_rollups.py --host splunk.example --username admin \
+#       --password ... --start 2026-01-01 --end 2026-04-01 --jobs 4
+#   python tools/backfill_rollups.py ... --rollups results_daily --dry-run
+# =============================================================================
+
+import argparse
+import calendar
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, "..", "lib"))
+
+import splunklib.client as client  # noqa: E402
+import splunklib.results as results  # noqa: E402
+
+
+APP = "Sandfly_Security_For_Splunk_App"
+
+# rollup tag -> (saved search, window seconds)
+ROLLUPS: Dict[str, Tuple[str, int]] = {
+    "results_hourly": ("Sandfly - Rollup Results Hourly", 3600),
+    "results_daily": ("Sandfly - Rollup Results Daily", 86400),
+    "threatfeeds_daily": ("Sandfly - Rollup Threat Feeds Daily", 86400),
+    "users_daily": ("Sandfly - Rollup Users Daily", 86400),
+}
+
+POLL_INTERVAL = 2.0
+
+_local = threading.local()
+
+
+# -----------------------------------------------------------------------------#
+# Connection
+# -----------------------------------------------------------------------------#
+def connect(args) -> client.Service:
+    """One splunkd connection per thread."""
+    service = getattr(_local, "service", None)
+    if service is None:
+        kwargs = dict(host=args.host, port=args.port, app=APP, owner=args.owner)
+        if args.token:
+            kwargs["splunkToken"] = args.token
+        else:
+            kwargs.update(username=args.username, password=args.password)
+        service = client.connect(**kwargs)
+        _local.service = service
+    return service
+
+
+# -----------------------------------------------------------------------------#
+# Windows
+# -----------------------------------------------------------------------------#
+def parse_day(value: str) -> int:
+    return calendar.timegm(datetime.strptime(value, "%Y-%m-%d").timetuple())
+
+
+def windows(start: int, end: int, span: int) -> List[Tuple[int, int]]:
+    first = start - start % span
+    return [(t, t + span) for t in range(first, end - span + 1, span)]
+
+
+def filled_windows(args, rollup: str, start: int, end: int, span: int) -> Set[int]:
+    """Start times of windows that already have rows for this rollup."""
+    query = (
+        f"search `sandfly_rollup({rollup})` earliest={start} latest={end}"
+        f" | eval window={start}+floor((_time-{start})/{span})*{span}"
+        " | stats count by window"
+    )
+    stream = connect(args).jobs.oneshot(query, output_mode="json", count=0)
+    return {
+        int(float(row["window"]))
+        for row in results.JSONResultsReader(stream)
+        if isinstance(row, dict) and "window" in row
+    }
+
+
+# -----------------------------------------------------------------------------#
+# Dispatch
+# -----------------------------------------------------------------------------#
+def run_window(args, saved_search: str, window: Tuple[int, int]) -> Tuple[Tuple[int, int], int]:
+    job = connect(args).saved_searches[saved_search].dispatch(**{
+        "dispatch.earliest_time": str(window[0]),
+        "dispatch.latest_time": str(window[1]),
+        "trigger_actions": 1,
+        "force_dispatch": 1,
+    })
+    while not job.is_done():
+        time.sleep(POLL_INTERVAL)
+    return window, int(job["resultCount"])
+
+
+def backfill(args, rollup: str, start: int, end: int) -> int:
+    saved_search, span = ROLLUPS[rollup]
+    todo = windows(start, end, span)
+    if not args.force:
+        filled = filled_windows(args, rollup, start, end, span)
+        todo = [w for w in todo if w[0] not in filled]
+
+    print(f"{rollup}: {len(todo)} window(s) to run ({saved_search})")
+    if args.dry_run or not todo:
+        return 0
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_window, args, saved_search, w) for w in todo]
+        for future in as_completed(futures):
+            try:
+                window, rows = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"  {rollup}: window failed: {e}", file=sys.stderr)
+                continue
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.gmtime(window[0]))
+            print(f"  {rollup} {stamp}Z: {rows} row(s)")
+    return failed
+
+
+# -----------------------------------------------------------------------------#
+# Main
+# -----------------------------------------------------------------------------#
+def main():
+    parser = argparse.ArgumentParser(description="Backfill Sandfly summary-index rollups")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password")
+    parser.add_argument("--token", help="splunkd authentication token instead of username/password")
+    parser.add_argument("--owner", default="nobody")
+    parser.add_argument("--start", required=True, help="first day, YYYY-MM-DD (UTC)")
+    parser.add_argument("--end", required=True, help="day after the last one, YYYY-MM-DD (UTC)")
+    parser.add_argument("--rollups", default=",".join(ROLLUPS), help="comma-separated rollup names")
+    parser.add_argument("--jobs", type=int, default=2, help="concurrent search jobs")
+    parser.add_argument("--force", action="store_true", help="re-run windows that already have rows")
+    parser.add_argument("--dry-run", action="store_true", help="only report the windows to run")
+    args = parser.parse_args()
+
+    if not args.token and not args.password:
+        parser.error("--password or --token is required")
+    names = [n.strip() for n in args.rollups.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ROLLUPS]
+    if unknown:
+        parser.error(f"unknown rollup(s): {', '.join(unknown)}")
+    start, end = parse_day(args.start), parse_day(args.end)
+    if end <= start:
+        parser.error("--end must be after --start")
+    args.jobs = max(1, args.jobs)
+
+    failed = sum(backfill(args, name, start, end) for name in names)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tools/bench_index_fields.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Before/after model of the index-time extraction rework on synthetic
+#   sandfly:results events
+#   before: INDEXED_EXTRACTIONS = json + KV_MODE = json (every field twice)
+#   after:  curated sf_* fields from default/transforms.conf + KV_MODE = json
+#
+# Reports, per variant:
+# - index size: raw bytes, indexed terms, lexicon size and an estimated
+#   tsidx size (lexicon + postings)
+#   The after variant runs the shipped sandfly_indexed_* regexes (read
+#   from transforms.conf, so the benchmark tests the config)
+# - search latency: "stats count by host_id status" over raw events with
+#   search-time JSON (plus merging indexed fields, before), and the same
+#   report from indexed terms (tstats)
+#
+# This is a model, not a Splunk measurement. To confirm on an indexer,
+# index the same data both ways and compare:
+#   | dbinspect index=<idx> | stats sum(sizeOnDiskMB) sum(tsidxSize)
+#   | tstats count where index=<idx> sourcetype=sandfly:results by sf_host_id sf_status
+#   index=<idx> sourcetype=sandfly:results | stats count by host_id status
+#
+# Development tool only: not used by the app at runtime and not packaged.
+#
+# Usage:
+#   python tools/bench_index_fields.py --events 100000
+# =============================================================================
+
+import argparse
+import configparser
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Tuple
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(TOOLS_DIR, "..")
+sys.path.insert(0, os.path.join(APP_DIR, "bin"))
+sys.path.insert(0, TOOLS_DIR)
+
+from sandfly_fields import flatten_key_fields  # noqa: E402
+from sandfly_json import dumps  # noqa: E402
+
+from mock_sandfly_server import MockConfig, MockData  # noqa: E402
+
+
+SOURCETYPE = "sandfly:results"
+# Splunk's default major breakers, enough to model raw-text tokens
+MAJOR_BREAKERS = re.compile(r"[\s\[\]<>(){}|!;,'\"*\n\r\t&?+]+")
+# Rough per-entry costs of a tsidx file
+LEXICON_ENTRY_OVERHEAD = 8
+POSTING_BYTES = 4
+
+
+# -----------------------------------------------------------------------------#
+# Index-time extraction
+# -----------------------------------------------------------------------------#
+def load_indexed_transforms(sourcetype: str) -> List[Tuple[re.Pattern, str]]:
+    props = configparser.RawConfigParser(strict=False, interpolation=None)
+    props.optionxform = str
+    props.read(os.path.join(APP_DIR, "default", "props.conf"))
+    transforms = configparser.RawConfigParser(strict=False, interpolation=None)
+    transforms.optionxform = str
+    transforms.read(os.path.join(APP_DIR, "default", "transforms.conf"))
+
+    names = props.get(sourcetype, "TRANSFORMS-sandfly_indexed", fallback="")
+    compiled = []
+    for name in (n.strip() for n in names.split(",") if n.strip()):
+        field = transforms.get(name, "FORMAT").split("::", 1)[0]
+        compiled.append((re.compile(transforms.get(name, "REGEX")), field))
+    return compiled
+
+
+def json_indexed_terms(raw: str) -> List[str]:
+    """INDEXED_EXTRACTIONS = json: every leaf as path::value."""
+    terms: List[str] = []
+
+    def walk(value: Any, path: str):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(child, f"{path}.{key}" if path else key)
+        elif isinstance(value, list):
+            for child in value:
+                walk(child, f"{path}{{}}")
+        else:
+            terms.append(f"{path}::{value}")
+
+    walk(json.loads(raw), "")
+    return terms
+
+
+def regex_indexed_terms(raw: str, transforms: List[Tuple[re.Pattern, str]]) -> List[str]:
+    terms = []
+    for pattern, field in transforms:
+        match = pattern.match(raw)
+        if match:
+            terms.append(f"{field}::{match.group(1)}")
+    return terms
+
+
+def raw_terms(raw: str) -> Iterator[str]:
+    return (token for token in MAJOR_BREAKERS.split(raw) if token)
+
+
+# -----------------------------------------------------------------------------#
+# Variants
+# -----------------------------------------------------------------------------#
+def build_events(count: int) -> Tuple[List[str], List[str]]:
+    data = MockData(MockConfig(hosts=max(1, count // 20), results_per_host=20))
+    before, after = [], []
+    for n in range(1, count + 1):
+        record = data.result(n)
+        before.append(dumps(record))
+        after.append(dumps(flatten_key_fields(SOURCETYPE, record)))
+    return before, after
+
+
+def index(raws: List[str], extract) -> Dict[str, Any]:
+    indexed = [extract(raw) for raw in raws]
+
+    lexicon: Counter = Counter()
+    for raw, terms in zip(raws, indexed):
+        lexicon.update(set(raw_terms(raw)) | set(terms))
+    postings = sum(lexicon.values())
+    lexicon_bytes = sum(len(term) + LEXICON_ENTRY_OVERHEAD for term in lexicon)
+
+    joined = "\n".join(raws).encode("utf-8")
+    return {
+        "indexed": indexed,
+        "raw_mb": len(joined) / 1048576,
+        "journal_mb": len(zlib.compress(joined, 6)) / 1048576,
+        "indexed_terms": sum(len(terms) for terms in indexed),
+        "lexicon_terms": len(lexicon),
+        "tsidx_mb": (lexicon_bytes + postings * POSTING_BYTES) / 1048576,
+    }
+
+
+def search_raw(raws: List[str], indexed: List[List[str]], merge_indexed: bool) -> Tuple[float, int]:
+    """index=... | stats count by host_id status (search-time JSON)."""
+    started = time.perf_counter()
+    counts: Counter = Counter()
+    for raw, terms in zip(raws, indexed):
+        event = json.loads(raw)
+        fields: Dict[str, List[Any]] = {}
+        if merge_indexed:
+            # Indexed JSON fields are loaded alongside the search-time ones
+            for term in terms:
+                name, _, value = term.partition("::")
+                fields.setdefault(name, []).append(value)
+        data = event.get("data") or {}
+        host_id = event.get("host_id", data.get("host_id"))
+        status = event.get("status", data.get("status"))
+        counts[(host_id, status)] += 1
+    return time.perf_counter() - started, len(counts)
+
+
+def search_tstats(indexed: List[List[str]], host_field: str, status_field: str) -> Tuple[float, int]:
+    """| tstats count by <host field> <status field> (indexed terms only)."""
+    started = time.perf_counter()
+    counts: Counter = Counter()
+    host_prefix, status_prefix = f"{host_field}::", f"{status_field}::"
+    for terms in indexed:
+        host = status = None
+        for term in terms:
+            if term.startswith(host_prefix):
+                host = term[len(host_prefix):]
+            elif term.startswith(status_prefix):
+                status = term[len(status_prefix):]
+        counts[(host, status)] += 1
+    return time.perf_counter() - started, len(counts)
+
+
+# -----------------------------------------------------------------------------#
+# Main
+# -----------------------------------------------------------------------------#
+def main():
+    parser = argparse.ArgumentParser(description="Index-time extraction before/after model")
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+
+    transforms = load_indexed_transforms(SOURCETYPE)
+    before_raws, after_raws = build_events(args.events)
+
+    before = index(before_raws, json_indexed_terms)
+    after = index(after_raws, lambda raw: regex_indexed_terms(raw, transforms))
+
+    before["search_s"], groups_before = search_raw(before_raws, before["indexed"], merge_indexed=True)
+    after["search_s"], groups_after = search_raw(after_raws, after["indexed"], merge_indexed=False)
+    before["tstats_s"], _ = search_tstats(before["indexed"], "data.host_id", "data.status")
+    after["tstats_s"], _ = search_tstats(after["indexed"], "sf_host_id", "sf_status")
+
+    print(f"{args.events} {SOURCETYPE} events, {len(transforms)} curated indexed fields (model, see header)")
+    print(f"{'':>18} {'before':>12} {'after':>12}")
+    rows = [
+        ("raw MB", "raw_mb", "{:.1f}"),
+        ("journal MB (zlib)", "journal_mb", "{:.1f}"),
+        ("indexed terms", "indexed_terms", "{:,}"),
+        ("lexicon terms", "lexicon_terms", "{:,}"),
+        ("tsidx MB (est.)", "tsidx_mb", "{:.1f}"),
+        ("raw search s", "search_s", "{:.2f}"),
+        ("tstats s", "tstats_s", "{:.2f}"),
+    ]
+    for label, key, fmt in rows:
+        print(f"{label:>18} {fmt.format(before[key]):>12} {fmt.format(after[key]):>12}")
+    print(f"search groups match: {groups_before == groups_after}")
+
+
+if __name__ == "__main__":
+    main()
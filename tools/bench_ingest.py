@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tools/bench_ingest.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - End-to-end throughput benchmark of the ingestion path
+# - Drives SandflyInput.stream_events against the local mock server (or any
+#   Sandfly URL) with a capturing EventWriter
+#
+# Reports:
+# - events written, events/sec, total bytes written
+# - request count and p50 / p99 request latency (client side)
+# - peak RSS of the benchmark process
+#
+# Development tool only: not used by the app at runtime and not packaged.
+#
+# Usage:
+#   python tools/bench_ingest.py --hosts 5000 --results-per-host 20 \
+#       --collectors results,hosts --runs 2
+#   python tools/bench_ingest.py --url https://sandfly.example:8443 \
+#       --username bench --password ... --collectors hosts
+# =============================================================================
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, "..", "bin"))
+sys.path.insert(0, os.path.join(TOOLS_DIR, "..", "lib"))
+sys.path.insert(0, TOOLS_DIR)
+
+import requests  # noqa: E402
+
+import splunklib.modularinput as smi  # noqa: E402
+
+from mock_sandfly_server import add_config_arguments, config_from_args, start_mock_server  # noqa: E402
+from sandfly_input import SandflyInput  # noqa: E402
+from sandfly_writer import SandflyEventWriter  # noqa: E402
+
+
+# -----------------------------------------------------------------------------#
+# Capture
+# -----------------------------------------------------------------------------#
+class CountingSink:
+    """File-like sink that counts what splunkd would have received."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.events = 0
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        # splunklib writes bytes unless the stream is a TextIOBase
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        # Batches hold many events; a complete one (or the last fragment of
+        # an unbroken one) ends with <done />
+        with self._lock:
+            self.bytes += len(data)
+            self.events += data.count(b"<done />")
+
+    def flush(self):
+        pass
+
+
+class LogCapture:
+    """Error stream for the EventWriter: keeps internal log lines."""
+
+    def __init__(self, verbose: bool = False):
+        self.lines: List[str] = []
+        self.verbose = verbose
+
+    def write(self, data: str):
+        self.lines.append(data.rstrip("\n"))
+        if self.verbose:
+            sys.stderr.write(data)
+
+    def flush(self):
+        pass
+
+
+class CapturingEventWriter(SandflyEventWriter):
+    def __init__(self, verbose: bool = False):
+        self.sink = CountingSink()
+        self.logs = LogCapture(verbose)
+        super().__init__(output=self.sink, error=self.logs)
+
+    @property
+    def events(self) -> int:
+        return self.sink.events
+
+
+class LatencyRecorder:
+    """Times every HTTP request made through requests.Session.send."""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self._lock = threading.Lock()
+        self._original = requests.Session.send
+
+    def install(self):
+        recorder = self
+        original = self._original
+
+        def timed_send(session, request, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(session, request, **kwargs)
+            finally:
+                with recorder._lock:
+                    recorder.samples.append(time.perf_counter() - started)
+
+        requests.Session.send = timed_send
+
+    def uninstall(self):
+        requests.Session.send = self._original
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# -----------------------------------------------------------------------------#
+# Benchmark
+# -----------------------------------------------------------------------------#
+def build_definition(args, url: str, checkpoint_dir: str) -> smi.InputDefinition:
+    params: Dict[str, Any] = {
+        "sandfly_url": url,
+        "username": args.username,
+        "password": args.password,
+        "verify_ssl": "false",
+        "timeout": str(args.timeout),
+        "collector_threads": str(args.threads),
+        "results_page_size": str(args.results_page_size),
+    }
+    for name in filter(None, (c.strip() for c in args.collectors.split(","))):
+        params[f"collect_{name}"] = "true"
+    for key_value in args.param:
+        key, _, value = key_value.partition("=")
+        params[key] = value
+
+    definition = smi.InputDefinition()
+    definition.metadata = {"checkpoint_dir": checkpoint_dir, "server_host": "bench"}
+    definition.inputs = {"sandfly_security://bench": params}
+    return definition
+
+
+def run_once(args, url: str, checkpoint_dir: str) -> Dict[str, Any]:
+    ew = CapturingEventWriter(verbose=args.verbose)
+    latency = LatencyRecorder()
+    latency.install()
+
+    started = time.perf_counter()
+    try:
+        script = SandflyInput()
+        script.run_once = True
+        script.stream_events(build_definition(args, url, checkpoint_dir), ew)
+    finally:
+        elapsed = time.perf_counter() - started
+        latency.uninstall()
+
+    return {
+        "seconds": round(elapsed, 3),
+        "events": ew.events,
+        "events_per_sec": round(ew.events / elapsed, 1) if elapsed else 0.0,
+        "bytes_written": ew.sink.bytes,
+        "requests": len(latency.samples),
+        "latency_p50_ms": round(latency.percentile(50) * 1000, 2),
+        "latency_p99_ms": round(latency.percentile(99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "errors": [m for m in ew.logs.lines if m.startswith(("ERROR", "FATAL"))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sandfly ingestion throughput benchmark")
+    parser.add_argument("--url", help="benchmark a real server instead of the built-in mock")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--collectors", default="results,hosts", help="comma list of collect_<name> flags")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--results-page-size", type=int, default=500)
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument("--param", action="append", default=[], help="extra stanza parameter key=value")
+    parser.add_argument("--runs", type=int, default=1, help="runs share one checkpoint dir (2nd run = incremental)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--verbose", action="store_true", help="echo the input's internal log lines")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = start_mock_server(config_from_args(args))
+        url = server.url
+
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="sandfly-bench-") as checkpoint_dir:
+        for run in range(1, args.runs + 1):
+            report = run_once(args, url, checkpoint_dir)
+            report["run"] = run
+            if server is not None:
+                with server.stats_lock:
+                    report["server"] = dict(server.stats)
+                    server.stats.clear()
+            reports.append(report)
+
+    if server is not None:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for r in reports:
+        print(
+            f"run {r['run']}: {r['events']} events in {r['seconds']}s "
+            f"({r['events_per_sec']} ev/s), {r['bytes_written'] / 1e6:.1f} MB written, "
+            f"{r['requests']} requests (p50 {r['latency_p50_ms']} ms, p99 {r['latency_p99_ms']} ms), "
+            f"peak RSS {r['peak_rss_mb']} MB"
+        )
+        if r.get("server"):
+            print(f"        server: {r['server']}")
+        for line in r["errors"]:
+            print(f"        {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tools/bench_json.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Micro-benchmark of the JSON work done per results page
+# - Compares the stdlib and orjson backends of sandfly_json on one
+#   synthetic page (the mock server's result records)
+#
+# Reports, per backend:
+# - decode: whole page decoded in one pass (loads)
+# - stream: page decoded record by record (iter_json_records, stdlib only)
+# - encode: every record serialized as event data (dumps)
+# - whether both backends produce byte-identical event data
+#
+# Development tool only: not used by the app at runtime and not packaged.
+#
+# Usage:
+#   python tools/bench_json.py --results 100000 --repeat 3
+# =============================================================================
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, "..", "bin"))
+sys.path.insert(0, TOOLS_DIR)
+
+import sandfly_json  # noqa: E402
+
+from mock_sandfly_server import MockConfig, MockData  # noqa: E402
+
+
+# -----------------------------------------------------------------------------#
+# Timing
+# -----------------------------------------------------------------------------#
+def best_of(repeat: int, fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def chunks(body: bytes, size: int = sandfly_json.READ_SIZE):
+    for offset in range(0, len(body), size):
+        yield body[offset:offset + size]
+
+
+def build_page(results: int) -> bytes:
+    data = MockData(MockConfig(hosts=max(1, results // 20), results_per_host=20))
+    page = {"data": [data.result(n) for n in range(1, results + 1)], "total": results}
+    return sandfly_json.stdlib_dumps(page).encode("utf-8")
+
+
+def bench_backend(name: str, loads, dumps, body: bytes, repeat: int) -> Dict[str, Any]:
+    records = list(sandfly_json.iter_document_records(loads(body)))
+    report = {
+        "backend": name,
+        "decode_s": best_of(repeat, lambda: loads(body)),
+        "encode_s": best_of(repeat, lambda: [dumps(record) for record in records]),
+    }
+    if name == "json":
+        report["stream_s"] = best_of(repeat, lambda: sum(1 for _ in sandfly_json.iter_json_records(chunks(body))))
+    return report
+
+
+# -----------------------------------------------------------------------------#
+# Main
+# -----------------------------------------------------------------------------#
+def main():
+    parser = argparse.ArgumentParser(description="sandfly_json backend micro-benchmark")
+    parser.add_argument("--results", type=int, default=100000, help="records in the synthetic page")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = parser.parse_args()
+
+    body = build_page(args.results)
+    mb = len(body) / 1048576
+    print(f"page: {args.results} results, {mb:.1f} MB")
+
+    reports: List[Dict[str, Any]] = [
+        bench_backend("json", sandfly_json.stdlib_loads, sandfly_json.stdlib_dumps, body, args.repeat)
+    ]
+    if sandfly_json.orjson is not None:
+        reports.append(bench_backend("orjson", sandfly_json.loads, sandfly_json.dumps, body, args.repeat))
+    else:
+        print("orjson: not installed (bundle it in lib/ to enable the fast path)")
+
+    for report in reports:
+        line = (
+            f"{report['backend']:>7}: decode {report['decode_s'] * 1000:8.1f} ms ({mb / report['decode_s']:6.1f} MB/s)"
+            f"  encode {report['encode_s'] * 1000:8.1f} ms ({args.results / report['encode_s']:9.0f} ev/s)"
+        )
+        if "stream_s" in report:
+            line += f"  stream {report['stream_s'] * 1000:8.1f} ms"
+        print(line)
+
+    if len(reports) == 2:
+        base, fast = reports
+        print(
+            f"orjson speedup: decode x{base['decode_s'] / fast['decode_s']:.1f}, "
+            f"encode x{base['encode_s'] / fast['encode_s']:.1f}"
+        )
+        records = list(sandfly_json.iter_document_records(sandfly_json.loads(body)))
+        identical = all(sandfly_json.stdlib_dumps(r) == sandfly_json.dumps(r) for r in records)
+        print(f"event data identical across backends: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# File: tools/mock_sandfly_server.py
+# Sandfly Security for Splunk App
+#
+# Purpose:
+# - Local stand-in for a Sandfly server, for benchmarking and development
+# - Synthetic data at configurable scale (hosts, results per host)
+# - Configurable latency and 429 / 5xx fault injection
+# - gzip responses (Accept-Encoding) and ETag / If-None-Match on GET
+#
+# Served endpoints:
+#   POST /v4/auth/login                 JWT access/refresh tokens with "exp"
+#   POST /v4/auth/refresh
+#   GET  /v4/version
+#   GET  /v4/hosts
+#   GET  /v4/hosts/:id                  and /v4/hosts/:id/info/<type>
+#   POST /v4/results                    id / end_time filters, size, id sort
+#   GET  /v4/sshhunter/summary|minisummary|keys|users|hosts
+#
+# Development tool only: not used by the app at runtime and not packaged.
+#
+# Usage:
+#   python tools/mock_sandfly_server.py --port 8443 --hosts 5000 \
+#       --results-per-host 20 --latency-ms 5 --rate-429 0.01
+# =============================================================================
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+HOST_INFO_TYPES = (
+    "processes",
+    "listeners",
+    "kernelmodules",
+    "services",
+    "users",
+    "scheduledtasks",
+    "lastlog",
+    "loggedinusers",
+)
+
+SANDFLY_NAMES = (
+    "process_deleted_bin",
+    "file_hidden_etc",
+    "user_ssh_authorized_keys_duplicate",
+    "process_running_memfd",
+    "log_tampered_wtmp",
+    "kernel_module_hidden",
+)
+
+
+# -----------------------------------------------------------------------------#
+# Synthetic data
+# -----------------------------------------------------------------------------#
+class MockConfig:
+    def __init__(
+        self,
+        hosts: int = 100,
+        results_per_host: int = 10,
+        max_page_size: int = 1000,
+        latency_ms: float = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        token_ttl: int = 3600,
+        items_per_host_info: int = 20,
+        seed: int = 1,
+    ):
+        self.hosts = hosts
+        self.results_per_host = results_per_host
+        self.max_page_size = max_page_size
+        self.latency_ms = latency_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.token_ttl = token_ttl
+        self.items_per_host_info = items_per_host_info
+        self.seed = seed
+
+    @property
+    def total_results(self) -> int:
+        return self.hosts * self.results_per_host
+
+
+class MockData:
+    """Deterministic synthetic records generated on demand (never stored)."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.epoch = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    def host_id(self, n: int) -> str:
+        return f"00000000-0000-4000-8000-{n:012d}"
+
+    def host(self, n: int) -> Dict[str, Any]:
+        return {
+            "host_id": self.host_id(n),
+            "hostname": f"linux-{n:05d}.example.internal",
+            "ip": f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}",
+            "os_name": "Ubuntu" if n % 3 else "Rocky Linux",
+            "os_version": "22.04" if n % 3 else "9.3",
+            "active": True,
+            "tags": ["mock", f"zone-{n % 4}"],
+        }
+
+    def result(self, result_id: int) -> Dict[str, Any]:
+        rnd = random.Random(self.config.seed * 1000003 + result_id)
+        host_n = (result_id - 1) % max(1, self.config.hosts)
+        end_time = self.epoch + timedelta(milliseconds=result_id * 10)
+        status = rnd.choices(("pass", "alert", "error"), weights=(80, 15, 5))[0]
+        return {
+            "id": result_id,
+            "data": {
+                "host_id": self.host_id(host_n),
+                "hostname": f"linux-{host_n:05d}.example.internal",
+                "sandfly_name": rnd.choice(SANDFLY_NAMES),
+                "status": status,
+                "severity": rnd.randint(0, 4),
+                "end_time": end_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "results": {"process": {"pid": rnd.randint(1, 65535), "cmdline": "/usr/bin/mock --flag"}},
+            },
+        }
+
+    def host_info(self, host_id: str, info_type: str) -> List[Dict[str, Any]]:
+        return [
+            {"name": f"{info_type}-{i}", "host_id": host_id, "value": i}
+            for i in range(self.config.items_per_host_info)
+        ]
+
+
+# -----------------------------------------------------------------------------#
+# Tokens
+# -----------------------------------------------------------------------------#
+def _b64(obj: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def make_jwt(ttl: int) -> str:
+    now = time.time()
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64({'exp': int(now + ttl), 'iat': int(now)})}.mock"
+
+
+# -----------------------------------------------------------------------------#
+# Request handler
+# -----------------------------------------------------------------------------#
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockSandfly/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # -- plumbing -------------------------------------------------------------
+    @property
+    def config(self) -> MockConfig:
+        return self.server.config
+
+    @property
+    def data(self) -> MockData:
+        return self.server.data
+
+    def _count(self, key: str):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        raw = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        headers = dict(headers or {})
+
+        if status == 200 and self.command == "GET":
+            etag = '"%s"' % hashlib.sha1(raw).hexdigest()[:16]
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                self._count("http_304")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        if len(raw) > 1024 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            raw = gzip.compress(raw, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+        with self.server.stats_lock:
+            self.server.stats["bytes_sent"] = self.server.stats.get("bytes_sent", 0) + len(raw)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _faults(self) -> bool:
+        """Apply latency and fault injection; True if a fault was sent."""
+        if self.config.latency_ms:
+            time.sleep(self.config.latency_ms / 1000.0)
+
+        roll = random.random()
+        if roll < self.config.rate_429:
+            self._count("http_429")
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+            return True
+        if roll < self.config.rate_429 + self.config.rate_5xx:
+            self._count("http_5xx")
+            self._send_json(503, {"error": "unavailable"})
+            return True
+        return False
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization", "").startswith("Bearer "):
+            return True
+        self._send_json(401, {"error": "unauthorized"})
+        return False
+
+    # -- routing --------------------------------------------------------------
+    def do_POST(self):
+        self._count("requests")
+        path = urlparse(self.path).path
+        body = self._body()
+
+        if path == "/v4/auth/login":
+            self._count("logins")
+            return self._send_json(200, {
+                "access_token": make_jwt(self.config.token_ttl),
+                "refresh_token": make_jwt(self.config.token_ttl * 24),
+                "user": {"username": body.get("username"), "roles": ["api_result_read"]},
+            })
+
+        if path == "/v4/auth/refresh":
+            self._count("refreshes")
+            return self._send_json(200, {
+                "access_token": make_jwt(self.config.token_ttl),
+                "refresh_token": make_jwt(self.config.token_ttl * 24),
+            })
+
+        if not self._authorized() or self._faults():
+            return
+
+        if path == "/v4/results":
+            return self._send_json(200, {"data": self._results_page(body)})
+
+        if path == "/v4/results/timeline":
+            return self._send_json(200, {"data": []})
+
+        self._send_json(404, {"error": f"unknown endpoint {path}"})
+
+    def do_GET(self):
+        self._count("requests")
+        path = urlparse(self.path).path
+
+        if not self._authorized() or self._faults():
+            return
+
+        if path == "/v4/version":
+            return self._send_json(200, {"version": "5.3.0-mock", "build_date": "2026-01-01"})
+
+        if path == "/v4/hosts":
+            return self._send_json(200, {"data": [self.data.host(n) for n in range(self.config.hosts)]})
+
+        parts = path.strip("/").split("/")
+        if len(parts) == 3 and parts[:2] == ["v4", "hosts"]:
+            return self._send_json(200, {"host_id": parts[2], "data": {"uptime": 12345}})
+        if len(parts) == 5 and parts[:2] == ["v4", "hosts"] and parts[3] == "info" and parts[4] in HOST_INFO_TYPES:
+            return self._send_json(200, {"data": self.data.host_info(parts[2], parts[4])})
+
+        if len(parts) == 3 and parts[:2] == ["v4", "sshhunter"]:
+            return self._send_json(200, {"data": [
+                {"key_id": f"SHA256:mock{n}", "username": f"user{n % 10}", "host_count": n % 7}
+                for n in range(min(self.config.hosts, 500))
+            ]})
+
+        self._send_json(404, {"error": f"unknown endpoint {path}"})
+
+    # -- results --------------------------------------------------------------
+    def _results_page(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        size = max(1, min(int(body.get("size") or 100), self.config.max_page_size))
+        after_id, since = self._results_filter(body)
+
+        first = after_id + 1
+        if since is not None:
+            # Results are evenly spaced 10ms apart from the epoch
+            elapsed_ms = (since - self.data.epoch).total_seconds() * 1000
+            first = max(first, int(elapsed_ms // 10) + 1)
+
+        last = min(self.config.total_results, first + size - 1)
+        return [self.data.result(i) for i in range(first, last + 1)]
+
+    @staticmethod
+    def _results_filter(body: Dict[str, Any]) -> Tuple[int, Optional[datetime]]:
+        after_id, since = 0, None
+        for item in (body.get("filter") or {}).get("items", []):
+            if item.get("columnField") == "id" and item.get("operatorValue") == ">":
+                after_id = int(item.get("value") or 0)
+            elif item.get("columnField") == "data.end_time":
+                since = datetime.strptime(item["value"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        return after_id, since
+
+
+# -----------------------------------------------------------------------------#
+# Server lifecycle
+# -----------------------------------------------------------------------------#
+class MockSandflyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.data = MockData(config)
+        self.stats: Dict[str, int] = {}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> MockSandflyServer:
+    """Start the mock server on a background thread and return it."""
+    server = MockSandflyServer((host, port), config)
+    threading.Thread(target=server.serve_forever, name="mock-sandfly", daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--results-per-host", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=1000, help="maximum page size the server honours")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of API calls answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of API calls answered with 503")
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        hosts=args.hosts,
+        results_per_host=args.results_per_host,
+        max_page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        token_ttl=args.token_ttl,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Sandfly API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockSandflyServer((args.host, args.port), config_from_args(args))
+    print(f"Mock Sandfly server listening on {server.url} "
+          f"({args.hosts} hosts, {args.hosts * args.results_per_host} results)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()